@@ -0,0 +1,514 @@
+"""Append-only field activity log with incremental KPI rollups.
+
+Field teams report door-knocks, events held for a strategy and how long a
+community request took to answer. Reports are JSON lines or CSV rows::
+
+    {"Time": "2026-10-18T10:15:00", "Unit": "Ampara", "Kind": "door_knock", "Count": 40}
+    {"Time": "2026-10-18T18:00:00", "Unit": "Ampara", "Kind": "event", "Strategy": "...", "Attendees": 120}
+    {"Time": "2026-10-18T11:30:00", "Unit": "Ampara", "Kind": "response", "Hours": 6.5}
+
+They are dropped into a folder (``ELECTION_ACTIVITY_DIR``) that one thread per
+process tails, as with the results feed, or appended directly:
+
+    python activity.py ingest reports/*.jsonl
+    python activity.py generate --events 1000000 --out reports/synthetic.jsonl
+
+The log is a SQLite database (``ELECTION_ACTIVITY_DB``) in WAL mode, so a
+writer never blocks the dashboards reading it. Events are only ever inserted,
+and are indexed by day. Each batch adds its totals to two rollup tables in the
+same transaction: one row per (day, district, strategy category) and one per
+(unit, strategy). The read offset of each drop file is committed with the rows
+it produced, so every report is counted once, across restarts and replicas.
+Reading a file stops before a report of a unit the loaded data does not have;
+it is read once the data that has the unit is loaded.
+
+An event's category is its ``Category`` field, or else the category of the
+strategy it names. Door-knocks and responses without either count as
+``UNCATEGORIZED``. A touchpoint is one door-knock or one event held. KPIs for
+a window are sums over at most days x districts x categories rollup rows,
+however many millions of events the log holds.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from simulator import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_DB = os.environ.get('ELECTION_ACTIVITY_DB') or None
+ACTIVITY_DIR = os.environ.get('ELECTION_ACTIVITY_DIR') or None
+POLL_INTERVAL = float(os.environ.get('ELECTION_ACTIVITY_POLL', '2'))
+
+KINDS = ('door_knock', 'event', 'response')
+UNCATEGORIZED = 'Uncategorized'
+
+# Targets the messaging tab measures against
+TOUCHPOINT_TARGET = 7
+RESPONSE_TARGET_HOURS = 24
+
+WINDOWS = (7, 28, 90, 365)
+DEFAULT_WINDOW = 28
+
+# Rows inserted per transaction when ingesting a file
+BATCH_SIZE = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    time TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    district TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    category TEXT NOT NULL,
+    strategy TEXT,
+    count INTEGER NOT NULL,
+    attendees INTEGER NOT NULL,
+    hours REAL
+);
+CREATE INDEX IF NOT EXISTS events_day ON events (day);
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL,
+    district TEXT NOT NULL,
+    category TEXT NOT NULL,
+    door_knocks INTEGER NOT NULL,
+    events INTEGER NOT NULL,
+    attendees INTEGER NOT NULL,
+    responses INTEGER NOT NULL,
+    response_hours REAL NOT NULL,
+    responses_on_time INTEGER NOT NULL,
+    PRIMARY KEY (day, district, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS strategy_events (
+    unit TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    events INTEGER NOT NULL,
+    attendees INTEGER NOT NULL,
+    last_day TEXT NOT NULL,
+    PRIMARY KEY (unit, strategy)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    read_offset INTEGER NOT NULL
+);
+"""
+
+DAILY_TOTALS = ('door_knocks', 'events', 'attendees', 'responses', 'response_hours', 'responses_on_time')
+
+_UPSERT_DAILY = """
+INSERT INTO daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, district, category) DO UPDATE SET
+    door_knocks = door_knocks + excluded.door_knocks,
+    events = events + excluded.events,
+    attendees = attendees + excluded.attendees,
+    responses = responses + excluded.responses,
+    response_hours = response_hours + excluded.response_hours,
+    responses_on_time = responses_on_time + excluded.responses_on_time
+"""
+
+_UPSERT_STRATEGY = """
+INSERT INTO strategy_events VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (unit, strategy) DO UPDATE SET
+    events = events + excluded.events,
+    attendees = attendees + excluded.attendees,
+    last_day = max(last_day, excluded.last_day)
+"""
+
+
+class Resolver:
+    """Maps a report's unit to its district and its strategy to a category."""
+
+    def __init__(self, dataset):
+        from search import get_index
+
+        self.districts = dict(zip(dataset.df['Unit'].tolist(), dataset.df['District'].astype(str).tolist()))
+        index = get_index(dataset)
+        first = np.where(index.doc_categories.any(axis=1), index.doc_categories.argmax(axis=1), -1)
+        self.categories = {(unit, text): index.categories[j]
+                           for unit, text, j in zip(index.units.tolist(), index.texts.tolist(), first.tolist())
+                           if j >= 0}
+
+    def category(self, unit, strategy, category):
+        if category in CATEGORIES:
+            return category
+        if strategy:
+            return self.categories.get((unit, strategy), UNCATEGORIZED)
+        return UNCATEGORIZED
+
+
+def _timestamp(value):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    text = str(value).strip()
+    try:
+        return datetime.fromtimestamp(float(text))
+    except ValueError:
+        return datetime.fromisoformat(text.replace('Z', '+00:00'))
+
+
+def _number(record, field, default, cast):
+    value = record.get(field)
+    if value is None or value == '':
+        return default
+    return cast(float(value))
+
+
+class UnknownUnit(KeyError):
+    """A report names a unit the loaded data does not have."""
+
+
+def parse_event(record, resolver):
+    """Normalize one report to an ``events`` row, or None if it is invalid.
+    Raises ``UnknownUnit`` for a valid report of a unit ``resolver`` does not know."""
+    try:
+        kind = str(record['Kind']).strip().lower()
+        unit = str(record['Unit'])
+        when = _timestamp(record['Time'])
+        count = _number(record, 'Count', 1, int)
+        attendees = _number(record, 'Attendees', 0, int)
+        hours = _number(record, 'Hours', None, float)
+    except (KeyError, TypeError, ValueError, OverflowError, OSError):
+        return None
+    if kind not in KINDS or count < 0 or attendees < 0 or (hours is not None and hours < 0):
+        return None
+    if kind == 'response' and hours is None:
+        return None
+    district = resolver.districts.get(unit)
+    if district is None:
+        raise UnknownUnit(unit)
+    strategy = str(record.get('Strategy') or '') or None
+    category = resolver.category(unit, strategy, record.get('Category'))
+    return (when.date().isoformat(), when.isoformat(timespec='seconds'), unit, district, kind, category,
+            strategy, count, attendees, hours)
+
+
+class ActivityLog:
+    """The activity database; thread-safe, one per process."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        # Bumped by this connection's writes; PRAGMA data_version covers other processes
+        self._writes = 0
+        self.appended = 0
+        self.rejected = 0
+
+    def version(self):
+        """Changes whenever any process has appended events."""
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0], self._writes
+
+    def append(self, rows, source=None):
+        """Insert parsed ``rows`` and fold them into the rollups in one transaction.
+
+        ``source`` is ``(path, start, end)`` for rows read from a drop file. The
+        batch is skipped, and None returned, if the file's committed offset is
+        no longer ``start`` because another process has ingested those bytes.
+        """
+        daily = defaultdict(lambda: [0, 0, 0, 0, 0.0, 0])
+        by_strategy = {}
+        for day, _, unit, district, kind, category, strategy, count, attendees, hours in rows:
+            totals = daily[(day, district, category)]
+            if kind == 'door_knock':
+                totals[0] += count
+            elif kind == 'event':
+                totals[1] += count
+                totals[2] += attendees
+                if strategy:
+                    held = by_strategy.setdefault((unit, strategy), [0, 0, day])
+                    held[0] += count
+                    held[1] += attendees
+                    held[2] = max(held[2], day)
+            else:
+                totals[3] += 1
+                totals[4] += hours
+                totals[5] += hours <= RESPONSE_TARGET_HOURS
+        with self._lock:
+            conn = self._conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if source is not None:
+                    path, start, end = source
+                    stored = conn.execute('SELECT read_offset FROM sources WHERE path = ?', (path,)).fetchone()
+                    if (stored[0] if stored else 0) != start:
+                        conn.execute('ROLLBACK')
+                        return None
+                    conn.execute('INSERT INTO sources VALUES (?, ?) ON CONFLICT (path) DO UPDATE SET read_offset = excluded.read_offset',
+                                 (path, end))
+                conn.executemany('INSERT INTO events (day, time, unit, district, kind, category, strategy, count, '
+                                 'attendees, hours) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                conn.executemany(_UPSERT_DAILY, [key + tuple(totals) for key, totals in daily.items()])
+                conn.executemany(_UPSERT_STRATEGY, [key + tuple(held) for key, held in by_strategy.items()])
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self._writes += 1
+            self.appended += len(rows)
+        return len(rows)
+
+    def offset(self, path):
+        with self._lock:
+            stored = self._conn.execute('SELECT read_offset FROM sources WHERE path = ?', (str(path),)).fetchone()
+        return stored[0] if stored else 0
+
+    def reject(self, n=1):
+        with self._lock:
+            self.rejected += n
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def latest_day(self):
+        with self._lock:
+            latest = self._conn.execute('SELECT max(day) FROM daily').fetchone()[0]
+        return date.fromisoformat(latest) if latest else None
+
+    def window(self, days):
+        """``(first, last)`` day of the ``days``-day window ending on the latest active day."""
+        last = self.latest_day()
+        if last is None:
+            return None
+        return last - timedelta(days=days - 1), last
+
+    def rollup(self, days, by):
+        """Totals over the last ``days`` days grouped by ``by`` (``'district'``
+        and/or ``'category'``), from the rollup rows only."""
+        window = self.window(days)
+        columns = ', '.join(by)
+        sums = ', '.join(f'sum({name}) AS {name}' for name in DAILY_TOTALS)
+        if window is None:
+            return pd.DataFrame(columns=[*by, *DAILY_TOTALS])
+        return self._query(f'SELECT {columns}, {sums} FROM daily WHERE day BETWEEN ? AND ? '
+                           f'GROUP BY {columns} ORDER BY {columns}',
+                           (window[0].isoformat(), window[1].isoformat()))
+
+    def strategy_events(self, unit):
+        """``{strategy: (events, attendees, last_day)}`` for ``unit``."""
+        with self._lock:
+            rows = self._conn.execute('SELECT strategy, events, attendees, last_day FROM strategy_events '
+                                      'WHERE unit = ?', (unit,)).fetchall()
+        return {strategy: (events, attendees, last_day) for strategy, events, attendees, last_day in rows}
+
+
+def kpi_frame(totals, units=None):
+    """Readable KPI columns from rollup ``totals``; ``units`` (per row) gives
+    touchpoints per unit."""
+    frame = pd.DataFrame(index=totals.index)
+    frame['Door-knocks'] = totals['door_knocks'].astype('int64')
+    frame['Events'] = totals['events'].astype('int64')
+    frame['Attendees'] = totals['attendees'].astype('int64')
+    if units is not None:
+        touchpoints = (totals['door_knocks'] + totals['events']).to_numpy(dtype=np.float64)
+        frame['Touchpoints / unit'] = (touchpoints / np.maximum(units, 1)).round(1)
+    frame['Responses'] = totals['responses'].astype('int64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        responses = totals['responses'].to_numpy(dtype=np.float64)
+        frame['Mean response (h)'] = np.round(totals['response_hours'].to_numpy(dtype=np.float64) / responses, 1)
+        frame[f'Within {RESPONSE_TARGET_HOURS} h %'] = np.round(
+            totals['responses_on_time'].to_numpy(dtype=np.float64) / responses * 100, 1)
+    return frame
+
+
+class DropFolder:
+    """Appends the complete rows added to each report file since the last poll."""
+
+    def __init__(self, folder, log, resolver=None):
+        self.folder = Path(folder)
+        self.log = log
+        self.resolver = resolver
+        self.version = None
+        self._headers = {}
+        # path -> offset of a report held back for its unknown unit
+        self._held = {}
+
+    def use(self, dataset):
+        """Resolve units and strategies against ``dataset`` from now on."""
+        if dataset.version != self.version:
+            self.resolver = Resolver(dataset)
+            self.version = dataset.version
+
+    def _files(self):
+        return sorted(list(self.folder.glob('*.jsonl')) + list(self.folder.glob('*.csv')))
+
+    def _header(self, path):
+        header = self._headers.get(path)
+        if header is None:
+            with open(path, newline='', encoding='utf-8') as f:
+                header = self._headers[path] = next(csv.reader(f), None)
+        return header
+
+    def _records(self, path, data, start):
+        # Each record with the offset in ``data`` just past it
+        consumed = 0
+
+        def lines():
+            nonlocal consumed
+            for line in data.splitlines(keepends=True):
+                consumed += len(line)
+                yield line.decode('utf-8', errors='replace')
+
+        if path.suffix == '.jsonl':
+            for line in lines():
+                if line.strip():
+                    try:
+                        yield json.loads(line), consumed
+                    except json.JSONDecodeError:
+                        yield None, consumed
+            return
+        rows = csv.reader(lines())
+        if start == 0:
+            next(rows, None)
+        header = self._header(path)
+        for row in rows:
+            yield dict(zip(header, row)), consumed
+
+    def ingest(self, path):
+        """Append what ``path`` gained since its committed offset; return rows appended.
+
+        Reading stops before a report of a unit the data does not have (yet):
+        the offset is committed up to it, so it is read again once the data
+        is reloaded rather than dropped.
+        """
+        path = Path(path)
+        key = str(path.resolve())
+        start = self.log.offset(key)
+        size = path.stat().st_size
+        if size <= start:
+            return 0
+        appended = 0
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while start < size:
+                chunk = f.read(min(size - start, BATCH_SIZE * 200))
+                # Only complete lines; a partly written row waits for the next poll
+                end = chunk.rfind(b'\n')
+                if end < 0:
+                    break
+                f.seek(start + end + 1)
+                rows, rejected, read, unknown = [], 0, end + 1, None
+                records = self._records(path, chunk[:end + 1], start)
+                before = 0
+                for record, after in records:
+                    try:
+                        row = parse_event(record, self.resolver) if isinstance(record, dict) else None
+                    except UnknownUnit as error:
+                        read, unknown = before, error.args[0]
+                        break
+                    if row is None:
+                        rejected += 1
+                    else:
+                        rows.append(row)
+                    before = after
+                if read and self.log.append(rows, source=(key, start, start + read)) is None:
+                    break
+                appended += len(rows)
+                self.log.reject(rejected)
+                start += read
+                if unknown is not None:
+                    if self._held.get(key) != start:
+                        logger.warning("%s: holding reports from offset %d, unit %r is not in the data",
+                                       path.name, start, unknown)
+                    self._held[key] = start
+                    break
+                self._held.pop(key, None)
+        return appended
+
+    def poll(self):
+        if self.resolver is None:
+            return 0
+        return sum(self.ingest(path) for path in self._files())
+
+    def run_forever(self, interval=POLL_INTERVAL):
+        while True:
+            try:
+                appended = self.poll()
+                if appended:
+                    logger.debug("appended %d activity events", appended)
+            except Exception:
+                logger.exception("activity poll failed")
+            time.sleep(interval)
+
+
+@st.cache_resource(show_spinner=False)
+def _open_log(path):
+    return ActivityLog(path)
+
+
+@st.cache_resource(show_spinner=False)
+def _start_drop_folder(path, folder):
+    drop = DropFolder(folder, _open_log(path))
+    thread = threading.Thread(target=drop.run_forever, name='activity-feed', daemon=True)
+    thread.start()
+    return drop
+
+
+def get_activity(dataset):
+    """Return the process-wide activity log, or None if none is configured."""
+    if ACTIVITY_DB is None:
+        return None
+    if ACTIVITY_DIR is not None:
+        _start_drop_folder(ACTIVITY_DB, ACTIVITY_DIR).use(dataset)
+    return _open_log(ACTIVITY_DB)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append field activity reports to the activity log.")
+    parser.add_argument('--db', default=ACTIVITY_DB, help="activity database (default ELECTION_ACTIVITY_DB)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="append the new rows of report files")
+    ingest.add_argument('files', nargs='+')
+    generate = commands.add_parser('generate', help="write synthetic reports for the configured data")
+    generate.add_argument('--events', type=int, default=100_000)
+    generate.add_argument('--days', type=int, default=90)
+    generate.add_argument('--seed', type=int, default=0)
+    generate.add_argument('--out', required=True)
+    args = parser.parse_args(argv)
+
+    from data_layer import get_dataset
+
+    dataset = get_dataset()
+    if args.command == 'generate':
+        from synthetic import make_activity
+
+        strategies = dataset.strategies.all_texts()
+        frame = make_activity(dataset.df, strategies, args.events, days=args.days, seed=args.seed)
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        frame.to_json(args.out, orient='records', lines=True, force_ascii=False)
+        print(f"Wrote {len(frame):,} reports to {args.out}")
+        return 0
+
+    if args.db is None:
+        parser.error("no activity database; pass --db or set ELECTION_ACTIVITY_DB")
+    drop = DropFolder(Path(args.files[0]).parent, ActivityLog(args.db), Resolver(dataset))
+    for path in args.files:
+        started = time.perf_counter()
+        appended = drop.ingest(path)
+        elapsed = time.perf_counter() - started
+        print(f"{path}: {appended:,} events in {elapsed:.1f} s")
+    if drop.log.rejected:
+        print(f"{drop.log.rejected:,} invalid reports skipped")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Materialized district, province and national religion aggregates.
+
+Every unit carries a population (the 2012 census ``Population`` column, or 1
+per unit when the source has none) and the number of people of each religion
+it implies. The cube keeps, for every district, every province and the whole
+country, the unit count, the population, the people of each religion and the
+plain sum of unit percentages. Weighted means are then people / population
+and unweighted means are percentage sums / units, at any level and without
+touching the base frame.
+
+The hierarchy index (each unit's district and province code) is computed once.
+Every level is a segment reduction (``np.bincount`` over those codes), so a
+roll-up of any subset of units, such as the sidebar filters, costs the same as
+the full build. When the data is reloaded with the same units and only a few
+rows changed, the new cube copies the level totals of the previous one and
+adds the changed rows' differences instead of reducing everything again.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from metrics import RELIGIONS
+
+LEVEL_NAMES = ('District', 'Province', 'National')
+
+# Reloads changing more rows than this rebuild the cube instead of patching it
+INCREMENTAL_MAX_ROWS = 1000
+
+
+@dataclass(frozen=True)
+class Level:
+    """Totals of one level of the hierarchy, one row per group."""
+    names: np.ndarray
+    units: np.ndarray
+    population: np.ndarray
+    people: np.ndarray
+    share_sums: np.ndarray
+
+    def means(self, weighted=True):
+        """``(groups, RELIGIONS)`` mean percentages, NaN for empty groups."""
+        if weighted:
+            totals, counts = self.people * 100, self.population
+        else:
+            totals, counts = self.share_sums, self.units.astype(np.float64)
+        return np.divide(totals, counts[:, None], out=np.full(totals.shape, np.nan),
+                         where=counts[:, None] > 0)
+
+
+def _level(names, codes, population, people, shares):
+    n = len(names)
+    return Level(
+        names=names,
+        units=np.bincount(codes, minlength=n),
+        population=np.bincount(codes, weights=population, minlength=n),
+        people=np.column_stack([np.bincount(codes, weights=people[:, j], minlength=n)
+                                for j in range(people.shape[1])]),
+        share_sums=np.column_stack([np.bincount(codes, weights=shares[:, j], minlength=n)
+                                    for j in range(shares.shape[1])]),
+    )
+
+
+def _patched(level, codes, population, people, shares):
+    # ``level`` plus per-row differences, for the rows at ``codes``
+    patched = Level(names=level.names, units=level.units, population=level.population.copy(),
+                    people=level.people.copy(), share_sums=level.share_sums.copy())
+    np.add.at(patched.population, codes, population)
+    np.add.at(patched.people, codes, people)
+    np.add.at(patched.share_sums, codes, shares)
+    return patched
+
+
+class AggregateCube:
+    """Religion totals for every district, province and the nation."""
+
+    def __init__(self, df, previous=None):
+        self.units = df['Unit'].to_numpy()
+        self.weighted = 'Population' in df.columns
+        self.population = (df['Population'].to_numpy(dtype=np.float64) if self.weighted
+                           else np.ones(len(df)))
+        self.shares = df[RELIGIONS].to_numpy(dtype=np.float64)
+        self.people = self.population[:, None] * self.shares / 100
+
+        # Hierarchy index: unit -> district -> province -> nation
+        self.district_codes, districts = pd.factorize(df['District'], sort=True)
+        self.province_codes, provinces = pd.factorize(df['Province'], sort=True)
+        self.codes = {
+            'District': self.district_codes,
+            'Province': self.province_codes,
+            'National': np.zeros(len(df), dtype=np.intp),
+        }
+        self.names = {
+            'District': np.asarray(districts, dtype=object).astype(str),
+            'Province': np.asarray(provinces, dtype=object).astype(str),
+            'National': np.array(['Sri Lanka'], dtype=object),
+        }
+        # Rows patched from ``previous``, or None if every level was reduced afresh
+        self.patched_rows = None
+        self.levels = self._patch(previous) if previous is not None else None
+        if self.levels is None:
+            self.levels = self._rollup(None)
+
+    def _rollup(self, rows, names=LEVEL_NAMES):
+        if rows is None:
+            return {name: _level(self.names[name], self.codes[name], self.population, self.people, self.shares)
+                    for name in names}
+        return {name: _level(self.names[name], self.codes[name][rows], self.population[rows],
+                             self.people[rows], self.shares[rows])
+                for name in names}
+
+    def _patch(self, previous):
+        if previous.weighted != self.weighted or not self.same_hierarchy(previous):
+            return None
+        changed = np.flatnonzero((self.shares != previous.shares).any(axis=1)
+                                 | (self.population != previous.population))
+        if len(changed) > INCREMENTAL_MAX_ROWS:
+            return None
+        self.patched_rows = len(changed)
+        population = self.population[changed] - previous.population[changed]
+        people = self.people[changed] - previous.people[changed]
+        shares = self.shares[changed] - previous.shares[changed]
+        return {name: _patched(previous.levels[name], self.codes[name][changed], population, people, shares)
+                for name in LEVEL_NAMES}
+
+    def same_hierarchy(self, other):
+        return (len(self.units) == len(other.units) and np.array_equal(self.units, other.units)
+                and all(np.array_equal(self.names[name], other.names[name]) for name in LEVEL_NAMES)
+                and np.array_equal(self.district_codes, other.district_codes)
+                and np.array_equal(self.province_codes, other.province_codes))
+
+    def level(self, name, rows=None):
+        """Totals of level ``name``, over ``rows`` only if given."""
+        return self.levels[name] if rows is None else self._rollup(rows, (name,))[name]
+
+    def level_means(self, name, rows=None):
+        """``(names, means, unit_counts)`` of the non-empty groups of a level."""
+        level = self.level(name, rows)
+        present = level.units > 0
+        return level.names[present], level.means(self.weighted)[present], level.units[present].astype(np.float64)
+
+    def composition(self, rows=None):
+        """National share of each religion."""
+        means = self.level('National', rows).means(self.weighted)[0]
+        return pd.DataFrame({'Religion': RELIGIONS, 'Share %': np.nan_to_num(means).round(2)})
+
+    def province_summary(self, rows=None):
+        """Per-province religion shares, unit counts and, if known, population."""
+        level = self.level('Province', rows)
+        present = level.units > 0
+        frame = pd.DataFrame(level.means(self.weighted)[present].round(1), columns=RELIGIONS,
+                             index=pd.Index(level.names[present], name='Province'))
+        frame['Units'] = level.units[present]
+        if self.weighted:
+            frame['Population'] = level.population[present].astype(np.int64)
+        return frame
+
@@ -0,0 +1,333 @@
+"""Read-only JSON API over the dashboard's data layer.
+
+Serves the numbers the dashboard shows to other internal tools: per-unit
+metrics (majority religion, diversity index, minority share, strategy count
+and religion shares), the provincial summary and each unit's strategies. It
+reads the same process-wide dataset as the dashboard, so it never recomputes
+anything the dashboard has already built.
+
+    python api.py --port 8502                                   # API only
+    python warmup.py --serve --api-port 8502 -- --server.port 8501   # API next to the dashboard
+
+Endpoints (all ``GET``)::
+
+    /api/v1/meta                      data version, unit level, endpoints and fields
+    /api/v1/units                     every unit; filter with province=, district=, unit=
+    /api/v1/units/<unit>              one unit
+    /api/v1/provinces                 provincial summary
+    /api/v1/strategies                {unit: [strategy, ...]}; filter with unit=
+
+``fields=`` projects the rows to the listed columns, e.g.
+``/api/v1/units?fields=Unit,Diversity%20Score&province=Eastern``. Filters take
+comma-separated values or can be repeated.
+
+Every response carries an ETag derived from the data version and the
+normalized request, so a client sending ``If-None-Match`` gets ``304 Not
+Modified`` without a body until the data changes. Encoded bodies, and their
+gzip variants for clients sending ``Accept-Encoding: gzip``, are kept in an
+LRU of ``ELECTION_API_CACHE_SIZE`` responses. A repeated request is then one
+dictionary lookup and a socket write. The data version is re-checked at most
+every ``VERSION_CHECK_SECONDS``.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from data_layer import get_dataset
+from metrics import RELIGIONS
+
+logger = logging.getLogger(__name__)
+
+API_HOST = os.environ.get('ELECTION_API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('ELECTION_API_PORT', '8502'))
+API_CACHE_SIZE = int(os.environ.get('ELECTION_API_CACHE_SIZE', '256'))
+
+PREFIX = '/api/v1'
+
+VERSION_CHECK_SECONDS = 1.0
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+UNIT_FIELDS = ('Unit', 'District', 'Province', *RELIGIONS, 'Majority Religion', 'Majority %',
+               'Diversity Score', 'Minority %', 'Strategy Count')
+FILTERS = ('province', 'district', 'unit')
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Response:
+    """An encoded response body and its gzip variant."""
+
+    __slots__ = ('status', 'etag', 'body', '_gzipped', '_lock')
+
+    def __init__(self, status, etag, payload):
+        self.status = status
+        self.etag = etag
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._gzipped = None
+        self._lock = threading.Lock()
+
+    def gzipped(self):
+        if self._gzipped is None:
+            with self._lock:
+                if self._gzipped is None:
+                    self._gzipped = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+        return self._gzipped
+
+
+def _unit_table(dataset):
+    # Rounded to what the dashboard displays, in float64 so JSON has no float32 noise
+    table = dataset.df[['Unit', 'District', 'Province', *RELIGIONS]].copy()
+    table[RELIGIONS] = table[RELIGIONS].astype(np.float64).round(2)
+    metrics = dataset.metrics
+    table['Majority Religion'] = metrics['Majority Religion'].astype(str).to_numpy()
+    table['Majority %'] = metrics['Majority %'].to_numpy(dtype=np.float64).round(2)
+    table['Diversity Score'] = metrics['Diversity Score'].to_numpy(dtype=np.float64).round(4)
+    table['Minority %'] = metrics['Minority %'].to_numpy(dtype=np.float64).round(2)
+    table['Strategy Count'] = metrics['Strategy Count'].to_numpy()
+    return table.reset_index(drop=True)
+
+
+def _records(frame):
+    return json.loads(frame.to_json(orient='records', force_ascii=False))
+
+
+class Api:
+    """Routes and response cache for one process."""
+
+    def __init__(self, cache_size=API_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._responses = OrderedDict()
+        self._tables = {}
+        self._dataset = None
+        self._checked = 0.0
+        self.requests = self.hits = self.not_modified = 0
+
+    def dataset(self):
+        now = time.monotonic()
+        if self._dataset is None or now - self._checked > VERSION_CHECK_SECONDS:
+            self._dataset = get_dataset()
+            self._checked = now
+        return self._dataset
+
+    def _table(self, dataset):
+        table = self._tables.get(dataset.version)
+        if table is None:
+            table = _unit_table(dataset)
+            with self._lock:
+                # Only the current version's table is kept
+                self._tables = {dataset.version: table}
+        return table
+
+    def handle(self, target, if_none_match=None):
+        """Return ``(response, etag)`` for a request target; ``response`` is
+        None when ``if_none_match`` already names the current ``etag``."""
+        dataset = self.dataset()
+        parts = urlsplit(target)
+        query = parse_qs(parts.query)
+        # Repeated and comma-separated values are the same request
+        normalized = tuple(sorted((name, tuple(v for value in values for v in value.split(',') if v))
+                                  for name, values in query.items()))
+        key = (dataset.version, parts.path, normalized)
+        etag = 'W/"{}-{}"'.format(dataset.version, hashlib.sha1(repr(key[1:]).encode()).hexdigest()[:12])
+        with self._lock:
+            self.requests += 1
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+                self.hits += 1
+        if response is None:
+            # Route and parameters are checked before the ETag, so a 304 only
+            # ever stands for a response that would have succeeded
+            try:
+                payload = self._route(dataset, parts.path, dict(normalized))
+                response = Response(HTTPStatus.OK, etag, payload)
+            except ApiError as e:
+                return Response(e.status, None, {'error': str(e)}), None
+            with self._lock:
+                self._responses[key] = response
+                while len(self._responses) > self.cache_size:
+                    self._responses.popitem(last=False)
+        if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(',')):
+            with self._lock:
+                self.not_modified += 1
+            return None, etag
+        return response, etag
+
+    def _route(self, dataset, path, query):
+        if not path.startswith(PREFIX + '/'):
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no such endpoint: {path}")
+        resource = path[len(PREFIX) + 1:].rstrip('/')
+        if resource == 'meta':
+            return self._meta(dataset)
+        if resource == 'units':
+            return self._units(dataset, query)
+        if resource.startswith('units/'):
+            return self._unit(dataset, unquote(resource[len('units/'):]), query)
+        if resource == 'provinces':
+            return self._provinces(dataset, query)
+        if resource == 'strategies':
+            return self._strategies(dataset, query)
+        raise ApiError(HTTPStatus.NOT_FOUND, f"no such endpoint: {path}")
+
+    def _envelope(self, dataset, data):
+        return {'version': dataset.version, 'unit_label': dataset.unit_label, 'count': len(data), 'data': data}
+
+    def _meta(self, dataset):
+        return {
+            'version': dataset.version,
+            'unit_label': dataset.unit_label,
+            'units': len(dataset.df),
+            'provinces': list(dataset.province_options),
+            'endpoints': {
+                'units': {'fields': list(UNIT_FIELDS), 'filters': list(FILTERS)},
+                'provinces': {'fields': ['Province', *dataset.aggregates.province_summary().columns]},
+                'strategies': {'filters': ['unit']},
+            },
+        }
+
+    def _project(self, frame, query, fields):
+        names = query.get('fields')
+        if not names:
+            return frame
+        unknown = [name for name in names if name not in fields]
+        if unknown:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"unknown fields {unknown}; expected some of {list(fields)}")
+        return frame[list(dict.fromkeys(names))]
+
+    def _units(self, dataset, query):
+        unknown = set(query) - {'fields', *FILTERS}
+        if unknown:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"unknown parameters {sorted(unknown)}")
+        table = self._table(dataset)
+        mask = None
+        for name, column in (('province', 'Province'), ('district', 'District'), ('unit', 'Unit')):
+            if name in query:
+                matches = table[column].isin(query[name]).to_numpy()
+                mask = matches if mask is None else mask & matches
+        if mask is not None:
+            table = table[mask]
+        return self._envelope(dataset, _records(self._project(table, query, UNIT_FIELDS)))
+
+    def _unit(self, dataset, unit, query):
+        position = dataset.unit_positions.get(unit)
+        if position is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no such {dataset.unit_label.lower()}: {unit}")
+        row = self._project(self._table(dataset).iloc[[position]], query, UNIT_FIELDS)
+        return {'version': dataset.version, 'unit_label': dataset.unit_label, 'data': _records(row)[0]}
+
+    def _provinces(self, dataset, query):
+        summary = dataset.aggregates.province_summary().reset_index()
+        return self._envelope(dataset, _records(self._project(summary, query, tuple(summary.columns))))
+
+    def _strategies(self, dataset, query):
+        units = query.get('unit')
+        if units is None:
+            strategies = dataset.strategies.all_texts()
+            data = {unit: list(strategies[unit]) for unit in dataset.strategies}
+        else:
+            data = {unit: list(dataset.strategies[unit]) if unit in dataset.strategies else []
+                    for unit in units if unit in dataset.unit_positions}
+        return self._envelope(dataset, data)
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'cached': len(self._responses), 'hits': self.hits,
+                    'not_modified': self.not_modified}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so a client reusing its connection skips the TCP handshake
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; Nagle would hold the body back for
+    # the client's delayed ACK, about 40 ms on every small response
+    disable_nagle_algorithm = True
+    server_version = 'ElectionAPI/1'
+    api = None
+
+    def do_GET(self):
+        try:
+            response, etag = self.api.handle(self.path, self.headers.get('If-None-Match'))
+        except Exception:
+            logger.exception("API request failed: %s", self.path)
+            response = Response(HTTPStatus.INTERNAL_SERVER_ERROR, None, {'error': 'internal error'})
+        if response is None:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = response.body
+        gzipped = (len(body) >= GZIP_MIN_BYTES
+                   and 'gzip' in self.headers.get('Accept-Encoding', ''))
+        if gzipped:
+            body = response.gzipped()
+        self.send_response(response.status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        if response.etag:
+            self.send_header('ETag', response.etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def make_server(host=API_HOST, port=API_PORT, api=None):
+    handler = type('ApiHandler', (Handler,), {'api': api or Api()})
+    return ApiServer((host, port), handler)
+
+
+def serve_in_background(host=API_HOST, port=API_PORT):
+    """Start the API on a daemon thread of this process; return the server."""
+    server = make_server(host, port)
+    threading.Thread(target=server.serve_forever, name='election-api', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the dashboard's data as a read-only JSON API.")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+    server = make_server(args.host, args.port)
+    # Build the dataset before accepting the first request
+    server.RequestHandlerClass.api.dataset()
+    print(f"Serving http://{args.host}:{args.port}{PREFIX}/meta", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Headless rerun benchmark for dashboard.py.
+
+Drives the dashboard with ``streamlit.testing.v1.AppTest`` against synthetic
+datasets of 25 (districts), 160 (polling divisions) and 14,000 (GN divisions)
+units. Each scripted interaction is repeated and reported as p50/p95 rerun
+wall time, peak RSS and the serialized element payload. The payload is that of
+the settled page: after each timed rerun, background jobs (the simulation) are
+waited for and the page is rerun untimed, so it does not depend on whether a
+job happened to finish within the timed rerun. The Messaging tab's KPIs read a
+synthetic field activity log written next to each dataset.
+
+    python benchmark.py                      # run and print a report
+    python benchmark.py --save-baseline      # record benchmark_baseline.json
+    python benchmark.py --check              # fail if slower than the baseline
+
+Every scale runs in its own subprocess so peak RSS is measured per dataset.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent
+APP = ROOT / 'dashboard.py'
+BASELINE = ROOT / 'benchmark_baseline.json'
+
+SCALES = [25, 160, 14000]
+
+# Allowed slowdown relative to the baseline before --check fails
+TIME_TOLERANCE = 1.5
+PAYLOAD_TOLERANCE = 1.1
+RSS_TOLERANCE = 1.25
+
+# Longest wait for background jobs after a rerun before the run fails
+SETTLE_TIMEOUT = 600
+
+ACTIVITY_EVENTS = 100_000
+
+
+def _peak_rss_mb():
+    # On Linux a child's ru_maxrss starts at its parent's peak, which holds the
+    # data generated by prepare(), so read this process's own high-water mark
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _payload_bytes(at):
+    def walk(node):
+        proto = getattr(node, 'proto', None)
+        total = proto.ByteSize() if proto is not None and hasattr(proto, 'ByteSize') else 0
+        for child in getattr(node, 'children', {}).values():
+            total += walk(child)
+        return total
+    return walk(at.main) + walk(at.sidebar)
+
+
+def _settle(at, timeout=SETTLE_TIMEOUT):
+    from jobs import job_queue
+
+    # A job can finish between the rerun and this check, so the page, not the
+    # queue, says whether it is settled: it is once no job progress bar is left
+    deadline = time.monotonic() + timeout
+    while at.get('progress'):
+        while job_queue().stats()['running']:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"background jobs still running after {timeout} s")
+            time.sleep(0.05)
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"page still shows a running job after {timeout} s")
+        at.run()
+
+
+def prepare(n_units, data_dir):
+    """Write the synthetic data of one scale, unless already there, and return
+    the environment that points the dashboard at it. Runs in the parent so
+    generating the data does not count towards the worker's peak RSS."""
+    from synthetic import write_activity, write_sqlite
+
+    path, level = write_sqlite(n_units, data_dir)
+    # The synthetic SQLite file also holds the history table
+    env = {'ELECTION_DEMOGRAPHICS': str(path), 'ELECTION_STRATEGIES': str(path), 'ELECTION_HISTORY': str(path),
+           'ELECTION_LEVEL': level}
+    # The field activity log, ingested through activity.py against the dataset
+    reports = write_activity(n_units, data_dir, events=ACTIVITY_EVENTS)
+    log = Path(data_dir) / f'{reports.stem}.db'
+    if not log.exists():
+        partial = log.with_name(f'{log.name}.{os.getpid()}.tmp')
+        subprocess.run([sys.executable, str(ROOT / 'activity.py'), '--db', str(partial), 'ingest', str(reports)],
+                       env=os.environ | env, check=True, stdout=subprocess.DEVNULL)
+        os.replace(partial, log)
+        for suffix in ('-wal', '-shm'):
+            Path(f'{partial}{suffix}').unlink(missing_ok=True)
+    env['ELECTION_ACTIVITY_DB'] = str(log)
+    return env
+
+
+def _interactions(at):
+    """Yield ``(name, action)`` pairs; each action mutates ``at`` before a rerun."""
+    units = [u for u in at.selectbox(key='selected_district').options if u != 'All']
+    strategy_units = list(at.selectbox(key='strategy_district').options)
+    pair = units[:2] if len(units) > 1 else units * 2
+    strategy_pair = strategy_units[:2] if len(strategy_units) > 1 else strategy_units * 2
+
+    def rerun(at, i):
+        pass
+
+    def select_unit(at, i):
+        at.selectbox(key='selected_district').select(pair[i % 2])
+
+    def toggle_heatmap(at, i):
+        at.selectbox(key='selected_district').select('All' if i % 2 == 0 else pair[0])
+
+    def select_strategy(at, i):
+        if strategy_pair:
+            at.selectbox(key='strategy_district').select(strategy_pair[i % 2])
+
+    def filter_province(at, i):
+        at.multiselect(key='filter_provinces').set_value(['Western'] if i % 2 == 0 else [])
+
+    def select_archetypes(at, i):
+        at.slider(key='archetype_k').set_value(8 if i % 2 == 0 else 6)
+
+    def simulate(at, i):
+        at.slider(key='sim_support_Buddhist').set_value(40 if i % 2 == 0 else 35)
+
+    def optimize(at, i):
+        at.slider(key='opt_budget').set_value(50 if i % 2 == 0 else 20)
+
+    def activity_window(at, i):
+        at.select_slider(key='activity_window').set_value(90 if i % 2 == 0 else 28)
+
+    def reload_data(at, i):
+        at.button(key='reload_data').click()
+
+    yield 'rerun', rerun
+    yield 'tab2_selected_district', select_unit
+    yield 'tab2_heatmap', toggle_heatmap
+    yield 'tab3_strategy_district', select_strategy
+    yield 'tab4_archetypes', select_archetypes
+    yield 'tab4_simulator', simulate
+    yield 'tab4_optimizer', optimize
+    yield 'tab5_activity_window', activity_window
+    yield 'sidebar_filter', filter_province
+    yield 'reload_data', reload_data
+
+
+def run_scale(n_units, repeats):
+    """Benchmark one dataset size in the current process, whose environment
+    comes from :func:`prepare`."""
+    from streamlit.testing.v1 import AppTest
+
+    level = os.environ['ELECTION_LEVEL']
+
+    at = AppTest.from_file(str(APP), default_timeout=600)
+    start = time.perf_counter()
+    at.run()
+    elapsed = (time.perf_counter() - start) * 1000
+    _settle(at)
+    results = {'cold_start': {
+        'p50_ms': elapsed,
+        'p95_ms': elapsed,
+        'payload_bytes': _payload_bytes(at),
+        'peak_rss_mb': _peak_rss_mb(),
+    }}
+    if at.exception:
+        raise RuntimeError(f"dashboard raised: {at.exception[0].message}")
+    from data_layer import get_dataset
+
+    if not get_dataset().aggregates.weighted:
+        raise RuntimeError("synthetic data has no Population column; aggregates are not population-weighted")
+
+    for name, action in _interactions(at):
+        timings = []
+        for i in range(repeats):
+            action(at, i)
+            start = time.perf_counter()
+            at.run()
+            timings.append((time.perf_counter() - start) * 1000)
+            _settle(at)
+        results[name] = {
+            'p50_ms': float(np.percentile(timings, 50)),
+            'p95_ms': float(np.percentile(timings, 95)),
+            'payload_bytes': _payload_bytes(at),
+            'peak_rss_mb': _peak_rss_mb(),
+        }
+    return {'units': n_units, 'level': level, 'interactions': results}
+
+
+def run_all(scales, repeats, data_dir):
+    report = {}
+    for n_units in scales:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as out:
+            out_path = out.name
+        try:
+            subprocess.run([sys.executable, __file__, '--worker', str(n_units),
+                            '--repeats', str(repeats), '--output', out_path],
+                           env=os.environ | prepare(n_units, data_dir), check=True)
+            with open(out_path) as f:
+                report[str(n_units)] = json.load(f)
+        finally:
+            os.unlink(out_path)
+    return report
+
+
+def print_report(report):
+    print(f"{'units':>6} {'interaction':<24} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'payload KB':>11} {'peak RSS MB':>12}")
+    for scale in report.values():
+        for name, row in scale['interactions'].items():
+            print(f"{scale['units']:>6} {name:<24} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+                  f"{row['payload_bytes'] / 1024:>11.1f} {row['peak_rss_mb']:>12.1f}")
+
+
+def check_against(report, baseline):
+    """Return a list of regressions of ``report`` relative to ``baseline``."""
+    failures = []
+    for scale, current in report.items():
+        reference = baseline.get(scale)
+        if reference is None:
+            continue
+        for name, row in current['interactions'].items():
+            ref = reference['interactions'].get(name)
+            if ref is None:
+                continue
+            limits = [
+                ('p95_ms', TIME_TOLERANCE),
+                ('payload_bytes', PAYLOAD_TOLERANCE),
+                ('peak_rss_mb', RSS_TOLERANCE),
+            ]
+            for metric, tolerance in limits:
+                if row[metric] > ref[metric] * tolerance:
+                    failures.append(f"{scale} units / {name}: {metric} {row[metric]:.1f} "
+                                    f"> {tolerance}x baseline {ref[metric]:.1f}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'election-bench'))
+    parser.add_argument('--baseline', default=str(BASELINE))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = run_scale(args.worker, args.repeats)
+        with open(args.output, 'w') as f:
+            json.dump(result, f)
+        return 0
+
+    report = run_all(args.scales, args.repeats, args.data_dir)
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline) as f:
+            failures = check_against(report, json.load(f))
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,29 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
 
+from activity import DEFAULT_WINDOW, RESPONSE_TARGET_HOURS, TOUCHPOINT_TARGET, WINDOWS, get_activity, \
+    kpi_frame
+from data_layer import cache_stats, invalidate
+from filters import filter_rows, filter_sidebar, get_filter_index, show_no_matches
+from figures import MAP_METRICS, clear_figures, figure_cache, map_selection, show_figure, start_prewarm
+from geo import geometry_version
+from history import CENSUS_YEAR, clear_history, get_history, history_version
+from instrumentation import show_debug_panel, span
+from jobs import job_queue, run_job, show_job
+from instrumentation import start as start_instrumentation
+from memory import show_memory_report, track_session
+from metrics import RELIGIONS
+from rendering import begin_run, end_run, fragment, show_render_log
+from results_feed import get_results, mark_seen, watch
+from search import clear_index, get_index, timed_search
+from optimizer import DEFAULT_BUDGET, DEFAULT_COSTS, DEFAULT_WEIGHTS, MAX_EVENTS, WEIGHT_NAMES, Plan, optimize
+from similarity import ARCHETYPE_RANGE, DEFAULT_ARCHETYPES, MAX_NEIGHBOURS, get_archetypes, \
+    get_similarity, similar_units
+from simulator import CATEGORIES, DEFAULT_SUPPORT, Scenario, simulate
+from tenants import DEFAULT_TENANT, current_tenant, get_tenant_dataset, show_tenant_stats
+from warmup import record_first_run, show_startup_report
+
 # Set page title and icon
 # Page configuration
 st.set_page_config(
@@ -22,470 +41,524 @@ st.markdown("""
 This dashboard visualizes the UNP's comprehensive strategy to rebuild from their historic 2020 defeat by engaging with religious communities across all 25 districts of Sri Lanka.
 """)
 
-# Data preparation
-districts_data = {
-    # Western Province
-    'Colombo': {'Province': 'Western', 'Buddhist': 70.66, 'Muslim': 11.76, 'Christian': 9.56, 'Hindu': 7.89},
-    'Gampaha': {'Province': 'Western', 'Buddhist': 71.48, 'Christian': 21.19, 'Muslim': 5.01, 'Hindu': 2.28},
-    'Kalutara': {'Province': 'Western', 'Buddhist': 83.52, 'Muslim': 9.40, 'Christian': 3.79, 'Hindu': 3.27},
-    
-    # Central Province
-    'Kandy': {'Province': 'Central', 'Buddhist': 73.0, 'Muslim': 14.0, 'Hindu': 9.5, 'Christian': 2.5},
-    'Matale': {'Province': 'Central', 'Buddhist': 85.0, 'Hindu': 8.0, 'Muslim': 5.0, 'Christian': 2.0},
-    'Nuwara Eliya': {'Province': 'Central', 'Hindu': 51.04, 'Buddhist': 39.67, 'Christian': 6.55, 'Muslim': 2.71},
-    
-    # Southern Province
-    'Galle': {'Province': 'Southern', 'Buddhist': 93.9, 'Muslim': 3.7, 'Hindu': 1.5, 'Christian': 0.9},
-    'Matara': {'Province': 'Southern', 'Buddhist': 95.0, 'Muslim': 3.0, 'Hindu': 2.0, 'Christian': 0.7},
-    'Hambantota': {'Province': 'Southern', 'Buddhist': 90.0, 'Muslim': 6.0, 'Hindu': 3.0, 'Christian': 1.0},
-    
-    # Eastern Province
-    'Trincomalee': {'Province': 'Eastern', 'Muslim': 42.11, 'Buddhist': 26.12, 'Hindu': 25.95, 'Christian': 5.79},
-    'Batticaloa': {'Province': 'Eastern', 'Hindu': 70.0, 'Muslim': 20.0, 'Buddhist': 8.0, 'Christian': 2.0},
-    'Ampara': {'Province': 'Eastern', 'Muslim': 43.4, 'Buddhist': 38.7, 'Hindu': 15.8, 'Christian': 2.0},
-    
-    # North Central Province
-    'Anuradhapura': {'Province': 'North Central', 'Buddhist': 90.0, 'Muslim': 8.4, 'Christian': 1.1, 'Hindu': 0.5},
-    'Polonnaruwa': {'Province': 'North Central', 'Buddhist': 89.7, 'Muslim': 7.5, 'Hindu': 1.7, 'Christian': 1.0},
-    
-    # North Western Province
-    'Kurunegala': {'Province': 'North Western', 'Buddhist': 92.5, 'Muslim': 7.7, 'Hindu': 0.95, 'Christian': 0.85},
-    'Puttalam': {'Province': 'North Western', 'Buddhist': 40.0, 'Christian': 30.0, 'Muslim': 18.0, 'Hindu': 3.0},
-    
-    # Northern Province
-    'Jaffna': {'Province': 'Northern', 'Hindu': 80.0, 'Christian': 15.0, 'Muslim': 3.0, 'Buddhist': 2.0},
-    'Kilinochchi': {'Province': 'Northern', 'Hindu': 75.0, 'Christian': 20.0, 'Muslim': 3.0, 'Buddhist': 2.0},
-    'Mannar': {'Province': 'Northern', 'Christian': 60.0, 'Hindu': 25.0, 'Muslim': 10.0, 'Buddhist': 5.0},
-    'Vavuniya': {'Province': 'Northern', 'Hindu': 65.0, 'Christian': 20.0, 'Muslim': 10.0, 'Buddhist': 5.0},
-    'Mullaitivu': {'Province': 'Northern', 'Hindu': 70.0, 'Christian': 20.0, 'Muslim': 5.0, 'Buddhist': 5.0},
-    
-    # Uva Province
-    'Badulla': {'Province': 'Uva', 'Buddhist': 70.0, 'Hindu': 20.0, 'Muslim': 8.0, 'Christian': 2.0},
-    'Monaragala': {'Province': 'Uva', 'Buddhist': 85.0, 'Hindu': 10.0, 'Muslim': 4.0, 'Christian': 1.0},
-    
-    # Sabaragamuwa Province
-    'Ratnapura': {'Province': 'Sabaragamuwa', 'Buddhist': 80.0, 'Muslim': 12.0, 'Hindu': 6.0, 'Christian': 2.0},
-    'Kegalle': {'Province': 'Sabaragamuwa', 'Buddhist': 85.0, 'Christian': 8.0, 'Muslim': 5.0, 'Hindu': 2.0}
-}
-
-# Strategies data
-strategies_data = {
-    'Colombo': [
-        "Buddhist Service Hubs: Partner with Gangaramaya and Kelaniya temples on urban poverty clinics",
-        "Interfaith Education Forum: Convene mosque, church, and temple leaders quarterly",
-        "Youth Tech Incubators: Host 'NextGen Colombo' hackathons in temple grounds"
-    ],
-    'Gampaha': [
-        "Church-Linked STEM Scholarships: Collaborate with Catholic and Protestant schools",
-        "Buddhist Temple-Jobs Link: 'Sunday with the Sangha' vocational training",
-        "Microfinance Clinics: Small-business loans for home-based entrepreneurs"
-    ],
-    'Kalutara': [
-        "Fishers' Relief Fund: Co-create Muslim community council for cyclone-resilience grants",
-        "Vesak Environmental Drive: Sponsor green lighting at Kalutara Bodhiya",
-        "Rail Underpass Advocacy: Town halls with Buddhist clergy and farmers"
-    ],
-    'Kandy': [
-        "Perahera Dialogues: Link Temple of the Tooth with youth entrepreneurship training",
-        "Merchant Microgrants: Support Muslim small traders through mosque committees",
-        "Hindu Temple Fairs: Sponsor logistics at Kataragama-style festivals"
-    ],
-    'Trincomalee': [
-        "Interfaith Port Plans: Present UNP's northeast port-expansion vision",
-        "Beach-Clean Initiatives: Multi-faith clean-ups at Koneswaram Temple",
-        "Ramadan & Vesak Clinics: Mobile health units during religious observances"
-    ],
-    'Nuwara Eliya': [
-        "Tea-Worker Welfare Boards: Joint committees with Tamil unions and Sinhala elders",
-        "Poya-Day Clinics: Free clinics promoted through kovils, viharas, and churches",
-        "Inter-Community Tea-Tours: Use factory tours for community dialogue"
-    ],
-    'Matale': [
-        "Temple-Farmers Roundtables: Partner with kovils and viharas to support smallholder tea and vegetable farmers through knowledge exchanges",
-        "Heritage Tourism Workshops: Interfaith tours of Aluvihare Rock Temple and Dutch Fort led by local religious guides",
-        "Youth Sports Leagues: Cross-faith cricket and volleyball tournaments sponsored by temples, churches, mosques, and kovils"
-    ],
-    'Galle': [
-        "Sea2Temple Clean-Ups: Multi-faith beach cleanup drives along Unawatuna and Galle beaches",
-        "Fort Heritage Festivals: Annual interfaith cultural fair at Galle Fort hosted by Buddhist, Hindu, Muslim, and Christian groups",
-        "Fisher Livelihood Grants: Microfinance for small-scale fishermen in partnership with local churches and mosques"
-    ],
-    'Matara': [
-        "Nilwala River Health Camps: Mobile clinics promoted through temples, churches, and mosques along the river basin",
-        "Teardrop Temple Tours: Inter-community tours of the Parevi Duwa temple and Matara Fort led by youth volunteers",
-        "Women’s Vocational Training: Skill-building workshops at temples and churches for single mothers"
-    ],
-    'Hambantota': [
-        "Port Community Dialogues: Quarterly town halls with Buddhist and Muslim leaders on port expansion benefits",
-        "Wildlife Conservation Drives: Interfaith volunteer days at Bundala and Yala national parks",
-        "Youth Coding Bootcamps: Hackathons hosted in local religious centres to build digital literacy"
-    ],
-    'Batticaloa': [
-        "Tamil-Muslim Cultural Fairs: Joint celebrations of Hindu and Islamic festivals alongside church choirs",
-        "Fisher Welfare Workshops: Vocational training for coastal fishermen via kovils and mosque committees",
-        "Youth Peacebuilding Camps: Residential interfaith programs for Christian, Hindu, and Muslim youth"
-    ],
-    'Ampara': [
-        "Agrarian Extension Clinics: Mobile agriculture advice via mosque, kovil, and church networks",
-        "Ramadan & Poson Food Drives: Joint community meals distributed through temples and mosques",
-        "Women’s Literacy Circles: Faith-based adult education classes run from churches and mosques"
-    ],
-    'Anuradhapura': [
-        "Sacred Site Pilgrimages: Interfaith guided tours of Sri Maha Bodhi and ancient stupas",
-        "Agricultural Microgrants: Support for paddy farmers via temple and mosque patronage",
-        "Cultural Youth Camps: Camps teaching heritage traditions across Buddhism, Islam, Hinduism, and Christianity"
-    ],
-    'Polonnaruwa': [
-        "Heritage Conservation Projects: Volunteer restoration days at Vatadage and kovils",
-        "Temple-Mosque Dialogue Forums: Monthly interfaith dialogues inside the medieval city walls",
-        "Youth Scholarship Awards: Cross-religion academic scholarships funded by local clergy"
-    ],
-    'Kurunegala': [
-        "Faith & Farming Workshops: Sustainable agriculture training at temple and mosque grounds",
-        "Buddhist-Church Youth Festivals: Annual festivals with music, dance and sports competitions",
-        "Volunteer Health Camps: Mobile clinics rotating between kovils, viharas, and churches"
-    ],
-    'Puttalam': [
-        "Saltworker Support Fund: Microfinance for salt-pan communities via mosque and church partnerships",
-        "Interfaith Mangrove Clean-ups: Coastal restoration drives led by Hindu, Muslim, and Christian volunteers",
-        "Youth Entrepreneurship Grants: Seed funding for interfaith youth-led social enterprises"
-    ],
-    'Jaffna': [
-        "Temple & Church Heritage Tours: Joint cultural tours of Nallur Kandaswamy Kovil and Jaffna Cathedral",
-        "Fisher Livelihood Training: Modern fishing techniques taught under mosque and kovil sponsorship",
-        "Youth Debate Clubs: Interfaith public speaking competitions in schools and temples"
-    ],
-    'Kilinochchi': [
-        "Post-War Healing Circles: Interfaith trauma support sessions hosted by churches and kovils",
-        "Vocational Training Hubs: Skill centers at mosque and temple grounds for unemployed youth",
-        "Cultural Music Festivals: Joint concerts of Hindu, Muslim, and Christian devotional music"
-    ],
-    'Mannar': [
-        "Fisher Empowerment Forums: Community discussions with Tamil Catholic and Muslim fishing leaders",
-        "Beach Safety Clinics: First-aid training at local kovils and churches",
-        "Youth Film Workshops: Interfaith storytelling film camps supported by clergy"
-    ],
-    'Vavuniya': [
-        "Reconciliation Seminars: Interfaith dialogue on post-conflict healing at churches and kovils",
-        "Agricultural Co-ops: Joint farmer cooperatives supported by mosque and temple committees",
-        "Sports for Peace: Mixed-faith sports tournaments in local community centers"
-    ],
-    'Mullaitivu': [
-        "Island Fisher Microfinance: Low-interest loans for island fishing communities via mosque networks",
-        "Trauma Counseling Centers: Faith-based counseling run by church and kovil volunteers",
-        "Youth Arts Workshops: Cross-community art programs in schools and religious centers"
-    ],
-    'Badulla': [
-        "Tea Estate Health Camps: Mobile clinics in plantation areas via temples and churches",
-        "Poson Pilgrimage Support: Joint pilgrim transport services run by kovil and church committees",
-        "Mountain Trail Clean-ups: Conservation days in the Knuckles range with multi-faith volunteers"
-    ],
-    'Monaragala': [
-        "Rural Livelihood Training: Skill workshops at temples, kovils, and mosque grounds for subsistence farmers",
-        "Interfaith Literacy Drives: Adult reading classes hosted by churches and viharas",
-        "Youth Leadership Forums: Cross-faith leadership training for local high school students"
-    ],
-    'Ratnapura': [
-        "Gem Mining Safety Clinics: Health and safety workshops for mine workers via Buddhist and Christian centers",
-        "Rainforest Restoration Drives: Reforestation projects led by temple and church youth groups",
-        "Scholarship Fairs: Cross-community education fairs sponsored by clergy"
-    ],
-    'Kegalle': [
-        "Rubber Farmer Roundtables: Knowledge exchange sessions at kovils and viharas",
-        "Temple-Mosque Food Banks: Joint food distribution programs in low-income areas",
-        "Youth Heritage Projects: Community history mapping with multi-faith student teams"
-    ]
-}
-
-# Create DataFrame
-df = pd.DataFrame.from_dict(districts_data, orient='index').reset_index()
-df.rename(columns={'index': 'District'}, inplace=True)
-
-# Fill missing values
-for col in ['Buddhist', 'Muslim', 'Christian', 'Hindu']:
-    df[col] = df[col].fillna(0)
-
-# Sidebar
-# st.sidebar.header("🔍 Filters")
-
-# # Province filter
-# provinces = ['All'] + sorted(df['Province'].unique().tolist())
-# selected_province = st.sidebar.selectbox("Select Province", provinces)
-
-# # Religion filter
-# religions = ['All', 'Buddhist', 'Muslim', 'Christian', 'Hindu']
-# selected_religion = st.sidebar.selectbox("Highlight Religion", religions)
-
-# Filter data
-# filtered_df = df.copy()
-# if selected_province != 'All':
-#     filtered_df = filtered_df[filtered_df['Province'] == selected_province]
+start_instrumentation()
+begin_run()
+
+# Data preparation (built once per process and tenant, and shared across sessions)
+tenant = current_tenant()
+if tenant.id != DEFAULT_TENANT:
+    st.caption(f"Tenant: {tenant.title}")
+with span('data.prepare'):
+    dataset = get_tenant_dataset(tenant)
+df = dataset.df
+strategies_data = dataset.strategies
+unit_label = dataset.unit_label
+start_prewarm(dataset)
+# The results feed and field reports name the default tenant's units
+results = get_results(dataset) if tenant.id == DEFAULT_TENANT else None
+activity = get_activity(dataset) if tenant.id == DEFAULT_TENANT else None
+
+# Sidebar filters, applied across every tab as row positions into the shared tables
+filters = filter_sidebar(dataset)
+filter_index = get_filter_index(dataset)
+rows = filter_rows(dataset, filters)
+
+# Data cache status
+stats = cache_stats()
+st.sidebar.metric("Data cache hits", stats.hits, f"{stats.misses} misses", delta_color="off")
+figures = figure_cache()
+st.sidebar.caption(f"Figure cache: {len(figures)} figures, {figures.hits} hits, "
+                   f"{figures.misses} misses, {figures.evictions} evictions")
+jobs = job_queue().stats()
+st.sidebar.caption(f"Background jobs: {jobs['running']} running, {jobs['cached']} cached, "
+                   f"{jobs['reused']} reused, {jobs['joined']} joined, {jobs['cancelled']} cancelled")
+show_tenant_stats(tenant)
+if st.sidebar.button("Reload data", key="reload_data"):
+    invalidate()
+    clear_figures()
+    clear_index()
+    clear_history()
+    job_queue().clear()
+    st.rerun()
 
 # Main content with tabs
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Overview", "🗺️ District Analysis", "🤝 Strategies", "📈 Analytics", "📣 Messaging & Branding"])
 
-with tab1:
+@fragment("overview")
+def render_overview():
     st.header("Overview of Religious Demographics")
+    if show_no_matches(dataset, rows):
+        return
     
     col1, col2 = st.columns(2)
     
     with col1:
         # Summary statistics
         st.subheader("National Religious Composition")
-        avg_buddhist = df['Buddhist'].mean()
-        avg_muslim = df['Muslim'].mean()
-        avg_christian = df['Christian'].mean()
-        avg_hindu = df['Hindu'].mean()
-        
-        summary_df = pd.DataFrame({
-            'Religion': ['Buddhist', 'Muslim', 'Christian', 'Hindu'],
-            'Average %': [avg_buddhist, avg_muslim, avg_christian, avg_hindu]
-        })
-        
-        fig_pie = px.pie(summary_df, values='Average %', names='Religion', 
-                        title="Average Religious Distribution Across Districts",
-                        color_discrete_map={
-                            'Buddhist': '#FF6B6B',
-                            'Muslim': '#4ECDC4',
-                            'Christian': '#45B7D1',
-                            'Hindu': '#96CEB4'
-                        })
-        st.plotly_chart(fig_pie, use_container_width=True)
+        show_figure(dataset, 'overview_pie', filters, colors=tenant.colors)
     
     with col2:
         # Province-wise breakdown
         st.subheader("Religious Majority by Province")
-        province_stats = []
-        for province in df['Province'].unique():
-            prov_data = df[df['Province'] == province]
-            for _, row in prov_data.iterrows():
-                majority_religion = max(['Buddhist', 'Muslim', 'Christian', 'Hindu'], 
-                                      key=lambda x: row[x])
-                province_stats.append({
-                    'Province': province,
-                    'District': row['District'],
-                    'Majority Religion': majority_religion,
-                    'Percentage': row[majority_religion]
-                })
+        show_figure(dataset, 'majority_bar', filters, colors=tenant.colors)
+
+with tab1:
+    render_overview()
+
+def render_live_district(district):
+    st.subheader(f"Live Results - {district}")
+    frame, reported = results.district_frame(district)
+    mark_seen(results, district)
+    if frame.empty:
+        st.info("No results reported yet.")
+        return
+    st.metric("Polling Divisions Reported", reported)
+    st.metric("Leading Party", frame['Party'].iloc[0], f"{frame['Votes'].iloc[0]:,} votes")
+    st.bar_chart(frame, x='Party', y='Votes')
+
+# Similar units listed in tabs 2 and 3
+SIMILAR_UNITS = 5
+
+def render_similar_units(unit):
+    st.subheader(f"Similar {unit_label}s")
+    archetype = get_archetypes(dataset).unit_archetype(dataset.unit_positions[unit])
+    st.caption(f"Closest religious composition; distance is in percentage points. "
+               f"Engagement archetype: **{archetype}**")
+    k = st.slider(f"{unit_label}s to list", 1, MAX_NEIGHBOURS, SIMILAR_UNITS, key="similar_k")
+    similar = similar_units(dataset, unit, k, rows)
+    if similar.empty:
+        st.info(f"No other {unit_label}s match the sidebar filters.")
+        return
+    st.dataframe(similar.rename(columns={'Unit': unit_label}).round(2),
+                 use_container_width=True, hide_index=True)
+
+@fragment("district_detail")
+def render_district_detail(selected_district):
+    # Individual district analysis
+    district_data = dataset.unit_row(selected_district)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader(f"{selected_district} {unit_label}")
+        st.write(f"**Province:** {district_data['Province']}")
+        
+        show_figure(dataset, 'district_composition', selected_district, colors=tenant.colors)
+    
+    with col2:
+        st.subheader("Key Statistics")
+        unit = dataset.unit_metrics(selected_district)
+        st.metric("Majority Religion", unit['Majority Religion'], 
+                 f"{unit['Majority %']:.1f}%")
         
-        province_df = pd.DataFrame(province_stats)
-        fig_bar = px.bar(province_df, x='District', y='Percentage', 
-                        color='Majority Religion',
-                        title='Religious Majority by District',
-                        color_discrete_map={
-                            'Buddhist': '#FF6B6B',
-                            'Muslim': '#4ECDC4',
-                            'Christian': '#45B7D1',
-                            'Hindu': '#96CEB4'
-                        })
-        fig_bar.update_xaxes(tickangle=45)
-        st.plotly_chart(fig_bar, use_container_width=True)
+        st.metric("Religious Diversity Index", f"{unit['Diversity Score']:.3f}", 
+                 "Higher = More Diverse")
+        
+        st.metric("Minority Population", f"{unit['Minority %']:.1f}%")
+        
+        if results is not None:
+            render_live_district(district_data['District'])
+    
+    render_similar_units(selected_district)
+    
+    history = get_history(dataset)
+    if len(history.years) > 1:
+        render_unit_trend(selected_district, history)
 
-with tab2:
+def render_unit_trend(unit, history):
+    st.subheader("Trends")
+    position = dataset.unit_positions[unit]
+    version = history_version(dataset)
+    trend_col1, trend_col2 = st.columns(2)
+    with trend_col1:
+        show_figure(dataset, 'unit_trend', (unit, history.census_series, version), colors=tenant.colors)
+    with trend_col2:
+        if history.other_series:
+            show_figure(dataset, 'unit_trend', (unit, history.other_series, version), colors=tenant.colors)
+    st.dataframe(history.unit_changes(position), use_container_width=True, hide_index=True)
+
+@fragment("map")
+def render_map():
+    st.subheader("Choropleth Map")
+    
+    map_col1, map_col2, map_col3 = st.columns(3)
+    metric = map_col1.radio("Colour by", MAP_METRICS, horizontal=True, key="map_metric")
+    choice = map_col2.selectbox("Zoom to province", ('All',) + dataset.province_options, key="map_province")
+    map_province = None if choice == 'All' else choice
+    map_district = None
+    if unit_label != 'District':
+        choice = map_col3.selectbox("Zoom to district", ('All',) + dataset.district_options[map_province],
+                                    key="map_district")
+        map_district = None if choice == 'All' else choice
+    
+    show_figure(dataset, 'choropleth', map_selection(dataset, metric, map_province, map_district, filters),
+                colors=tenant.colors)
+
+@fragment("district_analysis")
+def render_district_analysis():
     st.header("District-Level Religious Analysis")
+    if show_no_matches(dataset, rows):
+        return
     
     # District selector
-    selected_district = st.selectbox("Select District for Detailed View", 
-                                    ['All'] + sorted(df['District'].tolist()))
+    selected_district = st.selectbox(f"Select {unit_label} for Detailed View", 
+                                    ('All',) + filter_index.unit_options(rows),
+                                    key="selected_district")
     
     if selected_district == 'All':
-        # Heatmap of all districts
+        # Heatmap aggregated on the server, with drill-down
         st.subheader("Religious Composition Heatmap")
         
-        heatmap_data = df.set_index('District')[['Buddhist', 'Muslim', 'Christian', 'Hindu']]
+        group_options = {'Province': 'Province', 'District': 'District'}
+        if unit_label != 'District':
+            group_options[unit_label] = 'Unit'
+        group_col1, group_col2, group_col3 = st.columns(3)
+        group_by = group_col1.radio("Group rows by", list(group_options), index=1,
+                                    horizontal=True, key="heatmap_group")
+        group_by = group_options[group_by]
         
-        fig_heatmap = px.imshow(heatmap_data.values,
-                               labels=dict(x="Religion", y="District", color="Percentage"),
-                               x=['Buddhist', 'Muslim', 'Christian', 'Hindu'],
-                               y=heatmap_data.index,
-                               color_continuous_scale='Viridis',
-                               title='Religious Demographics Across All Districts')
-        fig_heatmap.update_layout(height=800)
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+        heatmap_province = heatmap_district = None
+        if group_by != 'Province':
+            choice = group_col2.selectbox("Province", ('All',) + dataset.province_options,
+                                          key="heatmap_province")
+            heatmap_province = None if choice == 'All' else choice
+        if group_by == 'Unit':
+            choice = group_col3.selectbox("District", ('All',) + dataset.district_options[heatmap_province],
+                                          key="heatmap_district")
+            heatmap_district = None if choice == 'All' else choice
         
-    else:
-        # Individual district analysis
-        district_data = df[df['District'] == selected_district].iloc[0]
+        show_figure(dataset, 'heatmap', (group_by, heatmap_province, heatmap_district, filters),
+                    colors=tenant.colors)
         
-        col1, col2 = st.columns(2)
+        if geometry_version(unit_label) is not None:
+            render_map()
         
-        with col1:
-            st.subheader(f"{selected_district} District")
-            st.write(f"**Province:** {district_data['Province']}")
-            
-            # Religion percentages
-            religions_pct = {
-                'Buddhist': district_data['Buddhist'],
-                'Muslim': district_data['Muslim'],
-                'Christian': district_data['Christian'],
-                'Hindu': district_data['Hindu']
-            }
-            
-            fig_district = px.bar(x=list(religions_pct.keys()), 
-                                 y=list(religions_pct.values()),
-                                 title=f"Religious Composition - {selected_district}",
-                                 color=list(religions_pct.keys()),
-                                 color_discrete_map={
-                                     'Buddhist': '#FF6B6B',
-                                     'Muslim': '#4ECDC4',
-                                     'Christian': '#45B7D1',
-                                     'Hindu': '#96CEB4'
-                                 })
-            fig_district.update_layout(showlegend=False)
-            st.plotly_chart(fig_district, use_container_width=True)
+        if results is not None:
+            st.subheader("Live Results by Province")
+            province_results = results.province_frame()
+            mark_seen(results)
+            if province_results.empty:
+                st.info("No results reported yet.")
+            else:
+                st.dataframe(province_results.join(dataset.aggregates.province_summary(), how='left'),
+                             use_container_width=True)
         
-        with col2:
-            st.subheader("Key Statistics")
-            majority_religion = max(religions_pct.keys(), key=lambda x: religions_pct[x])
-            st.metric("Majority Religion", majority_religion, 
-                     f"{religions_pct[majority_religion]:.1f}%")
-            
-            diversity_score = 1 - sum((p/100)**2 for p in religions_pct.values() if p > 0)
-            st.metric("Religious Diversity Index", f"{diversity_score:.3f}", 
-                     "Higher = More Diverse")
-            
-            total_minorities = 100 - religions_pct[majority_religion]
-            st.metric("Minority Population", f"{total_minorities:.1f}%")
+    else:
+        render_district_detail(selected_district)
 
-with tab3:
-    st.header("Faith-Sensitive Engagement Strategies")
-    
+with tab2:
+    render_district_analysis()
+
+def render_similar_strategies(unit):
+    candidates = filter_index.strategy_rows[True]
+    if rows is not None:
+        candidates = np.intersect1d(candidates, rows, assume_unique=True)
+    positions, distances = get_similarity(dataset).similar(dataset.unit_positions[unit], SIMILAR_UNITS,
+                                                           candidates)
+    if not len(positions):
+        return
+    st.subheader(f"Strategies from Similar {unit_label}s")
+    for position, distance in zip(positions, distances):
+        other = df['Unit'].iloc[position]
+        with st.expander(f"{other} ({df['Province'].iloc[position]}) · {distance:.1f} pts apart"):
+            for i, strategy in enumerate(strategies_data[other], 1):
+                st.write(f"**{i}.** {strategy}")
+
+@fragment("strategy_detail")
+def render_strategy_detail():
     # Strategy search
-    strategy_district = st.selectbox("Select District for Strategy Details", 
-                                   sorted([d for d in strategies_data.keys()]))
+    strategy_district = st.selectbox(f"Select {unit_label} for Strategy Details", 
+                                   filter_index.strategy_options(rows),
+                                   key="strategy_district")
     
     if strategy_district:
-        district_info = df[df['District'] == strategy_district].iloc[0]
+        district_info = dataset.unit_row(strategy_district)
         
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            st.subheader(f"Strategies for {strategy_district} District")
+            st.subheader(f"Strategies for {strategy_district} {unit_label}")
             st.write(f"**Province:** {district_info['Province']}")
             
             # Display strategies
             if strategy_district in strategies_data:
-                for i, strategy in enumerate(strategies_data[strategy_district], 1):
+                categories = get_index(dataset).unit_categories(strategy_district)
+                held = activity.strategy_events(strategy_district) if activity is not None else {}
+                for i, (strategy, tags) in enumerate(zip(strategies_data[strategy_district], categories), 1):
                     st.write(f"**{i}.** {strategy}")
+                    notes = list(tags)
+                    if strategy in held:
+                        events, attendees, last_day = held[strategy]
+                        notes.append(f"{events:,} events held, {attendees:,} attendees, last {last_day}")
+                    if notes:
+                        st.caption(' · '.join(notes))
             else:
                 st.info("Detailed strategies for this district are being developed based on the generic provincial templates.")
+            
+            render_similar_strategies(strategy_district)
         
         with col2:
             st.subheader("District Demographics")
-            demo_data = {
-                'Religion': ['Buddhist', 'Muslim', 'Christian', 'Hindu'],
-                'Percentage': [district_info['Buddhist'], district_info['Muslim'], 
-                              district_info['Christian'], district_info['Hindu']]
-            }
-            
-            fig_demo = px.pie(pd.DataFrame(demo_data), values='Percentage', names='Religion',
-                             color_discrete_map={
-                                 'Buddhist': "#31D414",
-                                 'Muslim': '#4ECDC4',
-                                 'Christian': '#45B7D1',
-                                 'Hindu': '#96CEB4'
-                             })
-            fig_demo.update_layout(height=300, showlegend=True, 
-                                  legend=dict(orientation="v", x=1.05, y=0.5))
-            st.plotly_chart(fig_demo, use_container_width=True)
+            show_figure(dataset, 'district_demographics', strategy_district, colors=tenant.colors)
+
+@fragment("strategy_search")
+def render_strategy_search():
+    query = st.text_input("Search strategies", key="strategy_query",
+                          placeholder="e.g. fisher, microfinance, kovil")
+    if query:
+        matches, elapsed = timed_search(get_index(dataset), query, docs=filter_index.doc_mask(rows))
+        if matches.empty:
+            st.info("No matching strategies.")
+        else:
+            st.caption(f"{len(matches)} best matches in {elapsed:.2f} ms")
+            st.dataframe(matches.rename(columns={'Unit': unit_label}),
+                         use_container_width=True, hide_index=True)
+
+@fragment("strategies")
+def render_strategies():
+    st.header("Faith-Sensitive Engagement Strategies")
+    if show_no_matches(dataset, rows):
+        return
+    
+    render_strategy_search()
+    render_strategy_detail()
     
     # Strategy types overview
     st.subheader("Strategy Categories Across Districts")
     
-    strategy_types = {
-        'Temple/Religious Partnerships': ['Colombo', 'Gampaha', 'Kalutara', 'Kandy'],
-        'Interfaith Dialogue': ['Colombo', 'Trincomalee', 'Nuwara Eliya'],
-        'Economic Development': ['Gampaha', 'Kalutara', 'Kandy', 'Nuwara Eliya'],
-        'Health & Social Services': ['Trincomalee', 'Nuwara Eliya'],
-        'Youth & Education': ['Colombo', 'Gampaha', 'Kandy'],
-        'Environmental Initiatives': ['Kalutara', 'Trincomalee']
-    }
-    
-    strategy_counts = pd.DataFrame({
-        'Strategy Type': list(strategy_types.keys()),
-        'Districts': [len(districts) for districts in strategy_types.values()]
-    })
-    
-    fig_strategies = px.bar(strategy_counts, x='Strategy Type', y='Districts',
-                           title='Number of Districts by Strategy Type',
-                           color='Districts',
-                           color_continuous_scale='Blues')
-    fig_strategies.update_xaxes(tickangle=45)
-    st.plotly_chart(fig_strategies, use_container_width=True)
+    show_figure(dataset, 'strategy_types', filters, colors=tenant.colors)
 
-with tab4:
+with tab3:
+    render_strategies()
+
+# Most unit rows listed under the simulator
+SIMULATOR_UNIT_ROWS = 500
+
+# Units listed under the trend chart
+TREND_ROWS = 10
+
+# Most units listed for one archetype
+ARCHETYPE_UNIT_ROWS = 500
+
+@fragment("archetypes")
+def render_archetypes():
+    st.subheader("Engagement Archetypes")
+    st.caption(f"{unit_label}s clustered by religious composition (k-means). Clusters always cover "
+               "every unit; the counts follow the sidebar filters.")
+    k = st.slider("Number of archetypes", *ARCHETYPE_RANGE, DEFAULT_ARCHETYPES, key="archetype_k")
+    show_figure(dataset, 'archetypes', k, colors=tenant.colors)
+    
+    archetypes = get_archetypes(dataset, k)
+    st.dataframe(archetypes.summary(dataset, rows).rename(columns={'Units': f'{unit_label}s'}),
+                 use_container_width=True, hide_index=True)
+    choice = st.selectbox("List members of", archetypes.names, key="archetype_members")
+    members = np.flatnonzero(archetypes.labels == archetypes.names.index(choice))
+    if rows is not None:
+        members = np.intersect1d(members, rows, assume_unique=True)
+    with st.expander(f"{len(members):,} {unit_label}s"):
+        st.dataframe(df.iloc[members[:ARCHETYPE_UNIT_ROWS]][['Unit', 'Province'] + RELIGIONS]
+                     .rename(columns={'Unit': unit_label}).round(2),
+                     use_container_width=True, hide_index=True)
+
+@fragment("trends")
+def render_trends():
+    st.subheader("Demographic & Electoral Trends")
+    history = get_history(dataset)
+    if len(history.years) < 2:
+        st.info(f"Only the {CENSUS_YEAR} census is loaded. Point ELECTION_HISTORY at a file of "
+                "earlier census and election figures to see trends.")
+        return
+    
+    trend_col1, trend_col2 = st.columns(2)
+    name = trend_col1.selectbox("Series", history.series, key="trend_series")
+    year = trend_col2.slider("Estimate for year", int(history.years[0]), int(history.years[-1]),
+                             int(history.years[-1]), key="trend_year")
+    show_figure(dataset, 'series_trend', (name, filters, history_version(dataset)), colors=tenant.colors)
+    
+    change = history.latest_change(name)
+    candidates = np.arange(len(df)) if rows is None else rows
+    fastest = candidates[np.argsort(-np.abs(np.nan_to_num(change[candidates])), kind='stable')[:TREND_ROWS]]
+    st.write(f"**Fastest changing {unit_label}s** (latest recorded interval)")
+    st.dataframe(pd.DataFrame({
+        unit_label: df['Unit'].to_numpy()[fastest],
+        'Province': df['Province'].to_numpy()[fastest],
+        f'{name} ({year}, est.)': history.estimate(name, [year])[0][fastest].round(2),
+        'Change per Year': change[fastest].round(3),
+    }), use_container_width=True, hide_index=True)
+
+@fragment("simulator")
+def render_simulator():
+    st.subheader("Vote-Swing Simulator")
+    st.caption("Assumed party support within each religious community, plus an outreach uplift "
+               "for units with a strategy in each category. Always simulated over every unit, "
+               "whatever the sidebar filters.")
+    
+    support_cols = st.columns(len(RELIGIONS))
+    support = tuple(float(col.slider(f"{religion} support %", 0, 100, int(DEFAULT_SUPPORT[religion]),
+                                     key=f"sim_support_{religion}"))
+                    for col, religion in zip(support_cols, RELIGIONS))
+    with st.expander("Outreach uplift and uncertainty"):
+        uplift_cols = st.columns(3)
+        uplift = tuple(float(uplift_cols[i % 3].slider(f"{category} (pts)", 0.0, 10.0, 0.0, 0.5,
+                                                       key=f"sim_uplift_{i}"))
+                       for i, category in enumerate(CATEGORIES))
+        sd_col1, sd_col2 = st.columns(2)
+        national_sd = sd_col1.slider("National swing uncertainty (pts)", 0.0, 10.0, 3.0, 0.5,
+                                     key="sim_national_sd")
+        local_sd = sd_col2.slider("Local uncertainty (pts)", 0.0, 15.0, 5.0, 0.5, key="sim_local_sd")
+    
+    scenario = Scenario(support=support, uplift=uplift,
+                        national_sd=float(national_sd), local_sd=float(local_sd))
+    # Runs in the background; moving a slider again cancels a run nobody else needs
+    job = run_job('simulator', ('simulate', dataset.version, scenario),
+                  lambda report: simulate(dataset, scenario, report))
+    if not show_job(job, "Simulating"):
+        return
+    result = job.result
+    
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    metric_col1.metric(f"Expected {unit_label}s Won", f"{result.expected_seats:.1f}",
+                       f"of {len(df)}", delta_color="off")
+    metric_col2.metric(f"Probability of Winning Most {unit_label}s", f"{result.majority_probability():.1%}")
+    metric_col3.metric("Draws", f"{result.draws:,}", f"computed in {result.seconds:.2f}s", delta_color="off")
+    
+    show_figure(dataset, 'seat_distribution', scenario, colors=tenant.colors)
+    
+    st.dataframe(result.provinces, use_container_width=True, hide_index=True)
+    units = result.units.sort_values('Win Probability', ascending=False).head(SIMULATOR_UNIT_ROWS)
+    if unit_label == 'District':
+        units = units.drop(columns='District')
+    with st.expander(f"Results by {unit_label}"):
+        st.dataframe(units.rename(columns={'Unit': unit_label}), use_container_width=True, hide_index=True)
+
+# Most unit rows listed under the optimizer
+OPTIMIZER_UNIT_ROWS = 500
+
+# Session key of the last plan's threshold, the optimizer's warm start
+OPTIMIZER_START_KEY = "optimizer_threshold"
+
+@fragment("optimizer")
+def render_optimizer():
+    st.subheader("Outreach Budget Optimizer")
+    st.caption(f"Recommended events per {unit_label} and strategy category within the budget, "
+               f"favouring diverse {unit_label}s, large minorities and categories not yet covered. "
+               f"Only {unit_label}s matching the sidebar filters receive events.")
+    
+    budget = st.slider("Budget (Rs. millions)", 1, 500, DEFAULT_BUDGET // 1_000_000, key="opt_budget")
+    weight_cols = st.columns(len(WEIGHT_NAMES))
+    weights = tuple(float(col.slider(f"{name} weight", 0.0, 2.0, default, 0.1, key=f"opt_weight_{i}"))
+                    for i, (col, name, default) in enumerate(zip(weight_cols, WEIGHT_NAMES, DEFAULT_WEIGHTS)))
+    with st.expander("Cost per event"):
+        cost_cols = st.columns(3)
+        costs = tuple(int(cost_cols[i % 3].number_input(f"{category} (Rs.)", 10_000, 5_000_000, cost, 10_000,
+                                                        key=f"opt_cost_{i}"))
+                      for i, (category, cost) in enumerate(zip(CATEGORIES, DEFAULT_COSTS)))
+    
+    plan = Plan(budget=budget * 1_000_000, costs=costs, weights=weights, filters=filters)
+    allocation = optimize(dataset, plan, st.session_state.get(OPTIMIZER_START_KEY))
+    st.session_state[OPTIMIZER_START_KEY] = allocation.threshold
+    units = allocation.units(dataset)
+    
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    metric_col1.metric("Budget Used", f"Rs. {allocation.spent / 1e6:,.2f}M", f"of Rs. {budget:,}M",
+                       delta_color="off")
+    metric_col2.metric("Events", f"{int(allocation.events.sum()):,}",
+                       f"solved in {allocation.seconds * 1000:.0f} ms", delta_color="off")
+    metric_col3.metric(f"{unit_label}s Reached", f"{len(units):,}", f"of {len(allocation.positions):,}",
+                       delta_color="off")
+    
+    if plan.budget - allocation.spent >= min(costs) and (allocation.events == MAX_EVENTS).all():
+        st.caption(f"Every {unit_label} already gets {MAX_EVENTS} events per category; "
+                   f"the rest of the budget is left unallocated.")
+    
+    show_figure(dataset, 'allocation', plan, colors=tenant.colors)
+    st.dataframe(allocation.categories(), use_container_width=True, hide_index=True)
+    if unit_label == 'District':
+        units = units.drop(columns='District')
+    with st.expander(f"Plan by {unit_label}"):
+        st.dataframe(units.head(OPTIMIZER_UNIT_ROWS).rename(columns={'Unit': unit_label}),
+                     use_container_width=True, hide_index=True)
+
+@fragment("analytics")
+def render_analytics():
     st.header("📈 Strategic Analytics")
+    if show_no_matches(dataset, rows):
+        # The simulator covers every unit whatever the filters
+        render_simulator()
+        return
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Religious Diversity Analysis")
         
-        # Calculate diversity scores
-        diversity_scores = []
-        for _, row in df.iterrows():
-            religions = [row['Buddhist'], row['Muslim'], row['Christian'], row['Hindu']]
-            # Simpson's Diversity Index
-            diversity = 1 - sum((p/100)**2 for p in religions if p > 0)
-            diversity_scores.append({
-                'District': row['District'],
-                'Province': row['Province'],
-                'Diversity Score': diversity
-            })
-        
-        diversity_df = pd.DataFrame(diversity_scores)
+        diversity_df = dataset.diversity_df if rows is None else dataset.diversity_df.iloc[rows]
         
-        fig_diversity = px.scatter(diversity_df, x='District', y='Diversity Score',
-                                  color='Province', size='Diversity Score',
-                                  title='Religious Diversity by District',
-                                  hover_data=['Province'])
-        fig_diversity.update_xaxes(tickangle=45)
-        st.plotly_chart(fig_diversity, use_container_width=True)
+        show_figure(dataset, 'diversity_scatter', filters, colors=tenant.colors)
         
         # Top diverse districts
         st.subheader("Most Religiously Diverse Districts")
-        top_diverse = diversity_df.nlargest(5, 'Diversity Score')[['District', 'Diversity Score']]
+        top_diverse = diversity_df.nlargest(5, 'Diversity Score')[['Unit', 'Diversity Score']] \
+            .rename(columns={'Unit': unit_label})
         st.dataframe(top_diverse, use_container_width=True)
     
     with col2:
         st.subheader("Strategic Priority Matrix")
         
-        # Create priority matrix based on diversity and strategies
-        priority_data = []
-        for _, row in df.iterrows():
-            district = row['District']
-            religions = [row['Buddhist'], row['Muslim'], row['Christian'], row['Hindu']]
-            diversity = 1 - sum((p/100)**2 for p in religions if p > 0)
-            
-            has_strategy = district in strategies_data
-            strategy_count = len(strategies_data.get(district, []))
-            
-            priority_data.append({
-                'District': district,
-                'Diversity Score': diversity,
-                'Strategy Development': 'High' if has_strategy else 'Low',
-                'Strategy Count': strategy_count
-            })
-        
-        priority_df = pd.DataFrame(priority_data)
-        
-        fig_priority = px.scatter(priority_df, x='Diversity Score', y='Strategy Count',
-                                 color='Strategy Development', size='Strategy Count',
-                                 hover_name='District',
-                                 title='Strategy Development vs Religious Diversity',
-                                 labels={'Strategy Count': 'Number of Strategies'})
-        st.plotly_chart(fig_priority, use_container_width=True)
+        show_figure(dataset, 'priority_scatter', filters, colors=tenant.colors)
         
         st.subheader("Provincial Summary")
-        provincial_summary = df.groupby('Province').agg({
-            'Buddhist': 'mean',
-            'Muslim': 'mean',
-            'Christian': 'mean',
-            'Hindu': 'mean'
-        }).round(1)
-        st.dataframe(provincial_summary, use_container_width=True)
+        st.dataframe(dataset.aggregates.province_summary(rows), use_container_width=True)
+    
+    render_archetypes()
+    render_trends()
+    render_simulator()
+    render_optimizer()
 
-with tab5:
+with tab4:
+    render_analytics()
+
+def _activity_rollups(days):
+    # Rollups limited to the districts of the filtered units, with their unit counts
+    level = dataset.aggregates.level('District', rows)
+    units = pd.Series(level.units, index=level.names)
+    units = units[units > 0]
+    by_district = activity.rollup(days, ('district',)).set_index('district')
+    by_district = by_district[by_district.index.isin(units.index)]
+    by_category = activity.rollup(days, ('district', 'category'))
+    by_category = by_category[by_category['district'].isin(units.index)] \
+        .drop(columns='district').groupby('category').sum()
+    return by_district, by_category, units
+
+
+def render_activity_kpis():
+    if show_no_matches(dataset, rows):
+        return
+    days = st.select_slider("KPI window (days)", WINDOWS, value=DEFAULT_WINDOW, key="activity_window")
+    window = activity.window(days)
+    if window is None:
+        st.info("No field activity reported yet.")
+        return
+    by_district, by_category, units = _activity_rollups(days)
+    district_kpis = kpi_frame(by_district, units.reindex(by_district.index).to_numpy())
+    touchpoints = (by_district['door_knocks'].sum() + by_district['events'].sum()) / max(units.sum(), 1)
+    on_target = int((district_kpis['Touchpoints / unit'] >= TOUCHPOINT_TARGET).sum())
+    st.metric("Key Touchpoints", f"{touchpoints:,.1f} per {unit_label}",
+              f"{on_target} of {len(units)} districts at {TOUCHPOINT_TARGET}+", delta_color="off")
+    responses = by_district['responses'].sum()
+    if responses:
+        st.metric("Response Time", f"{by_district['response_hours'].sum() / responses:,.1f} hours",
+                  f"{by_district['responses_on_time'].sum() / responses:.0%} within {RESPONSE_TARGET_HOURS} hours",
+                  delta_color="off")
+    else:
+        st.metric("Response Time", "-", "No responses reported", delta_color="off")
+    st.caption(f"Field activity {window[0]:%d %b} - {window[1]:%d %b %Y}")
+    with st.expander("Field activity by district and strategy category"):
+        st.dataframe(district_kpis.rename_axis('District'), use_container_width=True)
+        st.dataframe(kpi_frame(by_category).rename_axis('Strategy Category'), use_container_width=True)
+
+@fragment("messaging")
+def render_messaging():
     st.header("Campaign Messaging & Branding Strategy")
     
     # Core Messaging Section
@@ -510,8 +583,13 @@ with tab5:
     with col2:
         # Create metrics to show engagement stats
         st.metric("Target Message Length", "15-20 words", "Concise & Clear")
-        st.metric("Key Touchpoints", "7+ times", "Message Repetition")
-        st.metric("Response Time", "< 24 hours", "Community Engagement")
+        if activity is None:
+            st.metric("Key Touchpoints", f"{TOUCHPOINT_TARGET}+ times", "Message Repetition")
+            st.metric("Response Time", f"< {RESPONSE_TARGET_HOURS} hours", "Community Engagement")
+            if tenant.id == DEFAULT_TENANT:
+                st.caption("Targets only; set ELECTION_ACTIVITY_DB to measure them from field activity reports.")
+        else:
+            render_activity_kpis()
     
     # Outreach Strategy
     st.subheader("Multi-Channel Outreach Strategy")
@@ -553,8 +631,8 @@ with tab5:
     # Visual Branding Guidelines
     st.subheader("Visual Branding Guidelines")
     
-    # Sample color palette
-    colors = ["#2FDF10", "#ECEC25", "#FFFFFF"]
+    # The tenant's brand palette
+    colors = tenant.brand_colors
     colors_html = ' '.join([f'<div style="display: inline-block; width: 50px; height: 50px; background-color: {color}; margin: 5px; border-radius: 5px;"></div>' for color in colors])
     
     st.markdown("""
@@ -600,6 +678,8 @@ with tab5:
            - Share success stories
         """)
 
+with tab5:
+    render_messaging()
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -635,4 +715,21 @@ with st.expander("📋 Key Insights & Recommendations"):
        - Phase 1 (2025-2026): Establish partnerships in key districts
        - Phase 2 (2027-2028): Scale successful models province-wide
        - Phase 3 (2029-2030): Comprehensive evaluation and electoral preparation
-    """)
\ No newline at end of file
+    """)
+
+# Refresh when the live results shown on this page change
+if results is not None:
+    def results_scope():
+        selected = st.session_state.get('selected_district', 'All')
+        if selected == 'All':
+            return None
+        return dataset.unit_metrics(selected)['District']
+    
+    watch(results, results_scope)
+
+record_first_run(end_run())
+show_render_log()
+show_debug_panel()
+show_memory_report(dataset)
+show_startup_report()
+track_session()
@@ -0,0 +1,301 @@
+"""Process-wide cached data layer for the dashboard.
+
+The base frame and every derived table are built once per process and keyed
+on a content hash of the source data, so reruns and new sessions reuse the
+same read-only objects instead of rebuilding them. Summary totals come from
+the dataset's aggregate cube (see ``aggregates``). A reload that only changes a
+few units patches the previous cube of the same source instead of rebuilding it.
+
+The data version is also the namespace of every cache derived from it. Caches
+declared with :func:`versioned_cache` record which entries each version holds
+and roughly how many bytes, so :func:`evict_version` can drop one version's
+data (for example, an idle tenant's) and leave every other version warm.
+"""
+import functools
+import inspect
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from aggregates import AggregateCube
+from instrumentation import span
+from loaders import DataSource, clear_fingerprints, load_demographics, load_strategies, \
+    source_from_env, source_version
+from metrics import compute_metrics
+
+
+@dataclass(frozen=True)
+class Dataset:
+    version: str
+    source: DataSource
+    unit_label: str
+    df: pd.DataFrame
+    strategies: object
+    metrics: pd.DataFrame
+    aggregates: AggregateCube
+    province_df: pd.DataFrame
+    diversity_df: pd.DataFrame
+    priority_df: pd.DataFrame
+    unit_positions: dict
+    unit_options: tuple
+    province_options: tuple
+    district_options: dict
+    strategy_options: tuple
+
+    def unit_row(self, unit):
+        """Demographics row for ``unit``."""
+        return self.df.iloc[self.unit_positions[unit]]
+
+    def unit_metrics(self, unit):
+        """Metrics row for ``unit``."""
+        return self.metrics.iloc[self.unit_positions[unit]]
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.misses = 0
+
+    @property
+    def hits(self):
+        return self.requests - self.misses
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.misses = 0
+
+
+def _freeze(frame):
+    # Shared between sessions, so every numpy column is rebuilt from a copy we
+    # own and mark read-only; in-place writes (``.loc``/``.iloc`` assignment)
+    # then raise ValueError. This relies on pandas keeping arrays passed to the
+    # DataFrame constructor with ``copy=False`` as they are, which is its
+    # documented behaviour. Extension columns (categoricals, strings) cannot be
+    # locked and stay as they are; copy-on-write keeps other frames' writes out.
+    columns = {}
+    for name, column in frame.items():
+        if isinstance(column.dtype, np.dtype):
+            values = column.to_numpy(copy=True)
+            values.flags.writeable = False
+            columns[name] = values
+        else:
+            columns[name] = column.copy()
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+
+def province_majorities(metrics):
+    # Grouped by province in order of first appearance, as the bar chart expects
+    order = np.argsort(pd.factorize(metrics['Province'])[0], kind='stable')
+    return metrics.iloc[order][['Province', 'Unit', 'Majority Religion', 'Majority %']] \
+        .rename(columns={'Majority %': 'Percentage'}).reset_index(drop=True)
+
+
+def _build_diversity(metrics):
+    return metrics[['Unit', 'Province', 'Diversity Score']].reset_index(drop=True)
+
+
+def _build_priority(metrics):
+    priority_df = metrics[['Unit', 'Diversity Score', 'Strategy Count']].reset_index(drop=True)
+    priority_df.insert(2, 'Strategy Development',
+                       np.where(priority_df['Strategy Count'] > 0, 'High', 'Low'))
+    return priority_df
+
+
+def _build_options(df):
+    # Selectbox options shared by every session instead of rebuilt on each rerun
+    provinces = tuple(sorted(df['Province'].unique().tolist()))
+    districts = {None: tuple(sorted(df['District'].unique().tolist()))}
+    for province, group in df.groupby('Province', observed=True)['District']:
+        districts[province] = tuple(sorted(group.unique().tolist()))
+    return tuple(sorted(df['Unit'].tolist())), provinces, districts
+
+
+@st.cache_resource
+def cache_stats():
+    return CacheStats()
+
+
+class VersionedCache:
+    """An ``st.cache_resource`` function whose first argument is a data version,
+    with the entries and estimated bytes held for each version."""
+
+    def __init__(self, func, max_entries=None, nbytes=None, **cache_kwargs):
+        self._func = func
+        self._cached = st.cache_resource(max_entries=max_entries, **cache_kwargs)(func)
+        self._names = list(inspect.signature(func).parameters)
+        self._max_entries = max_entries
+        self._nbytes = nbytes
+        self._lock = threading.Lock()
+        # call key -> (version, bytes) across every version, least recently used
+        # first, matching the single LRU Streamlit keeps for the function
+        self._entries = OrderedDict()
+        functools.update_wrapper(self, func)
+
+    def _call_key(self, args, kwargs):
+        # The call as Streamlit hashes it, with the unhashed arguments blanked out
+        names = self._names
+        return (tuple(None if i < len(names) and names[i].startswith('_') else arg for i, arg in enumerate(args)),
+                tuple((name, None if name.startswith('_') else value) for name, value in kwargs.items()))
+
+    def __call__(self, version, *args, **kwargs):
+        result = self._cached(version, *args, **kwargs)
+        key = self._call_key((version,) + args, kwargs)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return result
+        size = self._nbytes(result) if self._nbytes is not None else _namespace_size(version, result)
+        with self._lock:
+            self._entries[key] = (version, size)
+            if self._max_entries is not None:
+                # Streamlit drops the least recently used entries past
+                # ``max_entries``, whatever their version; so do we
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def holds(self, version):
+        with self._lock:
+            return any(held == version for held, _ in self._entries.values())
+
+    def nbytes(self, version):
+        with self._lock:
+            return sum(size for held, size in self._entries.values() if held == version)
+
+    def evict(self, version):
+        """Drop every entry cached for ``version``."""
+        with self._lock:
+            keys = [key for key, (held, _) in self._entries.items() if held == version]
+            for key in keys:
+                del self._entries[key]
+        for args, kwargs in keys:
+            self._cached.clear(*args, **dict(kwargs))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._cached.clear()
+
+
+_versioned_caches = []
+
+# Objects already counted towards each version, so shared tables are counted once
+_namespace_seen = defaultdict(set)
+_namespace_lock = threading.Lock()
+
+
+def _namespace_size(version, obj):
+    from memory import deep_size
+
+    with _namespace_lock:
+        seen = _namespace_seen[version]
+        return deep_size(obj, seen)
+
+
+def versioned_cache(func=None, *, max_entries=None, nbytes=None, **cache_kwargs):
+    """Like ``st.cache_resource``, for functions whose first argument is the data
+    version. ``nbytes(result)`` overrides the size estimate of an entry."""
+    def decorate(func):
+        cache = VersionedCache(func, max_entries=max_entries, nbytes=nbytes, **cache_kwargs)
+        _versioned_caches.append(cache)
+        return cache
+
+    return decorate(func) if func is not None else decorate
+
+
+def namespace_bytes(version):
+    """Estimated bytes the versioned caches hold for ``version``."""
+    return sum(cache.nbytes(version) for cache in _versioned_caches)
+
+
+def namespace_loaded(version):
+    """Whether the dataset for ``version`` is in the cache."""
+    return _build_dataset.holds(version)
+
+
+def evict_version(version):
+    """Drop the dataset and every versioned cache entry for ``version``."""
+    for cache in _versioned_caches:
+        cache.evict(version)
+    with _namespace_lock:
+        _namespace_seen.pop(version, None)
+    with _latest_cubes_lock:
+        for source in [s for s, (v, _) in _latest_cubes.items() if v == version]:
+            del _latest_cubes[source]
+
+
+# Latest aggregate cube per source, the starting point for patching the next one
+_latest_cubes = {}
+_latest_cubes_lock = threading.Lock()
+
+
+def _build_aggregates(df, source, version):
+    with _latest_cubes_lock:
+        previous = _latest_cubes.get(source)
+    cube = AggregateCube(df, previous[1] if previous is not None else None)
+    with _latest_cubes_lock:
+        _latest_cubes[source] = (version, cube)
+    return cube
+
+
+@versioned_cache(show_spinner=False)
+def _build_dataset(version, _source):
+    # Only the version string is hashed by Streamlit; the underscored source
+    # argument is passed through untouched.
+    cache_stats().record_miss()
+    with span('data.load'):
+        df = load_demographics(_source)
+        strategies = load_strategies(_source)
+    with span('data.metrics'):
+        metrics = compute_metrics(df, strategies.counts())
+        unit_options, province_options, district_options = _build_options(df)
+    with span('data.aggregates'):
+        aggregates = _build_aggregates(df, _source, version)
+    return Dataset(
+        version=version,
+        source=_source,
+        unit_label=_source.unit_label,
+        df=_freeze(df),
+        strategies=strategies,
+        metrics=_freeze(metrics),
+        aggregates=aggregates,
+        province_df=_freeze(province_majorities(metrics)),
+        diversity_df=_freeze(_build_diversity(metrics)),
+        priority_df=_freeze(_build_priority(metrics)),
+        unit_positions={unit: i for i, unit in enumerate(df['Unit'].tolist())},
+        unit_options=unit_options,
+        province_options=province_options,
+        district_options=district_options,
+        strategy_options=tuple(sorted(strategies)),
+    )
+
+
+def get_dataset(source=None):
+    """Return the shared dataset for ``source`` (the configured one by default)."""
+    source = source or source_from_env()
+    cache_stats().record_request()
+    return _build_dataset(source_version(source), source)
+
+
+def invalidate():
+    """Drop every cached dataset so the next request rebuilds it."""
+    for cache in _versioned_caches:
+        cache.clear()
+    with _namespace_lock:
+        _namespace_seen.clear()
+    clear_fingerprints()
+    cache_stats().reset()
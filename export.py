@@ -0,0 +1,291 @@
+"""Offline briefing packs: one static page per unit for field offices.
+
+Each pack repeats what tabs 2 and 3 show for a unit: the composition chart,
+key statistics (majority religion, diversity index, minority share), the
+unit's strategies with their categories and the demographics pie.
+
+    python export.py --out briefings                 # HTML for every unit
+    python export.py --out briefings --png           # plus PNG charts (needs kaleido)
+    python export.py --out briefings --workers 8 --force
+
+Packs are rendered in parallel across a process pool. The inputs of every pack
+are hashed and recorded in ``manifest.json``; a pack whose hash is unchanged
+and whose files are still on disk is skipped, so a nightly rebuild only renders
+what changed. The data source is the same one the dashboard uses
+(``ELECTION_DEMOGRAPHICS`` / ``ELECTION_STRATEGIES`` / ``ELECTION_LEVEL``).
+
+HTML pages load ``plotly.min.js`` from the output folder, so the folder works
+offline as a whole but a page copied out of it on its own shows no charts.
+``--inline-js`` embeds plotly.js (about 4.5 MB) in every page instead, for
+packs that are sent one page at a time.
+
+Units whose names slugify to the same file name (names that differ only in
+case or punctuation, or non-Latin names, which all become ``unit``) get the
+first 8 hex digits of a hash of the name appended, so no pack overwrites
+another.
+"""
+import argparse
+import hashlib
+import html
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from metrics import RELIGIONS
+
+# Bump when the page layout changes so every pack is regenerated
+EXPORT_VERSION = 1
+
+MANIFEST = 'manifest.json'
+PLOTLY_JS = 'plotly.min.js'
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{script}
+<style>
+body {{ font-family: sans-serif; margin: 2rem auto; max-width: 1100px; color: #222; }}
+.stats {{ display: flex; gap: 2rem; margin: 1rem 0; }}
+.stat {{ border: 1px solid #ddd; border-radius: 6px; padding: 0.75rem 1rem; }}
+.stat b {{ display: block; font-size: 1.5rem; }}
+.charts {{ display: flex; gap: 1rem; }}
+.charts > div {{ flex: 1; }}
+.tags {{ color: #777; font-size: 0.85rem; }}
+</style>
+</head>
+<body>
+<h1>{unit} {unit_label}</h1>
+<p><b>Province:</b> {province}{district}</p>
+<div class="stats">
+<div class="stat">Majority Religion<b>{majority}</b>{majority_pct:.1f}%</div>
+<div class="stat">Religious Diversity Index<b>{diversity:.3f}</b>Higher = More Diverse</div>
+<div class="stat">Minority Population<b>{minority_pct:.1f}%</b></div>
+</div>
+<div class="charts">
+<div>{composition}</div>
+<div><h2>Demographics</h2>{demographics}</div>
+</div>
+<h2>Strategies</h2>
+{strategies}
+<p class="tags">Generated {generated} from data version {version}.</p>
+</body>
+</html>
+"""
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'unit'
+
+
+def unit_slugs(units):
+    """File name stem of every unit, unique across ``units``."""
+    slugs = {unit: slugify(unit) for unit in units}
+    counts = Counter(slugs.values())
+    for unit, slug in slugs.items():
+        if counts[slug] > 1:
+            slugs[unit] = f"{slug}-{hashlib.sha256(unit.encode('utf-8')).hexdigest()[:8]}"
+    if len(set(slugs.values())) < len(slugs):
+        # A hashed slug matched another unit's plain one; fall back to positions
+        slugs = {unit: f'{slug}-{i}' for i, (unit, slug) in enumerate(slugs.items())}
+    return slugs
+
+
+def pack_inputs(dataset):
+    """Everything each pack renders, as plain picklable dicts keyed by unit."""
+    from search import get_index
+
+    index = get_index(dataset)
+    packs = {}
+    for unit in dataset.unit_options:
+        row = dataset.unit_row(unit)
+        unit_metrics = dataset.unit_metrics(unit)
+        strategies = list(dataset.strategies[unit]) if unit in dataset.strategies else []
+        packs[unit] = {
+            'unit': unit,
+            'unit_label': dataset.unit_label,
+            'province': str(row['Province']),
+            'district': str(row['District']),
+            'shares': {religion: round(float(row[religion]), 2) for religion in RELIGIONS},
+            'majority': str(unit_metrics['Majority Religion']),
+            'majority_pct': round(float(unit_metrics['Majority %']), 2),
+            'diversity': round(float(unit_metrics['Diversity Score']), 4),
+            'minority_pct': round(float(unit_metrics['Minority %']), 2),
+            'strategies': strategies,
+            'categories': index.unit_categories(unit),
+        }
+    return packs
+
+
+def pack_hash(inputs, options):
+    payload = json.dumps([EXPORT_VERSION, options, inputs], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _strategies_html(inputs):
+    if not inputs['strategies']:
+        return ("<p>Detailed strategies for this district are being developed "
+                "based on the generic provincial templates.</p>")
+    items = []
+    for strategy, tags in zip(inputs['strategies'], inputs['categories']):
+        tag_line = f'<div class="tags">{html.escape(" · ".join(tags))}</div>' if tags else ''
+        items.append(f'<li>{html.escape(strategy)}{tag_line}</li>')
+    return '<ol>\n' + '\n'.join(items) + '\n</ol>'
+
+
+# Per-process figure templates; px is slow, so each worker builds the two
+# charts once and only patches the values for every unit
+_templates = None
+
+
+def unit_figures(unit, shares):
+    """Composition and demographics figures for one unit, built from templates."""
+    global _templates
+    import plotly.graph_objects as go
+
+    from figures import composition_figure, demographics_figure
+
+    if _templates is None:
+        _templates = (composition_figure(unit, shares), demographics_figure(shares))
+    composition = go.Figure(_templates[0])
+    for trace in composition.data:
+        trace.y = np.array([shares[trace.name]], dtype=np.float64)
+    composition.layout.title.text = f"Religious Composition - {unit}"
+    demographics = go.Figure(_templates[1])
+    demographics.data[0].values = np.array([shares[religion] for religion in demographics.data[0].labels],
+                                           dtype=np.float64)
+    return composition, demographics
+
+
+def render_pack(task):
+    """Write one unit's pack; runs in a worker process. Returns the files written."""
+    inputs, out_dir, slug, version, inline_js, png = task
+    out_dir = Path(out_dir)
+    composition, demographics = unit_figures(inputs['unit'], inputs['shares'])
+
+    district = inputs['district']
+    page = PAGE.format(
+        title=html.escape(f"{inputs['unit']} briefing"),
+        script='' if inline_js else f'<script src="{PLOTLY_JS}"></script>',
+        unit=html.escape(inputs['unit']),
+        unit_label=html.escape(inputs['unit_label']),
+        province=html.escape(inputs['province']),
+        district='' if district == inputs['unit'] else f" &middot; <b>District:</b> {html.escape(district)}",
+        majority=html.escape(inputs['majority']),
+        majority_pct=inputs['majority_pct'],
+        diversity=inputs['diversity'],
+        minority_pct=inputs['minority_pct'],
+        composition=composition.to_html(full_html=False, include_plotlyjs=inline_js),
+        demographics=demographics.to_html(full_html=False, include_plotlyjs=False),
+        strategies=_strategies_html(inputs),
+        generated=time.strftime('%Y-%m-%d %H:%M'),
+        version=version[:12],
+    )
+    files = [f'{slug}.html']
+    _write_text(out_dir / files[0], page)
+    if png:
+        for name, fig in (('composition', composition), ('demographics', demographics)):
+            files.append(f'png/{slug}-{name}.png')
+            fig.write_image(out_dir / files[-1], width=900, height=500)
+    return files
+
+
+def _write_text(path, text):
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _load_manifest(out_dir):
+    try:
+        with open(out_dir / MANIFEST, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _index_page(dataset, entries):
+    rows = '\n'.join(f'<li><a href="{entry["files"][0]}">{html.escape(unit)}</a></li>'
+                     for unit, entry in sorted(entries.items()))
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+            f'<title>Briefing packs</title></head><body style="font-family: sans-serif">'
+            f'<h1>Briefing packs by {html.escape(dataset.unit_label)}</h1><ul>\n{rows}\n</ul>'
+            f'</body></html>\n')
+
+
+def export(dataset, out_dir, workers=None, png=False, inline_js=False, force=False):
+    """Render every out-of-date pack; return ``(rendered, skipped)`` counts."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if png:
+        (out_dir / 'png').mkdir(exist_ok=True)
+    if not inline_js and not (out_dir / PLOTLY_JS).exists():
+        from plotly.offline import get_plotlyjs
+        _write_text(out_dir / PLOTLY_JS, get_plotlyjs())
+
+    options = {'png': png, 'inline_js': inline_js}
+    manifest = {} if force else _load_manifest(out_dir)
+    entries = {}
+    tasks = []
+    packs = pack_inputs(dataset)
+    slugs = unit_slugs(packs)
+    for unit, inputs in packs.items():
+        digest = pack_hash(inputs, options)
+        previous = manifest.get(unit)
+        if previous and previous['hash'] == digest and previous['files'][0] == f'{slugs[unit]}.html' and \
+                all((out_dir / name).exists() for name in previous['files']):
+            entries[unit] = previous
+            continue
+        entries[unit] = {'hash': digest, 'files': None}
+        tasks.append((inputs, str(out_dir), slugs[unit], dataset.version, inline_js, png))
+
+    if tasks:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            for task, files in zip(tasks, pool.map(render_pack, tasks, chunksize=chunksize)):
+                entries[task[0]['unit']]['files'] = files
+
+    _write_text(out_dir / MANIFEST, json.dumps(entries, indent=1, sort_keys=True))
+    _write_text(out_dir / 'index.html', _index_page(dataset, entries))
+    return len(tasks), len(entries) - len(tasks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export per-unit briefing packs.")
+    parser.add_argument('--out', default='briefings', help="output folder (default: briefings)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPUs)")
+    parser.add_argument('--png', action='store_true', help="also write PNG charts (needs kaleido)")
+    parser.add_argument('--inline-js', action='store_true',
+                        help="embed plotly.js (about 4.5 MB) in every page so each page works on its own; "
+                             "by default pages need plotly.min.js from the output folder next to them")
+    parser.add_argument('--force', action='store_true', help="ignore the manifest and rebuild everything")
+    args = parser.parse_args(argv)
+
+    if args.png and importlib.util.find_spec('kaleido') is None:
+        parser.error("--png needs the optional kaleido package (pip install kaleido)")
+
+    from data_layer import get_dataset
+
+    start = time.perf_counter()
+    dataset = get_dataset()
+    rendered, skipped = export(dataset, args.out, workers=args.workers, png=args.png,
+                               inline_js=args.inline_js, force=args.force)
+    print(f"{rendered} packs rendered, {skipped} unchanged, "
+          f"in {time.perf_counter() - start:.1f}s -> {args.out}")
+    if not args.inline_js:
+        print(f"Pages load {PLOTLY_JS} from {args.out}; copy the whole folder, or use --inline-js "
+              f"for pages that are shared one at a time.")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,511 @@
+"""Plotly figure builders and a process-wide figure cache.
+
+Figures are stored as serialized JSON keyed by ``(kind, selection, colors,
+data version)`` in a bounded LRU, so a chart is built with ``px`` once per process.
+Concurrent misses for one key wait for a single build. Every later rerun or
+session hands the cached payload to ``st.plotly_chart`` as a plain dict,
+which skips building the figure with ``px`` again. Payloads are compacted (and large
+series decimated) on the way in, see ``payloads``. Per-unit charts are
+pre-warmed in the background when a new data version is loaded. ``colors``
+are a tenant's overrides of ``COLOR_MAP`` for the kinds in ``PALETTE_KINDS``
+and empty for every other kind, so tenants share those. Plotly is only
+imported when a figure is first built or emitted, so importing this module
+stays cheap.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_layer import namespace_loaded, province_majorities, versioned_cache
+from filters import filter_rows, get_filter_index
+from geo import LEVEL_OF_LABEL, features_for, geometry_version, prepare_view
+from heatmap import heatmap_height, heatmap_matrix
+from history import get_history, group_means, history_version
+from instrumentation import span
+from metrics import RELIGIONS
+from optimizer import Plan, optimize
+from payloads import compact_figure
+from rendering import record_chart
+from search import get_index
+from similarity import DEFAULT_ARCHETYPES, get_archetypes
+from simulator import Scenario, simulate
+
+COLOR_MAP = {
+    'Buddhist': '#FF6B6B',
+    'Muslim': '#4ECDC4',
+    'Christian': '#45B7D1',
+    'Hindu': '#96CEB4'
+}
+
+DEMO_COLOR_MAP = dict(COLOR_MAP, Buddhist="#31D414")
+
+
+def palette(colors=()):
+    """``COLOR_MAP`` and ``DEMO_COLOR_MAP`` with ``colors`` ((religion, color) pairs) applied."""
+    colors = dict(colors)
+    return COLOR_MAP | colors, DEMO_COLOR_MAP | colors
+
+
+FIGURE_CACHE_SIZE = int(os.environ.get('ELECTION_FIGURE_CACHE_SIZE', '256'))
+
+# Figure kinds built once per selected unit
+UNIT_KINDS = ('district_composition', 'district_demographics')
+
+# Figure kinds that need boundary geometry
+MAP_KINDS = ('choropleth',)
+
+# Figure kinds drawn from the history store
+TREND_KINDS = ('unit_trend', 'series_trend')
+
+# Selection the page asks for before any widget has been touched
+DEFAULT_SELECTIONS = {'heatmap': ('District', None, None, None), 'seat_distribution': Scenario(),
+                      'archetypes': DEFAULT_ARCHETYPES, 'allocation': Plan()}
+
+MAP_METRICS = ('Majority Religion', 'Diversity Score', 'Minority %')
+
+# Figure kinds colored by religion, whose builders take a tenant's ``colors``
+PALETTE_KINDS = ('overview_pie', 'majority_bar', 'choropleth', 'district_composition', 'district_demographics',
+                 'unit_trend', 'archetypes')
+
+
+class FigureCache:
+    """Thread-safe LRU of serialized figures, keyed by ``(kind, selection, colors, version)``."""
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # version -> [hits, misses]
+        self._version_stats = defaultdict(lambda: [0, 0])
+        # key -> lock held by the thread building it
+        self._building = {}
+
+    def get(self, key, build):
+        """Return the JSON for ``key``, building it with ``build()`` on a miss.
+        A miss while another thread builds the same key waits for that build."""
+        while True:
+            with self._lock:
+                payload = self._figures.get(key)
+                stats = self._version_stats[key[-1]]
+                if payload is not None:
+                    self._figures.move_to_end(key)
+                    self.hits += 1
+                    stats[0] += 1
+                    return payload
+                building = self._building.get(key)
+                if building is None:
+                    building = self._building[key] = threading.Lock()
+                    building.acquire()
+                    self.misses += 1
+                    stats[1] += 1
+                    break
+            # Look again once the other build finishes (or fails)
+            with building:
+                pass
+        try:
+            payload = build()
+            with self._lock:
+                self._figures[key] = payload
+                self._figures.move_to_end(key)
+                while len(self._figures) > self.maxsize:
+                    self._figures.popitem(last=False)
+                    self.evictions += 1
+        finally:
+            with self._lock:
+                del self._building[key]
+            building.release()
+        return payload
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._figures
+
+    def __len__(self):
+        return len(self._figures)
+
+    def nbytes(self):
+        with self._lock:
+            return sum(len(payload) for payload in self._figures.values())
+
+    def version_stats(self, version):
+        """``(figures, bytes, hits, misses)`` held and served for ``version``."""
+        with self._lock:
+            payloads = [payload for key, payload in self._figures.items() if key[-1] == version]
+            hits, misses = self._version_stats.get(version, (0, 0))
+            return len(payloads), sum(len(payload) for payload in payloads), hits, misses
+
+    def drop_version(self, version):
+        """Forget every figure of ``version``."""
+        with self._lock:
+            for key in [key for key in self._figures if key[-1] == version]:
+                del self._figures[key]
+            self._version_stats.pop(version, None)
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self._version_stats.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def _filtered(frame, rows):
+    # Frames aligned row-for-row with ``dataset.df``; unfiltered views use them as they are
+    return frame if rows is None else frame.iloc[rows]
+
+
+def build_overview_pie(dataset, filters, colors=()):
+    import plotly.express as px
+
+    aggregates = dataset.aggregates
+    title = ("Religious Composition (Population-Weighted)" if aggregates.weighted
+             else f"Average Religious Distribution Across {dataset.unit_label}s")
+    return px.pie(aggregates.composition(filter_rows(dataset, filters)), values='Share %', names='Religion',
+                  color='Religion', title=title, color_discrete_map=palette(colors)[0])
+
+
+def build_majority_bar(dataset, filters, colors=()):
+    import plotly.express as px
+
+    unit_label = dataset.unit_label
+    rows = filter_rows(dataset, filters)
+    majorities = dataset.province_df if rows is None else province_majorities(dataset.metrics.iloc[rows])
+    fig = px.bar(majorities, x='Unit', y='Percentage',
+                 color='Majority Religion',
+                 title=f'Religious Majority by {unit_label}',
+                 labels={'Unit': unit_label},
+                 color_discrete_map=palette(colors)[0])
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+
+def build_heatmap(dataset, selection):
+    import plotly.express as px
+
+    group_by, province, district, filters = selection or DEFAULT_SELECTIONS['heatmap']
+    matrix, labels, counts = heatmap_matrix(dataset.df, group_by, province, district,
+                                            rows=filter_rows(dataset, filters), aggregates=dataset.aggregates)
+    row_label = dataset.unit_label if group_by == 'Unit' else group_by
+    fig = px.imshow(matrix.astype(np.float32),
+                    labels=dict(x="Religion", y=row_label, color="Percentage"),
+                    x=RELIGIONS,
+                    y=list(labels),
+                    aspect='auto',
+                    color_continuous_scale='Viridis',
+                    title=f'Religious Demographics by {row_label}')
+    fig.update_traces(customdata=counts[:, None].repeat(len(RELIGIONS), axis=1),
+                      hovertemplate="%{y}<br>%{x}: %{z:.1f}%<br>Units: %{customdata:.0f}<extra></extra>")
+    fig.update_layout(height=heatmap_height(len(labels)))
+    return fig
+
+
+def map_selection(dataset, metric=MAP_METRICS[0], province=None, district=None, filters=None):
+    """Choropleth selection, tied to the boundary file so new geometry is rebuilt."""
+    return (metric, province, district, filters, geometry_version(dataset.unit_label))
+
+
+def build_choropleth(dataset, selection, colors=()):
+    import plotly.graph_objects as go
+
+    metric, province, district, filters, _ = selection
+    view = _filtered(dataset.metrics, filter_rows(dataset, filters))
+    if province is not None:
+        view = view[view['Province'] == province]
+    if district is not None:
+        view = view[view['District'] == district]
+    collection, _ = prepare_view(LEVEL_OF_LABEL[dataset.unit_label], view['Unit'])
+    area = district or province or 'Sri Lanka'
+    title = f'{metric} by {dataset.unit_label} - {area}'
+    if collection is not None and len(collection['features']) < len(view):
+        title += f" ({len(collection['features'])} of {len(view)} mapped)"
+    fig = go.Figure()
+    if collection is not None and metric == 'Majority Religion':
+        color_map = palette(colors)[0]
+        # One trace per religion carrying only its own features, rather than
+        # px repeating the whole collection in every trace
+        for religion in RELIGIONS:
+            part = view[view[metric] == religion]
+            if part.empty:
+                continue
+            fig.add_trace(go.Choropleth(
+                geojson=features_for(collection, part['Unit']), locations=part['Unit'],
+                z=np.ones(len(part)), colorscale=[[0, color_map[religion]], [1, color_map[religion]]],
+                showscale=False, showlegend=True, name=religion,
+                customdata=part[['Majority %', 'Diversity Score']].to_numpy(np.float32),
+                hovertemplate=f"%{{location}}<br>{religion}: %{{customdata[0]:.1f}}%"
+                              "<br>Diversity: %{customdata[1]:.3f}<extra></extra>"))
+    elif collection is not None:
+        fig.add_trace(go.Choropleth(
+            geojson=collection, locations=view['Unit'], z=view[metric].to_numpy(np.float32),
+            colorscale='Viridis', colorbar=dict(title=metric),
+            hovertemplate=f"%{{location}}<br>{metric}: %{{z:.3f}}<extra></extra>"))
+    fig.update_traces(marker_line_width=0.3)
+    fig.update_geos(fitbounds='locations', visible=False)
+    fig.update_layout(title=title, height=600, margin=dict(l=0, r=0, t=50, b=0))
+    return fig
+
+
+def composition_figure(unit, shares, colors=()):
+    """Bar chart of one unit's religious shares (``shares`` maps religion to %)."""
+    import plotly.express as px
+
+    fig = px.bar(x=RELIGIONS,
+                 y=[shares[religion] for religion in RELIGIONS],
+                 title=f"Religious Composition - {unit}",
+                 color=RELIGIONS,
+                 color_discrete_map=palette(colors)[0])
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def demographics_figure(shares, colors=()):
+    """Pie chart of one unit's religious shares."""
+    import plotly.express as px
+
+    demo_data = pd.DataFrame({
+        'Religion': RELIGIONS,
+        'Percentage': [shares[religion] for religion in RELIGIONS]
+    })
+    fig = px.pie(demo_data, values='Percentage', names='Religion', color='Religion',
+                 color_discrete_map=palette(colors)[1])
+    fig.update_layout(height=300, showlegend=True,
+                      legend=dict(orientation="v", x=1.05, y=0.5))
+    return fig
+
+
+def build_district_composition(dataset, unit, colors=()):
+    return composition_figure(unit, dataset.unit_row(unit), colors)
+
+
+def build_district_demographics(dataset, unit, colors=()):
+    return demographics_figure(dataset.unit_row(unit), colors)
+
+
+def build_unit_trend(dataset, selection, colors=()):
+    import plotly.express as px
+
+    unit, series, _ = selection
+    frame = get_history(dataset).unit_frame(dataset.unit_positions[unit], series)
+    trend = frame.reset_index().melt(id_vars='Year', var_name='Series', value_name='Value').dropna()
+    return px.line(trend, x='Year', y='Value', color='Series', markers=True,
+                   color_discrete_map=palette(colors)[0], title=f"Trend - {unit}",
+                   labels={'Value': '%'})
+
+
+def build_series_trend(dataset, selection):
+    import plotly.express as px
+
+    name, filters, _ = selection
+    history = get_history(dataset)
+    rows = filter_rows(dataset, filters)
+    years = np.arange(history.years[0], history.years[-1] + 1)
+    provinces = dataset.df['Province']
+    estimates = history.estimate(name, years)
+    codes = provinces.cat.codes.to_numpy()
+    if rows is not None:
+        estimates, codes = estimates[:, rows], codes[rows]
+    means = group_means(estimates, codes, len(provinces.cat.categories))
+    trend = pd.DataFrame(means, index=pd.Index(years, name='Year'),
+                         columns=provinces.cat.categories.astype(str)) \
+        .reset_index().melt(id_vars='Year', var_name='Province', value_name=name).dropna()
+    fig = px.line(trend, x='Year', y=name, color='Province',
+                  title=f"{name} by Province, {years[0]}-{years[-1]}")
+    # Recorded years; the lines in between are interpolated
+    for year in history.years:
+        fig.add_vline(x=int(year), line_dash='dot', line_color='lightgrey')
+    return fig
+
+
+def build_strategy_types(dataset, filters):
+    import plotly.express as px
+
+    unit_label = dataset.unit_label
+    docs = get_filter_index(dataset).doc_mask(filter_rows(dataset, filters))
+    strategy_counts = get_index(dataset).category_counts(docs)
+    fig = px.bar(strategy_counts, x='Strategy Type', y='Units',
+                 title=f'Number of {unit_label}s by Strategy Type',
+                 labels={'Units': f'{unit_label}s'},
+                 hover_data=['Strategies'],
+                 color='Units',
+                 color_continuous_scale='Blues')
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+
+def build_diversity_scatter(dataset, filters):
+    import plotly.express as px
+
+    unit_label = dataset.unit_label
+    fig = px.scatter(_filtered(dataset.diversity_df, filter_rows(dataset, filters)), x='Unit', y='Diversity Score',
+                     color='Province', size='Diversity Score',
+                     title=f'Religious Diversity by {unit_label}',
+                     labels={'Unit': unit_label},
+                     hover_data=['Province'])
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+
+def build_priority_scatter(dataset, filters):
+    import plotly.express as px
+
+    return px.scatter(_filtered(dataset.priority_df, filter_rows(dataset, filters)), x='Diversity Score', y='Strategy Count',
+                      color='Strategy Development', size='Strategy Count',
+                      hover_name='Unit',
+                      title='Strategy Development vs Religious Diversity',
+                      labels={'Strategy Count': 'Number of Strategies'})
+
+
+def build_seat_distribution(dataset, scenario):
+    import plotly.express as px
+
+    result = simulate(dataset, scenario or DEFAULT_SELECTIONS['seat_distribution'])
+    seats = np.flatnonzero(result.seat_distribution > 1e-4)
+    seats = np.arange(seats.min(), seats.max() + 1) if len(seats) else np.arange(1)
+    fig = px.bar(x=seats, y=result.seat_distribution[seats] * 100,
+                 labels={'x': f'{dataset.unit_label}s won', 'y': 'Probability %'},
+                 title=f'Simulated {dataset.unit_label}s Won ({result.draws:,} draws)')
+    fig.add_vline(x=result.expected_seats, line_dash='dash',
+                  annotation_text=f"Expected {result.expected_seats:.1f}")
+    return fig
+
+
+def build_archetypes(dataset, k, colors=()):
+    import plotly.express as px
+
+    archetypes = get_archetypes(dataset, k or DEFAULT_ARCHETYPES)
+    centres = pd.DataFrame(archetypes.centroids, columns=RELIGIONS)
+    centres['Archetype'] = archetypes.names
+    fig = px.bar(centres.melt(id_vars='Archetype', var_name='Religion', value_name='Share %'),
+                 x='Share %', y='Archetype', color='Religion', orientation='h',
+                 title=f'Engagement Archetypes: Average Composition ({len(centres)} clusters)',
+                 color_discrete_map=palette(colors)[0])
+    fig.update_yaxes(autorange='reversed')
+    return fig
+
+
+def build_allocation(dataset, plan):
+    import plotly.express as px
+
+    allocation = optimize(dataset, plan or DEFAULT_SELECTIONS['allocation'])
+    provinces = allocation.provinces(dataset).reset_index()
+    fig = px.bar(provinces.melt(id_vars='Province', var_name='Category', value_name='Events'),
+                 x='Province', y='Events', color='Category',
+                 title=f'Recommended Events by Province (Rs. {allocation.spent / 1e6:,.1f}M)')
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+
+BUILDERS = {
+    'overview_pie': build_overview_pie,
+    'majority_bar': build_majority_bar,
+    'heatmap': build_heatmap,
+    'choropleth': build_choropleth,
+    'district_composition': build_district_composition,
+    'district_demographics': build_district_demographics,
+    'unit_trend': build_unit_trend,
+    'series_trend': build_series_trend,
+    'strategy_types': build_strategy_types,
+    'diversity_scatter': build_diversity_scatter,
+    'priority_scatter': build_priority_scatter,
+    'seat_distribution': build_seat_distribution,
+    'archetypes': build_archetypes,
+    'allocation': build_allocation,
+}
+
+
+@st.cache_resource
+def figure_cache():
+    return FigureCache()
+
+
+def figure_json(dataset, kind, selection=None, cache=None, colors=()):
+    """Return the serialized figure ``kind`` for ``selection``, in ``colors``
+    ((religion, color) pairs) where the kind is colored by religion."""
+    if cache is None:
+        cache = figure_cache()
+    colors = tuple(colors) if kind in PALETTE_KINDS else ()
+
+    def build():
+        with span(f'figure.build.{kind}'):
+            fig = BUILDERS[kind](dataset, selection, colors) if colors else BUILDERS[kind](dataset, selection)
+        with span(f'figure.compact.{kind}'):
+            return compact_figure(fig, kind)
+
+    return cache.get((kind, selection, colors, dataset.version), build)
+
+
+def _decode(kind, payload):
+    import plotly.io as pio
+
+    with span(f'figure.decode.{kind}'):
+        return pio.from_json(payload, skip_invalid=True)
+
+
+def get_figure(dataset, kind, selection=None, colors=()):
+    return _decode(kind, figure_json(dataset, kind, selection, colors=colors))
+
+
+def show_figure(dataset, kind, selection=None, colors=()):
+    payload = figure_json(dataset, kind, selection, colors=colors)
+    spec = json.loads(payload)
+    if not spec['data']:
+        # plotly refuses a figure dict without traces, such as a map with no geometry
+        import plotly.graph_objects as go
+
+        spec = go.Figure(spec)
+    with span(f'figure.emit.{kind}'):
+        st.plotly_chart(spec, use_container_width=True)
+    # The payload is the spec Streamlit sends, byte for byte (see ``payloads._dumps``)
+    record_chart(kind, len(payload.encode()))
+
+
+def prewarm(dataset, cache):
+    """Build the global charts and, if they fit in the cache, every per-unit chart."""
+    for kind in BUILDERS:
+        if kind not in UNIT_KINDS and kind not in MAP_KINDS and kind not in TREND_KINDS:
+            figure_json(dataset, kind, DEFAULT_SELECTIONS.get(kind), cache=cache)
+    history = get_history(dataset)
+    if len(history.years) > 1:
+        figure_json(dataset, 'series_trend', (history.series[0], None, history_version(dataset)), cache=cache)
+    if geometry_version(dataset.unit_label) is not None:
+        # Also simplifies the boundaries and writes them to the disk cache
+        figure_json(dataset, 'choropleth', map_selection(dataset), cache=cache)
+    units = dataset.df['Unit'].tolist()
+    if len(units) * len(UNIT_KINDS) <= cache.maxsize // 2:
+        for unit in units:
+            if not namespace_loaded(dataset.version):
+                # Evicted while pre-warming; stop refilling the cache
+                return
+            for kind in UNIT_KINDS:
+                figure_json(dataset, kind, unit, cache=cache)
+
+
+@versioned_cache(show_spinner=False, nbytes=lambda thread: 0)
+def _start_prewarm(version, _dataset):
+    thread = threading.Thread(target=prewarm, args=(_dataset, figure_cache()),
+                              name=f'figure-prewarm-{version}', daemon=True)
+    thread.start()
+    return thread
+
+
+def start_prewarm(dataset):
+    """Pre-warm the figure cache once per process and data version."""
+    return _start_prewarm(dataset.version, dataset)
+
+
+def drop_figures(version):
+    """Drop the figures of ``version``; its next load pre-warms again."""
+    figure_cache().drop_version(version)
+
+
+def clear_figures():
+    """Drop every cached figure and allow the next data load to pre-warm again."""
+    figure_cache().clear()
+    _start_prewarm.clear()
@@ -0,0 +1,217 @@
+"""Sidebar cross-filters over the units, backed by precomputed bitmasks.
+
+Every filter value gets a packed bitmask of the rows it keeps, built once per
+data version. The values are each province, each majority religion, having
+strategies or not, and every diversity threshold on the slider's
+``DIVERSITY_STEP`` grid. Applying a combination of filters is then a few
+OR/AND operations over ``ceil(rows / 64)`` uint64 words: 219 words for 14,000
+GN divisions. That takes microseconds and never touches the base frame.
+Views receive the matching row positions, or None when nothing is filtered
+and they can use the shared tables as they are. Filters nothing matches give
+an empty array, and the tabs show ``show_no_matches`` instead of their views.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import streamlit as st
+
+from data_layer import versioned_cache
+from metrics import RELIGIONS
+from search import get_index
+
+DIVERSITY_STEP = 0.01
+# Simpson's index over four religions never exceeds 0.75
+DIVERSITY_MAX = 0.75
+DIVERSITY_STEPS = round(DIVERSITY_MAX / DIVERSITY_STEP)
+
+STRATEGY_CHOICES = {'Any': None, 'With strategies': True, 'Without strategies': False}
+
+
+@dataclass(frozen=True)
+class Filters:
+    """Active filter values; hashable, so it can be part of a figure cache key.
+    ``diversity`` is an inclusive ``(low, high)`` range in ``DIVERSITY_STEP``s."""
+    provinces: tuple = ()
+    religions: tuple = ()
+    diversity: tuple = None
+    has_strategy: bool = None
+
+    @property
+    def active(self):
+        return bool(self.provinces or self.religions or self.diversity is not None
+                    or self.has_strategy is not None)
+
+
+def pack(mask):
+    """Pack a boolean row mask into little-endian uint64 words."""
+    packed = np.packbits(mask, axis=-1, bitorder='little')
+    padding = -packed.shape[-1] % 8
+    if padding:
+        packed = np.pad(packed, [(0, 0)] * (packed.ndim - 1) + [(0, padding)])
+    return np.ascontiguousarray(packed).view('<u8')
+
+
+class FilterIndex:
+    """Row indexes and bitmasks of every filter value for one dataset."""
+
+    def __init__(self, dataset):
+        metrics = dataset.metrics
+        self.n_rows = len(metrics)
+        self.all = pack(np.ones(self.n_rows, dtype=bool))
+
+        provinces = metrics['Province']
+        codes = provinces.cat.codes.to_numpy()
+        self.province_rows = {str(name): np.flatnonzero(codes == i)
+                              for i, name in enumerate(provinces.cat.categories)}
+        religions = metrics['Majority Religion'].cat.codes.to_numpy()
+        self.religion_rows = {religion: np.flatnonzero(religions == i)
+                              for i, religion in enumerate(RELIGIONS)}
+        has_strategy = metrics['Strategy Count'].to_numpy() > 0
+        self.strategy_rows = {True: np.flatnonzero(has_strategy), False: np.flatnonzero(~has_strategy)}
+        self.province_masks = {name: pack(codes == i) for i, name in enumerate(self.province_rows)}
+        self.religion_masks = {religion: pack(religions == i) for i, religion in enumerate(RELIGIONS)}
+        self.strategy_masks = {True: pack(has_strategy), False: pack(~has_strategy)}
+
+        # below[k] keeps the rows whose diversity is under k steps
+        steps = np.floor(metrics['Diversity Score'].to_numpy(dtype=np.float64) / DIVERSITY_STEP + 1e-6)
+        steps = np.clip(steps, 0, DIVERSITY_STEPS).astype(np.int32)
+        self.below = pack(steps[None, :] < np.arange(DIVERSITY_STEPS + 2)[:, None])
+
+        # Rank of every row among the sorted selectbox options, to filter them
+        # without sorting names again
+        self.unit_names = np.array(dataset.unit_options, dtype=object)
+        self.unit_rank = np.searchsorted(self.unit_names, dataset.df['Unit'].to_numpy(dtype=object))
+        self.strategy_names = np.array(dataset.strategy_options, dtype=object)
+        strategy_rank = {unit: i for i, unit in enumerate(dataset.strategy_options)}
+        self.strategy_rank = np.array([strategy_rank.get(unit, -1) for unit in dataset.unit_options],
+                                      dtype=np.int64)[self.unit_rank]
+
+        self._dataset = dataset
+        self._lock = threading.Lock()
+        self._doc_rows = None
+
+    def _union(self, masks, keys):
+        return np.bitwise_or.reduce([masks[key] for key in keys])
+
+    def mask(self, filters):
+        """Packed mask of the rows kept by ``filters``."""
+        mask = self.all.copy()
+        if filters.provinces:
+            mask &= self._union(self.province_masks, filters.provinces)
+        if filters.religions:
+            mask &= self._union(self.religion_masks, filters.religions)
+        if filters.has_strategy is not None:
+            mask &= self.strategy_masks[filters.has_strategy]
+        if filters.diversity is not None:
+            low, high = filters.diversity
+            mask &= self.below[high + 1] & ~self.below[low]
+        return mask
+
+    def _single(self, filters):
+        # One filter with one value is already a row index array
+        chosen = [(self.province_rows, filters.provinces), (self.religion_rows, filters.religions)]
+        if filters.has_strategy is not None:
+            chosen.append((self.strategy_rows, (filters.has_strategy,)))
+        chosen = [(rows, keys) for rows, keys in chosen if keys]
+        if filters.diversity is None and len(chosen) == 1 and len(chosen[0][1]) == 1:
+            rows, (key,) = chosen[0]
+            return rows[key]
+        return None
+
+    def positions(self, filters):
+        """Sorted row positions kept by ``filters``, or None if nothing is filtered."""
+        if filters is None or not filters.active:
+            return None
+        rows = self._single(filters)
+        if rows is not None:
+            return rows
+        bits = np.unpackbits(self.mask(filters).view(np.uint8), count=self.n_rows, bitorder='little')
+        return np.flatnonzero(bits.view(bool))
+
+    def row_mask(self, rows):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def unit_options(self, rows):
+        if rows is None:
+            return self._dataset.unit_options
+        return tuple(self.unit_names[np.sort(self.unit_rank[rows])])
+
+    def strategy_options(self, rows):
+        if rows is None:
+            return self._dataset.strategy_options
+        ranks = self.strategy_rank[rows]
+        return tuple(self.strategy_names[np.sort(ranks[ranks >= 0])])
+
+    def doc_mask(self, rows):
+        """Which strategy documents of the search index belong to ``rows``."""
+        if rows is None:
+            return None
+        with self._lock:
+            if self._doc_rows is None:
+                positions = self._dataset.unit_positions
+                self._doc_rows = np.array([positions.get(unit, -1) for unit in get_index(self._dataset).units],
+                                          dtype=np.int64)
+        doc_rows = self._doc_rows
+        return (doc_rows >= 0) & self.row_mask(rows)[doc_rows]
+
+
+@versioned_cache(show_spinner=False)
+def _build_filter_index(version, _dataset):
+    return FilterIndex(_dataset)
+
+
+def get_filter_index(dataset):
+    """Return the process-wide filter index for the dataset's version."""
+    return _build_filter_index(dataset.version, dataset)
+
+
+def filter_rows(dataset, filters):
+    """Row positions kept by ``filters``, or None when the view is unfiltered."""
+    if filters is None:
+        return None
+    return get_filter_index(dataset).positions(filters)
+
+
+def filter_sidebar(dataset):
+    """Render the sidebar filters; return the active ``Filters`` or None. The
+    filters are returned even when no unit matches them."""
+    st.sidebar.header("🔍 Filters")
+    provinces = st.sidebar.multiselect("Province", dataset.province_options, key="filter_provinces")
+    religions = st.sidebar.multiselect("Majority religion", RELIGIONS, key="filter_religions")
+    low, high = st.sidebar.slider("Diversity index", 0.0, DIVERSITY_MAX, (0.0, DIVERSITY_MAX),
+                                  step=DIVERSITY_STEP, key="filter_diversity")
+    strategy = st.sidebar.radio("Strategies", list(STRATEGY_CHOICES), horizontal=True,
+                                key="filter_strategy")
+
+    diversity = (round(low / DIVERSITY_STEP), round(high / DIVERSITY_STEP))
+    filters = Filters(
+        provinces=tuple(provinces),
+        religions=tuple(religions),
+        diversity=None if diversity == (0, DIVERSITY_STEPS) else diversity,
+        has_strategy=STRATEGY_CHOICES[strategy],
+    )
+    if not filters.active:
+        return None
+
+    index = get_filter_index(dataset)
+    start = time.perf_counter()
+    rows = index.positions(filters)
+    elapsed = (time.perf_counter() - start) * 1e6
+    if not len(rows):
+        st.sidebar.warning(f"No {dataset.unit_label}s match these filters.")
+        return filters
+    st.sidebar.caption(f"{len(rows):,} of {len(dataset.df):,} {dataset.unit_label}s match "
+                       f"({elapsed:.0f} µs)")
+    return filters
+
+
+def show_no_matches(dataset, rows):
+    """Render the empty state of a filtered view and return True if ``rows`` is empty."""
+    if rows is None or len(rows):
+        return False
+    st.info(f"No {dataset.unit_label}s match the sidebar filters. Widen or clear them to see this view.")
+    return True
@@ -0,0 +1,233 @@
+"""Boundary geometry for the choropleth map.
+
+Boundaries are read from local GeoJSON or TopoJSON files in
+``ELECTION_GEOMETRY_DIR`` named after the administrative level
+(``district.geojson``, ``polling_division.topojson``, ...). Each file is
+simplified once per tolerance level with Douglas-Peucker, coordinates are
+rounded, and the result is cached on disk under ``ELECTION_CACHE_DIR`` so
+later processes load the small version directly. The map picks the coarsest
+level whose tolerance is still below a pixel for the area being shown, and only
+sends the features inside that area.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import streamlit as st
+
+from loaders import LEVELS, file_fingerprint
+
+GEOMETRY_DIR = os.environ.get('ELECTION_GEOMETRY_DIR') or None
+CACHE_DIR = Path(os.environ.get('ELECTION_CACHE_DIR') or Path(__file__).resolve().parent / '.cache')
+
+GEOMETRY_SUFFIXES = ('.geojson', '.json', '.topojson')
+
+# Simplification tolerances in degrees, coarse to fine (~2 km down to ~10 m)
+TOLERANCES = (0.02, 0.005, 0.002, 0.0005, 0.0001)
+
+# Approximate map width in pixels; a tolerance below one pixel is invisible
+VIEWPORT_PIXELS = 800
+
+# Feature properties tried, in order, for the unit name
+NAME_PROPERTIES = ('Unit', 'name', 'NAME', 'shapeName', 'ADM2_EN', 'ADM3_EN', 'ADM4_EN')
+
+LEVEL_OF_LABEL = {label: level for level, label in LEVELS.items()}
+
+
+def geometry_path(level):
+    """Return the boundary file for ``level``, or None if there is none."""
+    if GEOMETRY_DIR is None:
+        return None
+    for suffix in GEOMETRY_SUFFIXES:
+        path = Path(GEOMETRY_DIR) / f'{level}{suffix}'
+        if path.exists():
+            return path
+    return None
+
+
+def geometry_version(unit_label):
+    """Fingerprint of the boundary file for a unit level, or None if there is none."""
+    path = geometry_path(LEVEL_OF_LABEL[unit_label])
+    return None if path is None else file_fingerprint(path)
+
+
+def topojson_to_geojson(topology, object_name=None):
+    """Decode the polygons of one TopoJSON object into a GeoJSON FeatureCollection."""
+    transform = topology.get('transform')
+    arcs = []
+    for arc in topology['arcs']:
+        points = np.asarray(arc, dtype=np.float64)[:, :2]
+        if transform:
+            points = np.cumsum(points, axis=0) * transform['scale'] + transform['translate']
+        arcs.append(points)
+
+    def ring(indices):
+        parts = []
+        for i in indices:
+            points = arcs[i] if i >= 0 else arcs[~i][::-1]
+            parts.append(points if not parts else points[1:])
+        return np.concatenate(parts).tolist()
+
+    objects = topology['objects']
+    obj = objects[object_name or next(iter(objects))]
+    geometries = obj['geometries'] if obj['type'] == 'GeometryCollection' else [obj]
+    features = []
+    for geometry in geometries:
+        if geometry['type'] == 'Polygon':
+            coordinates = [ring(r) for r in geometry['arcs']]
+        elif geometry['type'] == 'MultiPolygon':
+            coordinates = [[ring(r) for r in polygon] for polygon in geometry['arcs']]
+        else:
+            continue
+        features.append({'type': 'Feature', 'properties': geometry.get('properties', {}),
+                         'geometry': {'type': geometry['type'], 'coordinates': coordinates}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def read_geometry(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('type') == 'Topology':
+        data = topojson_to_geojson(data)
+    return data
+
+
+def douglas_peucker(points, tolerance):
+    """Simplify a polyline (an (n, 2) array) keeping points further than ``tolerance``."""
+    n = len(points)
+    if n < 3:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            # Closed ring: measure from the shared start/end point
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def _simplify_ring(ring, tolerance, exterior):
+    points = np.asarray(ring, dtype=np.float64)
+    simplified = douglas_peucker(points, tolerance)
+    if len(simplified) < 4:
+        if not exterior:
+            return None
+        # Keep a minimal closed outline rather than dropping the unit
+        simplified = points[np.linspace(0, len(points) - 1, 4).astype(int)]
+        simplified[-1] = simplified[0]
+    decimals = max(int(np.ceil(-np.log10(tolerance))) + 1, 3)
+    return np.round(simplified, decimals).tolist()
+
+
+def _simplify_polygon(polygon, tolerance):
+    rings = [_simplify_ring(ring, tolerance, exterior=(i == 0)) for i, ring in enumerate(polygon)]
+    return [ring for ring in rings if ring is not None]
+
+
+def simplify(collection, tolerance, level):
+    """Simplified copy of ``collection`` carrying only the unit name property."""
+    names = (LEVELS[level],) + NAME_PROPERTIES
+    features = []
+    for feature in collection['features']:
+        properties = feature.get('properties') or {}
+        name = next((str(properties[key]) for key in names if properties.get(key) is not None), None)
+        geometry = feature.get('geometry') or {}
+        if name is None or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+            continue
+        if geometry['type'] == 'Polygon':
+            coordinates = _simplify_polygon(geometry['coordinates'], tolerance)
+        else:
+            coordinates = [_simplify_polygon(p, tolerance) for p in geometry['coordinates']]
+        bbox = _bbox(geometry)
+        features.append({'type': 'Feature', 'id': name, 'properties': {'unit': name},
+                         'bbox': bbox, 'geometry': {'type': geometry['type'], 'coordinates': coordinates}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _bbox(geometry):
+    coordinates = geometry['coordinates']
+    rings = coordinates if geometry['type'] == 'Polygon' else [r for p in coordinates for r in p]
+    points = np.concatenate([np.asarray(ring, dtype=np.float64)[:, :2] for ring in rings])
+    return [float(v) for v in (*points.min(axis=0), *points.max(axis=0))]
+
+
+def _cache_path(fingerprint, level, tolerance):
+    digest = hashlib.sha256(f'{fingerprint}|{tolerance}'.encode()).hexdigest()[:16]
+    return CACHE_DIR / 'geometry' / f'{level}-{digest}.geojson'
+
+
+@st.cache_resource(show_spinner=False)
+def _load_simplified(path, fingerprint, level, tolerance):
+    cached = _cache_path(fingerprint, level, tolerance)
+    if cached.exists():
+        with open(cached, encoding='utf-8') as f:
+            return json.load(f)
+    collection = simplify(read_geometry(path), tolerance, level)
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cached.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(collection, f, separators=(',', ':'))
+    os.replace(tmp, cached)
+    return collection
+
+
+def load_geometry(level, tolerance):
+    """Simplified boundaries for ``level`` at ``tolerance``, or None if unavailable."""
+    path = geometry_path(level)
+    if path is None:
+        return None
+    return _load_simplified(str(path), file_fingerprint(path), level, tolerance)
+
+
+def tolerance_for_extent(bbox):
+    """Coarsest tolerance that stays below one pixel for a view of ``bbox``."""
+    span = max(bbox[2] - bbox[0], bbox[3] - bbox[1], 1e-6)
+    pixel = span / VIEWPORT_PIXELS
+    for tolerance in TOLERANCES:
+        if tolerance <= pixel:
+            return tolerance
+    return TOLERANCES[-1]
+
+
+def features_for(collection, units):
+    """Sub-collection with only the features named in ``units``."""
+    units = set(units)
+    return {'type': 'FeatureCollection',
+            'features': [f for f in collection['features'] if f['id'] in units]}
+
+
+def extent(collection):
+    boxes = np.array([f['bbox'] for f in collection['features']])
+    if not len(boxes):
+        return None
+    return [*boxes[:, :2].min(axis=0), *boxes[:, 2:].max(axis=0)]
+
+
+def prepare_view(level, units):
+    """Pick the detail level for the area covered by ``units`` and return the
+    matching feature collection together with the tolerance used."""
+    coarse = load_geometry(level, TOLERANCES[0])
+    if coarse is None:
+        return None, None
+    bbox = extent(features_for(coarse, units))
+    if bbox is None:
+        return None, None
+    tolerance = tolerance_for_extent(bbox)
+    return features_for(load_geometry(level, tolerance), units), tolerance
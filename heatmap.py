@@ -0,0 +1,86 @@
+"""Server-side aggregation for the religious composition heatmap.
+
+Units are grouped by province, district or the unit level itself (optionally
+drilled down into one province or district), the rows are ordered so similar
+compositions sit together, and anything beyond ``MAX_ROWS`` rows is averaged
+into contiguous bands. The matrix sent to the browser therefore stays the same
+size whether 25 or 14,000 units are loaded. Province and district rows come from
+the dataset's aggregate cube when one is given.
+"""
+import numpy as np
+import pandas as pd
+
+from metrics import RELIGIONS
+
+# Most rows drawn in one heatmap; more are merged into bands
+MAX_ROWS = 120
+
+ROW_HEIGHT = 18
+MIN_HEIGHT = 320
+MAX_HEIGHT = 800
+
+
+def _group(df, group_col):
+    codes, names = pd.factorize(df[group_col], sort=True)
+    X = df[RELIGIONS].to_numpy(dtype=np.float64)
+    counts = np.bincount(codes, minlength=len(names)).astype(np.float64)
+    sums = np.column_stack([np.bincount(codes, weights=X[:, j], minlength=len(names))
+                            for j in range(X.shape[1])])
+    return sums / counts[:, None], np.asarray(names, dtype=object).astype(str), counts
+
+
+def seriate(matrix):
+    """Row order clustering rows by majority religion, then along the first
+    principal component within each cluster."""
+    if len(matrix) < 3:
+        return np.lexsort((-matrix.max(axis=1), matrix.argmax(axis=1)))
+    centered = matrix - matrix.mean(axis=0)
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    return np.lexsort((centered @ vt[0], matrix.argmax(axis=1)))
+
+
+def decimate(matrix, labels, weights, max_rows=MAX_ROWS):
+    """Average consecutive rows into at most ``max_rows`` weighted bands."""
+    n = len(matrix)
+    if n <= max_rows:
+        return matrix, labels, weights
+    starts = np.linspace(0, n, max_rows + 1).astype(np.int64)[:-1]
+    sizes = np.diff(np.append(starts, n))
+    band_weights = np.add.reduceat(weights, starts)
+    bands = np.add.reduceat(matrix * weights[:, None], starts, axis=0) / band_weights[:, None]
+    band_labels = np.array([labels[start] if size == 1 else f"{labels[start]} (+{size - 1})"
+                            for start, size in zip(starts, sizes)], dtype=object)
+    return bands, band_labels, band_weights
+
+
+def heatmap_matrix(df, group_by, province=None, district=None, max_rows=MAX_ROWS, rows=None,
+                   aggregates=None):
+    """Return ``(matrix, row_labels, unit_counts)`` for the heatmap.
+
+    ``group_by`` is ``'Province'``, ``'District'`` or ``'Unit'``; ``province``
+    and ``district`` restrict the rows to one branch of the hierarchy, and
+    ``rows`` to the given row positions. ``aggregates`` (an ``AggregateCube``
+    for ``df``) supplies the province and district rows.
+    """
+    if rows is None:
+        mask = np.ones(len(df), dtype=bool)
+    else:
+        mask = np.zeros(len(df), dtype=bool)
+        mask[rows] = True
+    if province is not None:
+        mask &= (df['Province'] == province).to_numpy()
+    if district is not None:
+        mask &= (df['District'] == district).to_numpy()
+    if not mask.any():
+        return np.empty((0, len(RELIGIONS))), np.empty(0, dtype=object), np.empty(0)
+
+    if aggregates is not None and group_by in ('Province', 'District'):
+        labels, matrix, counts = aggregates.level_means(group_by, None if mask.all() else np.flatnonzero(mask))
+    else:
+        matrix, labels, counts = _group(df[mask] if not mask.all() else df, group_by)
+    order = seriate(matrix)
+    return decimate(matrix[order], labels[order], counts[order], max_rows)
+
+
+def heatmap_height(n_rows):
+    return int(min(max(n_rows * ROW_HEIGHT + 150, MIN_HEIGHT), MAX_HEIGHT))
@@ -0,0 +1,239 @@
+"""Multi-year census and election history keyed by (unit, year).
+
+A data source's history file (``ELECTION_HISTORY``, or a tenant's ``history``)
+is a long-format file (Parquet, CSV or a SQLite ``history`` table) with the unit column of the configured level, a ``Year``
+column and any numeric series: religion shares from each census (1981, 2001,
+2012, the next one once released) and past election results such as
+``Turnout %``. Units and years missing from the file are simply absent. The
+dashboard's own data is the ``CENSUS_YEAR`` snapshot and is added as that year
+unless the file already has it, so without a history file the store holds a
+single year.
+
+The history is converted once per data version into a dense float32 cube of
+``(series, years, units)``, with units in the dashboard's row order, and saved
+as ``.npy`` files under ``ELECTION_CACHE_DIR``. Every process then memory-maps
+it read-only, so "all units, all years" of a series is a zero-copy slice of the
+page cache. Year-over-year changes and estimates for the years in between are
+computed over all units at once; a unit without a value in some year (a census
+not held in its district, an election year) is bridged from its own nearest
+recorded years.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data_layer import versioned_cache
+from geo import CACHE_DIR
+from instrumentation import span
+from loaders import file_fingerprint, load_history
+from metrics import RELIGIONS
+
+# Year of the census behind the dashboard's demographics
+CENSUS_YEAR = 2012
+
+# Bump when the cube layout changes so cached cubes are rebuilt
+STORE_VERSION = 1
+
+
+class HistoryStore:
+    """Read-only ``(series, years, units)`` cube with vectorized year arithmetic.
+
+    ``last_seen[s, y, u]`` is the index of the last year at or before ``y`` in
+    which unit ``u`` has a value of series ``s`` (-1 if none), and
+    ``next_seen`` the first at or after it (``len(years)`` if none).
+    """
+
+    def __init__(self, values, last_seen, next_seen, series, years):
+        self.values = values
+        self.last_seen = last_seen
+        self.next_seen = next_seen
+        self.series = tuple(series)
+        self.years = np.asarray(years, dtype=np.int32)
+        self._series = {name: i for i, name in enumerate(self.series)}
+
+    def __contains__(self, name):
+        return name in self._series
+
+    @property
+    def census_series(self):
+        return tuple(name for name in self.series if name in RELIGIONS)
+
+    @property
+    def other_series(self):
+        return tuple(name for name in self.series if name not in RELIGIONS)
+
+    def unit_frame(self, position, series=None):
+        """Recorded values of one unit as a frame indexed by ``Year``."""
+        series = list(series or self.series)
+        columns = [self._series[name] for name in series]
+        frame = pd.DataFrame(self.values[columns, :, position].T, index=self.years, columns=series)
+        frame.index.name = 'Year'
+        return frame.dropna(how='all')
+
+    def changes(self, name):
+        """Change of ``name`` since each unit's previous recorded year, as
+        ``(total, per_year)`` arrays of shape ``(years, units)``; NaN where a
+        unit has no value in that year or none before it."""
+        s = self._series[name]
+        values = self.values[s]
+        previous = np.full(values.shape, -1, dtype=self.last_seen.dtype)
+        previous[1:] = self.last_seen[s, :-1]
+        valid = (previous >= 0) & ~np.isnan(values)
+        previous = np.where(valid, previous, 0)
+        columns = np.arange(values.shape[1])
+        total = np.where(valid, values - values[previous, columns], np.nan)
+        gap = (self.years[:, None] - self.years[previous]).astype(np.float32)
+        per_year = np.divide(total, gap, out=np.full(values.shape, np.nan, dtype=np.float32),
+                             where=valid & (gap > 0))
+        return total.astype(np.float32), per_year
+
+    def latest_change(self, name):
+        """Per-year change of ``name`` over each unit's latest recorded interval."""
+        s = self._series[name]
+        _, per_year = self.changes(name)
+        latest = self.last_seen[s, -1]
+        columns = np.arange(per_year.shape[1])
+        return np.where(latest >= 0, per_year[np.maximum(latest, 0), columns], np.nan)
+
+    def unit_changes(self, position, series=None):
+        """Latest value of each series for one unit, with its change since the
+        unit's previous recorded year."""
+        rows = []
+        for name in series or self.series:
+            s = self._series[name]
+            latest = int(self.last_seen[s, -1, position])
+            if latest < 0:
+                continue
+            previous = int(self.last_seen[s, latest - 1, position]) if latest > 0 else -1
+            value = float(self.values[s, latest, position])
+            row = {'Series': name, 'Year': int(self.years[latest]), 'Value': value,
+                   'Since': None, 'Change': np.nan, 'Change per Year': np.nan}
+            if previous >= 0:
+                change = value - float(self.values[s, previous, position])
+                row.update(Since=int(self.years[previous]), Change=change,
+                           **{'Change per Year': change / (self.years[latest] - self.years[previous])})
+            rows.append(row)
+        return pd.DataFrame(rows).round(3)
+
+    def estimate(self, name, years):
+        """Values of ``name`` for every unit in each of ``years``, shape
+        ``(len(years), units)``. Linear between a unit's nearest recorded years,
+        exact in a recorded year and NaN outside its recorded range."""
+        s = self._series[name]
+        values = np.asarray(self.values[s])
+        recorded = self.years.astype(np.float64)
+        years = np.atleast_1d(np.asarray(years, dtype=np.float64))
+        n_years = len(recorded)
+        below = np.searchsorted(recorded, years, 'right') - 1
+        above = np.searchsorted(recorded, years, 'left')
+        in_range = (below >= 0) & (above < n_years)
+        low = self.last_seen[s, np.clip(below, 0, n_years - 1)]
+        high = self.next_seen[s, np.clip(above, 0, n_years - 1)]
+        valid = in_range[:, None] & (low >= 0) & (high < n_years)
+        low = np.where(valid, low, 0).astype(np.intp)
+        high = np.where(valid, high, 0).astype(np.intp)
+
+        # Flat gathers from the (years, units) slice
+        flat = np.asarray(values).reshape(-1)
+        offsets = np.arange(values.shape[1])
+        low_values = flat.take(low * values.shape[1] + offsets)
+        result = flat.take(high * values.shape[1] + offsets) - low_values
+        gap = (recorded[high] - recorded[low]).astype(np.float32)
+        weight = np.divide((years[:, None] - recorded[low]).astype(np.float32), gap,
+                           out=np.zeros(gap.shape, dtype=np.float32), where=gap > 0)
+        result *= weight
+        result += low_values
+        result[~valid] = np.nan
+        return result
+
+
+def group_means(values, codes, n_groups):
+    """Mean of ``(rows, units)`` values per unit group, ignoring NaN; returns
+    ``(rows, n_groups)``."""
+    members = np.zeros((len(codes), n_groups), dtype=np.float32)
+    members[np.arange(len(codes)), codes] = 1
+    valid = ~np.isnan(values)
+    sums = np.where(valid, values, 0) @ members
+    counts = valid.astype(np.float32) @ members
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan, dtype=np.float32), where=counts > 0)
+
+
+def build_cube(dataset, history=None):
+    """Return ``(values, series, years)`` for ``history`` rows aligned to ``dataset.df``."""
+    if history is None or not (history['Year'] == CENSUS_YEAR).any():
+        snapshot = dataset.df[['Unit'] + RELIGIONS].assign(Year=CENSUS_YEAR)
+        history = snapshot if history is None else pd.concat([history, snapshot], ignore_index=True)
+    positions = history['Unit'].astype(str).map(dataset.unit_positions)
+    history = history[positions.notna()]
+    positions = positions[positions.notna()].to_numpy(dtype=np.int64)
+
+    series = [col for col in history.columns if col not in ('Unit', 'Year')]
+    years = np.unique(history['Year'].to_numpy(dtype=np.int32))
+    steps = np.searchsorted(years, history['Year'].to_numpy(dtype=np.int32))
+    values = np.full((len(series), len(years), len(dataset.df)), np.nan, dtype=np.float32)
+    for i, name in enumerate(series):
+        values[i, steps, positions] = history[name].to_numpy(dtype=np.float32)
+    return values, series, years
+
+
+def recorded_indexes(values):
+    """The ``last_seen`` and ``next_seen`` recorded-year indexes of a cube."""
+    valid = ~np.isnan(values)
+    steps = np.arange(values.shape[1], dtype=np.int8)[None, :, None]
+    last_seen = np.maximum.accumulate(np.where(valid, steps, np.int8(-1)), axis=1)
+    reverse = np.where(valid, steps, np.int8(values.shape[1]))[:, ::-1]
+    next_seen = np.minimum.accumulate(reverse, axis=1)[:, ::-1]
+    return last_seen, np.ascontiguousarray(next_seen)
+
+
+def history_version(dataset):
+    """Key of the history cube for ``dataset`` and its source's history file."""
+    path = dataset.source.history
+    parts = [str(STORE_VERSION), dataset.version, file_fingerprint(path) if path else '']
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:16]
+
+
+def _write_store(directory, dataset):
+    path = dataset.source.history
+    history = load_history(path, dataset.source.level) if path else None
+    values, series, years = build_cube(dataset, history)
+    last_seen, next_seen = recorded_indexes(values)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=directory.parent)
+    os.chmod(tmp, 0o755)
+    for name, array in (('values', values), ('last_seen', last_seen), ('next_seen', next_seen)):
+        np.save(os.path.join(tmp, f'{name}.npy'), array)
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'series': series, 'years': years.tolist(), 'units': len(dataset.df)}, f)
+    try:
+        os.replace(tmp, directory)
+    except OSError:
+        # Another process finished the same cube first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@versioned_cache(show_spinner=False)
+def _load_store(version, key, _dataset):
+    directory = CACHE_DIR / 'history' / key
+    if not (directory / 'meta.json').exists():
+        with span('history.build'):
+            _write_store(directory, _dataset)
+    with span('history.load'):
+        with open(directory / 'meta.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = [np.load(directory / f'{name}.npy', mmap_mode='r') for name in ('values', 'last_seen', 'next_seen')]
+    return HistoryStore(*arrays, series=meta['series'], years=meta['years'])
+
+
+def get_history(dataset):
+    """Return the process-wide history store for ``dataset``."""
+    return _load_store(dataset.version, history_version(dataset), dataset)
+
+
+def clear_history():
+    _load_store.clear()
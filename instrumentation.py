@@ -0,0 +1,245 @@
+"""Lightweight timing and allocation spans for the dashboard hot paths.
+
+Wrap a named section in ``with span('name'):`` to record its wall time (and,
+optionally, the memory it allocated). Spans are aggregated process-wide across
+all sessions, shown in a hidden sidebar debug panel (``?debug=1``) and can be
+flushed periodically to a Prometheus text file and/or a JSONL event log.
+
+Configuration:
+
+``ELECTION_PROFILE``
+    ``1`` to record timings, ``alloc`` to also record allocations through
+    ``tracemalloc``. Unset (the default) makes every span a shared no-op.
+``ELECTION_PROFILE_PROM``
+    Path of a Prometheus text-format file rewritten every flush.
+``ELECTION_PROFILE_JSONL``
+    Path of a JSONL file that every recorded span is appended to.
+``ELECTION_PROFILE_FLUSH``
+    Seconds between flushes (default 10).
+
+Allocation figures come from the process-wide ``tracemalloc`` counters, so they
+are approximate while several sessions render at once. A span's peak is the
+highest traced memory seen while it was open, including inside nested spans
+and spans in other threads, less the memory traced when it opened.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+PROFILE_MODE = os.environ.get('ELECTION_PROFILE', '').lower()
+ENABLED = PROFILE_MODE not in ('', '0', 'off')
+TRACE_ALLOCATIONS = PROFILE_MODE == 'alloc'
+
+PROMETHEUS_PATH = os.environ.get('ELECTION_PROFILE_PROM') or None
+JSONL_PATH = os.environ.get('ELECTION_PROFILE_JSONL') or None
+FLUSH_INTERVAL = float(os.environ.get('ELECTION_PROFILE_FLUSH', '10'))
+
+# Recent durations kept per span for percentiles
+SAMPLES_PER_SPAN = 1024
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class SpanStats:
+    __slots__ = ('count', 'total', 'max', 'alloc_total', 'alloc_peak', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.alloc_total = 0
+        self.alloc_peak = 0
+        self.samples = deque(maxlen=SAMPLES_PER_SPAN)
+
+
+class SpanRegistry:
+    """Process-wide aggregate of every recorded span."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._pending = []
+
+    def record(self, name, seconds, allocated=0, peak=0):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = SpanStats()
+            stats.count += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.alloc_total += allocated
+            stats.alloc_peak = max(stats.alloc_peak, peak)
+            stats.samples.append(seconds)
+            if JSONL_PATH:
+                self._pending.append({'ts': time.time(), 'span': name, 'seconds': seconds,
+                                      'alloc_bytes': allocated, 'peak_bytes': peak})
+
+    def snapshot(self):
+        """Return one summary row per span, slowest total first."""
+        with self._lock:
+            items = [(name, stats.count, stats.total, stats.max, stats.alloc_total,
+                      stats.alloc_peak, np.array(stats.samples))
+                     for name, stats in self._spans.items()]
+        rows = []
+        for name, count, total, longest, alloc_total, alloc_peak, samples in items:
+            rows.append({
+                'span': name,
+                'count': count,
+                'total_ms': total * 1000,
+                'mean_ms': total / count * 1000,
+                'p50_ms': float(np.percentile(samples, 50)) * 1000,
+                'p95_ms': float(np.percentile(samples, 95)) * 1000,
+                'max_ms': longest * 1000,
+                'alloc_kb': alloc_total / 1024,
+                'peak_kb': alloc_peak / 1024,
+            })
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def drain_events(self):
+        with self._lock:
+            events, self._pending = self._pending, []
+        return events
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._pending.clear()
+
+
+registry = SpanRegistry()
+
+
+# Spans open in any thread. ``tracemalloc`` keeps one process-wide peak, so
+# before a span resets it the peak so far is folded into every open span.
+_active = set()
+_active_lock = threading.Lock()
+
+
+def _fold_peak():
+    # Caller holds ``_active_lock``
+    current, peak = tracemalloc.get_traced_memory()
+    for active in _active:
+        active.max_seen = max(active.max_seen, peak)
+    return current
+
+
+class _Span:
+    __slots__ = ('name', 'start', 'mem_start', 'max_seen')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if TRACE_ALLOCATIONS:
+            with _active_lock:
+                self.mem_start = self.max_seen = _fold_peak()
+                tracemalloc.reset_peak()
+                _active.add(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        allocated = peak = 0
+        if TRACE_ALLOCATIONS:
+            with _active_lock:
+                current = _fold_peak()
+                _active.discard(self)
+            allocated = max(current - self.mem_start, 0)
+            peak = max(self.max_seen - self.mem_start, 0)
+        registry.record(self.name, seconds, allocated, peak)
+        return False
+
+
+def span(name):
+    """Context manager timing the named section; a shared no-op when disabled."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def prometheus_text(rows=None):
+    """Render the aggregated spans in Prometheus text exposition format."""
+    rows = registry.snapshot() if rows is None else rows
+    lines = [
+        '# HELP election_span_seconds Wall time spent in a dashboard section.',
+        '# TYPE election_span_seconds summary',
+    ]
+    for row in rows:
+        label = row['span'].replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'election_span_seconds{{span="{label}",quantile="0.5"}} {row["p50_ms"] / 1000:.6f}')
+        lines.append(f'election_span_seconds{{span="{label}",quantile="0.95"}} {row["p95_ms"] / 1000:.6f}')
+        lines.append(f'election_span_seconds_sum{{span="{label}"}} {row["total_ms"] / 1000:.6f}')
+        lines.append(f'election_span_seconds_count{{span="{label}"}} {row["count"]}')
+    if TRACE_ALLOCATIONS:
+        lines.append('# HELP election_span_alloc_bytes_total Memory allocated inside a dashboard section.')
+        lines.append('# TYPE election_span_alloc_bytes_total counter')
+        for row in rows:
+            label = row['span'].replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'election_span_alloc_bytes_total{{span="{label}"}} {int(row["alloc_kb"] * 1024)}')
+    return '\n'.join(lines) + '\n'
+
+
+def flush():
+    """Write the Prometheus file and append pending JSONL events."""
+    if PROMETHEUS_PATH:
+        tmp = f'{PROMETHEUS_PATH}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(prometheus_text())
+        os.replace(tmp, PROMETHEUS_PATH)
+    if JSONL_PATH:
+        events = registry.drain_events()
+        if events:
+            with open(JSONL_PATH, 'a') as f:
+                for event in events:
+                    f.write(json.dumps(event) + '\n')
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def start():
+    """Start tracing and the background flusher once per process."""
+    global _flusher
+    if not ENABLED:
+        return
+    with _flusher_lock:
+        if TRACE_ALLOCATIONS and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if _flusher is None and (PROMETHEUS_PATH or JSONL_PATH):
+            _flusher = threading.Thread(target=_flush_loop, name='span-flusher', daemon=True)
+            _flusher.start()
+
+
+def show_debug_panel():
+    """Render the span table in the sidebar when the page has ``?debug=1``."""
+    import streamlit as st
+
+    if st.query_params.get('debug') != '1':
+        return
+    with st.sidebar.expander("Debug: timing spans", expanded=True):
+        if not ENABLED:
+            st.caption("Profiling is off. Set ELECTION_PROFILE=1 (or alloc) and restart.")
+            return
+        rows = registry.snapshot()
+        if rows:
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+        if st.button("Reset spans"):
+            registry.reset()
@@ -0,0 +1,223 @@
+"""Background jobs for long analytics, shared by every session.
+
+Streamlit runs the script on the session's own thread, so a long computation
+in a tab freezes the page and holds a server thread until it returns. A job
+instead runs on a process-wide pool of ``ELECTION_JOB_WORKERS`` threads, and
+the tab shows its progress until it finishes. Heavy numeric work inside a job
+can still fan out to a process pool, as the simulator does at GN scale.
+
+Jobs are keyed by their inputs. Submitting a key that is already queued or
+running joins that job instead of starting another one, so ten sessions asking
+for the same scenario share one run. Finished results stay in an LRU of
+``JOB_RESULT_CACHE_SIZE`` entries for any later session. Each session holds at
+most one job per slot (for example, one simulator tab). When its selection
+changes, it releases the old job. A job that no session is waiting for any
+more is cancelled at its next progress report.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from rendering import FRAGMENTS_ENABLED, fragment
+
+JOB_WORKERS = int(os.environ.get('ELECTION_JOB_WORKERS', '2'))
+JOB_RESULT_CACHE_SIZE = 64
+
+# Jobs finishing within this long are shown at once, without a progress bar
+INLINE_WAIT = 0.25
+POLL_SECONDS = 0.5
+
+_SESSION_KEY = '_jobs'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when nobody is waiting for it any more."""
+
+
+class Job:
+    """One run of a function, with its progress, result and subscribers."""
+
+    def __init__(self, key, fn):
+        self.key = key
+        self.fn = fn
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.seconds = None
+        self.owners = set()
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    @property
+    def done(self):
+        return self.status == 'done'
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def report(self, fraction, message=None):
+        """Progress callback passed to the job function; raises
+        :class:`JobCancelled` once the job has been cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.key)
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+
+class JobQueue:
+    """Thread pool with in-flight deduplication and a result cache."""
+
+    def __init__(self, workers=JOB_WORKERS, cache_size=JOB_RESULT_CACHE_SIZE):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._running = {}
+        self._results = OrderedDict()
+        self.cache_size = cache_size
+        self.submitted = self.joined = self.reused = self.cancelled = 0
+
+    def submit(self, key, fn, owner=None):
+        """Return the job for ``key``: a cached result, the in-flight run, or a
+        new run of ``fn(report)``."""
+        with self._lock:
+            job = self._results.get(key)
+            if job is not None:
+                self._results.move_to_end(key)
+                self.reused += 1
+                return job
+            job = self._running.get(key)
+            if job is not None:
+                # Joining also revives a job whose last owner just left
+                job._cancel.clear()
+                self.joined += 1
+            else:
+                job = self._running[key] = Job(key, fn)
+                self.submitted += 1
+                self._pool.submit(self._run, job)
+            if owner is not None:
+                job.owners.add(owner)
+        return job
+
+    def release(self, key, owner):
+        """Stop waiting for ``key``; cancel it if no one else is waiting."""
+        with self._lock:
+            job = self._running.get(key)
+            if job is None:
+                return
+            job.owners.discard(owner)
+            if not job.owners:
+                job._cancel.set()
+
+    def _run(self, job):
+        start = time.perf_counter()
+        with self._lock:
+            cancelled = job._cancel.is_set()
+            job.status = 'cancelled' if cancelled else 'running'
+        try:
+            if cancelled:
+                raise JobCancelled(job.key)
+            result = job.fn(job.report)
+        except JobCancelled:
+            status, result = 'cancelled', None
+        except Exception as e:
+            status, result = 'failed', None
+            job.error = e
+        else:
+            status = 'done'
+        with self._lock:
+            job.status, job.result, job.progress = status, result, 1.0 if status == 'done' else job.progress
+            job.seconds = time.perf_counter() - start
+            self._running.pop(job.key, None)
+            if status == 'done':
+                self._results[job.key] = job
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+            elif status == 'cancelled':
+                self.cancelled += 1
+        job._finished.set()
+
+    def stats(self):
+        with self._lock:
+            return {'running': len(self._running), 'cached': len(self._results), 'submitted': self.submitted,
+                    'joined': self.joined, 'reused': self.reused, 'cancelled': self.cancelled}
+
+    def drop_version(self, version):
+        """Forget cached results whose key holds data ``version``."""
+        with self._lock:
+            for key in [key for key in self._results if isinstance(key, tuple) and version in key]:
+                del self._results[key]
+
+    def clear(self):
+        """Forget cached results; running jobs finish but are not kept."""
+        with self._lock:
+            self._results.clear()
+
+
+@st.cache_resource
+def job_queue():
+    return JobQueue()
+
+
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def run_job(slot, key, fn):
+    """Submit ``fn`` as this session's job for ``slot`` and return the job,
+    releasing the job the slot held before if its key differs."""
+    queue = job_queue()
+    owner = _session_id()
+    held = st.session_state.setdefault(_SESSION_KEY, {})
+    previous = held.get(slot)
+    if previous is not None and previous != key:
+        queue.release(previous, owner)
+    held[slot] = key
+    job = queue.submit(key, fn, owner)
+    job.wait(INLINE_WAIT)
+    return job
+
+
+@fragment("job_progress", run_every=POLL_SECONDS)
+def _poll(job, label):
+    if job.finished:
+        # Render the finished result in place of the progress bar
+        st.rerun()
+    _show_progress(job, label)
+
+
+def _show_progress(job, label):
+    status = job.message or (f"{job.progress:.0%}" if job.status == 'running' else job.status)
+    st.progress(job.progress, text=f"{label}: {status}…")
+
+
+def show_job(job, label):
+    """Show ``job``'s progress until it finishes; return True once its result can be used."""
+    if job.done:
+        return True
+    if job.status == 'failed':
+        st.error(f"{label} failed: {job.error}")
+        return False
+    if job.finished:
+        # Cancelled after this session asked for it again; the next rerun resubmits
+        st.rerun()
+    if FRAGMENTS_ENABLED:
+        _poll(job, label)
+    else:
+        _show_progress(job, label)
+        job.wait(POLL_SECONDS)
+        st.rerun()
+    return False
@@ -0,0 +1,391 @@
+"""Pluggable data sources for demographics and engagement strategies.
+
+Demographics and strategies can come from Parquet (memory-mapped through
+pyarrow), CSV or a local SQLite file, at district, polling-division or
+GN-division level. Every source is normalised to the same schema: a ``Unit``
+column naming the administrative unit, its ``District`` and ``Province``, and
+one float32 percentage column per religion. An optional ``Population`` column
+(2012 census) is kept when the source has one, so totals can be
+population-weighted.
+
+Sources are configured through environment variables:
+
+``ELECTION_DEMOGRAPHICS``
+    Path to a ``.parquet``, ``.csv`` or ``.sqlite``/``.db`` demographics file.
+    When unset the built-in district data in ``sample_data`` is used.
+``ELECTION_STRATEGIES``
+    Path to a strategies file in long format (``Unit``, ``Strategy``). Defaults
+    to the demographics file when that is a SQLite database.
+``ELECTION_LEVEL``
+    ``district`` (default), ``polling_division`` or ``gn_division``.
+``ELECTION_HISTORY``
+    Optional long-format file of earlier census and election figures, one row
+    per unit and ``Year`` (see ``history``).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from metrics import RELIGIONS
+
+# Name of the unit column in source files for each administrative level
+LEVELS = {
+    'district': 'District',
+    'polling_division': 'Polling Division',
+    'gn_division': 'GN Division',
+}
+
+BASE_COLUMNS = ['Unit', 'District', 'Province']
+DEMOGRAPHIC_COLUMNS = BASE_COLUMNS + RELIGIONS
+# Loaded when the source has them
+OPTIONAL_COLUMNS = ['Population']
+
+# SQLite table names
+DEMOGRAPHICS_TABLE = 'demographics'
+STRATEGIES_TABLE = 'strategies'
+HISTORY_TABLE = 'history'
+
+PARQUET_SUFFIXES = {'.parquet', '.pq'}
+CSV_SUFFIXES = {'.csv'}
+SQLITE_SUFFIXES = {'.sqlite', '.sqlite3', '.db'}
+
+
+class SchemaError(ValueError):
+    """Raised when a data source does not match the expected schema."""
+
+
+@dataclass(frozen=True)
+class DataSource:
+    demographics: str = None
+    strategies: str = None
+    level: str = 'district'
+    history: str = None
+
+    @property
+    def unit_label(self):
+        return LEVELS[self.level]
+
+    @property
+    def is_builtin(self):
+        return self.demographics is None
+
+
+def source_from_env():
+    """Build the data source described by the ``ELECTION_*`` variables."""
+    demographics = os.environ.get('ELECTION_DEMOGRAPHICS') or None
+    strategies = os.environ.get('ELECTION_STRATEGIES') or None
+    if strategies is None and demographics and _suffix(demographics) in SQLITE_SUFFIXES:
+        strategies = demographics
+    level = os.environ.get('ELECTION_LEVEL', 'district')
+    if level not in LEVELS:
+        raise SchemaError(f"Unknown ELECTION_LEVEL {level!r}; expected one of {sorted(LEVELS)}")
+    history = os.environ.get('ELECTION_HISTORY') or None
+    return DataSource(demographics=demographics, strategies=strategies, level=level, history=history)
+
+
+def _suffix(path):
+    return Path(path).suffix.lower()
+
+
+# Content hashes are memoised per (path, size, mtime) so a file is only read
+# in full again after it changes on disk.
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(path):
+    """Return a content hash of ``path``."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        digest = _fingerprints.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()[:16]
+        with _fingerprints_lock:
+            _fingerprints[key] = digest
+    return digest
+
+
+def clear_fingerprints():
+    with _fingerprints_lock:
+        _fingerprints.clear()
+
+
+def data_version(districts, strategies):
+    # Content hash of in-memory source data; any edit produces a new cache key
+    payload = json.dumps([districts, strategies], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def source_version(source):
+    """Content hash identifying the data behind ``source``."""
+    if source.is_builtin:
+        from sample_data import districts_data, strategies_data
+        version = data_version(districts_data, strategies_data)
+        if not source.history:
+            return version
+        parts = [version]
+    else:
+        parts = [source.level, file_fingerprint(source.demographics)]
+        if source.strategies:
+            parts.append(file_fingerprint(source.strategies))
+    if source.history:
+        # The history file is read per dataset, so sources with different
+        # history files must not share a version (and its caches)
+        parts.append(os.path.abspath(source.history))
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _source_columns(level, columns):
+    # Map normalised column names back to the names used in source files
+    unit_column = LEVELS[level]
+    mapped = []
+    for col in columns:
+        name = unit_column if col == 'Unit' else col
+        if name not in mapped:
+            mapped.append(name)
+    return mapped
+
+
+def _read_parquet(path, columns):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet sources requires pyarrow (pip install pyarrow)") from e
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _read_csv(path, columns):
+    if columns is None:
+        return pd.read_csv(path)
+    dtypes = {col: 'float32' for col in RELIGIONS if col in columns}
+    for col in ('District', 'Province'):
+        if col in columns:
+            dtypes[col] = 'category'
+    return pd.read_csv(path, usecols=columns, dtype=dtypes)
+
+
+def _read_sqlite(path, table, columns):
+    selected = '*' if columns is None else ', '.join(f'"{col}"' for col in columns)
+    query = 'SELECT {} FROM "{}"'.format(selected, table)
+    with sqlite3.connect(f'file:{path}?mode=ro', uri=True) as conn:
+        return pd.read_sql_query(query, conn)
+
+
+def _table_columns(path, table):
+    # Column names of a source file, read from its header or schema only
+    suffix = _suffix(path)
+    if suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    if suffix in CSV_SUFFIXES:
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    if suffix in SQLITE_SUFFIXES:
+        with sqlite3.connect(f'file:{path}?mode=ro', uri=True) as conn:
+            return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+    return []
+
+
+def _read_table(path, table, columns):
+    suffix = _suffix(path)
+    try:
+        if suffix in PARQUET_SUFFIXES:
+            return _read_parquet(path, columns)
+        if suffix in CSV_SUFFIXES:
+            return _read_csv(path, columns)
+        if suffix in SQLITE_SUFFIXES:
+            return _read_sqlite(path, table, columns)
+    except (KeyError, ValueError, sqlite3.OperationalError) as e:
+        if isinstance(e, SchemaError):
+            raise
+        raise SchemaError(f"{path}: cannot read columns {columns}: {e}") from e
+    raise SchemaError(f"{path}: unsupported file type {suffix!r}")
+
+
+def normalize_demographics(frame, level='district'):
+    """Coerce a raw demographics frame to the dashboard schema."""
+    unit_column = LEVELS[level]
+    frame = frame.rename(columns={unit_column: 'Unit'})
+    if level == 'district' and 'District' not in frame.columns and 'Unit' in frame.columns:
+        frame['District'] = frame['Unit']
+
+    missing = [col for col in BASE_COLUMNS if col not in frame.columns]
+    if missing:
+        raise SchemaError(f"Demographics are missing required columns: {missing}")
+    duplicated = frame['Unit'][frame['Unit'].duplicated()].unique().tolist()
+    if duplicated:
+        raise SchemaError(f"Duplicate {unit_column} names: {duplicated[:10]}")
+
+    for col in RELIGIONS:
+        if col in frame.columns:
+            values = pd.to_numeric(frame[col], errors='coerce')
+            if ((values < 0) | (values > 100)).any():
+                raise SchemaError(f"{col} percentages must be between 0 and 100")
+            frame[col] = values.fillna(0).astype(np.float32)
+    if 'Population' in frame.columns:
+        population = pd.to_numeric(frame['Population'], errors='coerce')
+        if population.isna().any() or (population < 0).any():
+            raise SchemaError("Population must be a non-negative number for every unit")
+        frame['Population'] = population.astype(np.float64)
+    for col in ('District', 'Province'):
+        frame[col] = frame[col].astype('category')
+
+    ordered = [col for col in DEMOGRAPHIC_COLUMNS + OPTIONAL_COLUMNS if col in frame.columns]
+    return frame[ordered + [col for col in frame.columns if col not in ordered]]
+
+
+def load_demographics(source, columns=None):
+    """Load demographics for ``source``, restricted to ``columns`` if given.
+    By default the optional columns are included when the source has them."""
+    optional = columns is None
+    columns = list(columns) if columns is not None else DEMOGRAPHIC_COLUMNS + OPTIONAL_COLUMNS
+    if source.is_builtin:
+        from sample_data import districts_data
+        frame = pd.DataFrame.from_dict(districts_data, orient='index') \
+            .rename_axis('District').reset_index()
+        frame = normalize_demographics(frame, 'district')
+        return frame[[col for col in columns if col in frame.columns]]
+
+    wanted = list(dict.fromkeys(['Unit'] + columns))
+    if source.level == 'district':
+        wanted = [col for col in wanted if col != 'District']
+    if 'Province' not in wanted:
+        wanted.append('Province')
+    if optional:
+        available = set(_table_columns(source.demographics, DEMOGRAPHICS_TABLE))
+        wanted = [col for col in wanted if col not in OPTIONAL_COLUMNS or col in available]
+    frame = _read_table(source.demographics, DEMOGRAPHICS_TABLE,
+                        _source_columns(source.level, wanted))
+    frame = normalize_demographics(frame, source.level)
+    return frame[[col for col in columns if col in frame.columns]]
+
+
+def load_history(path, level='district'):
+    """Load a long-format history file as ``Unit``, ``Year`` and one float32
+    column per numeric series; text columns other than the unit are dropped."""
+    unit_column = LEVELS[level]
+    frame = _read_table(path, HISTORY_TABLE, None)
+    missing = [col for col in (unit_column, 'Year') if col not in frame.columns]
+    if missing:
+        raise SchemaError(f"{path}: history is missing required columns: {missing}")
+    frame = frame.rename(columns={unit_column: 'Unit'})
+    frame['Unit'] = frame['Unit'].astype(str)
+    years = pd.to_numeric(frame['Year'], errors='coerce')
+    if years.isna().any():
+        raise SchemaError(f"{path}: Year must be numeric")
+    frame['Year'] = years.astype(np.int16)
+    duplicated = frame[['Unit', 'Year']].duplicated()
+    if duplicated.any():
+        first = frame.loc[duplicated, ['Unit', 'Year']].iloc[0]
+        raise SchemaError(f"{path}: duplicate history row for {first['Unit']} {first['Year']}")
+
+    series = []
+    for col in frame.columns:
+        if col in ('Unit', 'Year') or col in BASE_COLUMNS:
+            continue
+        values = pd.to_numeric(frame[col], errors='coerce')
+        if values.notna().any():
+            frame[col] = values.astype(np.float32)
+            series.append(col)
+    return frame[['Unit', 'Year'] + series]
+
+
+def _strategy_frame(source, columns, unit=None):
+    path = source.strategies
+    if unit is not None and _suffix(path) in SQLITE_SUFFIXES:
+        query = 'SELECT {} FROM "{}" WHERE "Unit" = ? ORDER BY rowid'.format(
+            ', '.join(f'"{col}"' for col in columns), STRATEGIES_TABLE)
+        with sqlite3.connect(f'file:{path}?mode=ro', uri=True) as conn:
+            return pd.read_sql_query(query, conn, params=(unit,))
+    frame = _read_table(path, STRATEGIES_TABLE, columns)
+    if unit is not None:
+        frame = frame[frame['Unit'] == unit]
+    return frame
+
+
+class StrategyStore(Mapping):
+    """Read-only ``unit -> [strategy, ...]`` mapping backed by a data source.
+
+    Strategy counts are loaded up front from the ``Unit`` column alone; the
+    strategy texts are only read when a unit is actually looked up.
+    """
+
+    def __init__(self, source=None, strategies=None):
+        self._source = source
+        self._lock = threading.Lock()
+        if strategies is not None:
+            self._texts = {unit: list(items) for unit, items in strategies.items()}
+            self._counts = {unit: len(items) for unit, items in self._texts.items()}
+        elif source is not None and source.strategies:
+            units = _strategy_frame(source, ['Unit'])['Unit']
+            self._counts = units.value_counts(sort=False).to_dict()
+            self._texts = {}
+        else:
+            self._counts = {}
+            self._texts = {}
+
+    def counts(self):
+        return self._counts
+
+    def _load_all(self):
+        frame = _strategy_frame(self._source, ['Unit', 'Strategy'])
+        codes, names = pd.factorize(frame['Unit'])
+        texts = frame['Strategy'].astype(str).to_numpy()[np.argsort(codes, kind='stable')]
+        bounds = np.cumsum(np.bincount(codes, minlength=len(names)))[:-1]
+        for name, chunk in zip(names, np.split(texts, bounds)):
+            self._texts[name] = chunk.tolist()
+
+    def _load(self, unit):
+        # SQLite can fetch one unit's rows; flat files are read once in full
+        if _suffix(self._source.strategies) in SQLITE_SUFFIXES:
+            frame = _strategy_frame(self._source, ['Unit', 'Strategy'], unit=unit)
+            self._texts[unit] = frame['Strategy'].astype(str).tolist()
+        else:
+            self._load_all()
+        return self._texts.get(unit, [])
+
+    def all_texts(self):
+        """Return every unit's strategies, reading the source in one pass if needed."""
+        with self._lock:
+            if len(self._texts) < len(self._counts):
+                self._load_all()
+            return self._texts
+
+    def __getitem__(self, unit):
+        if unit not in self._counts:
+            raise KeyError(unit)
+        with self._lock:
+            texts = self._texts.get(unit)
+            if texts is None:
+                texts = self._load(unit)
+        return texts
+
+    def __contains__(self, unit):
+        return unit in self._counts
+
+    def __iter__(self):
+        return iter(self._counts)
+
+    def __len__(self):
+        return len(self._counts)
+
+
+def load_strategies(source):
+    """Return the strategy store for ``source``."""
+    if source.is_builtin:
+        from sample_data import strategies_data
+        return StrategyStore(strategies=strategies_data)
+    return StrategyStore(source=source)
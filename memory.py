@@ -0,0 +1,176 @@
+"""Memory accounting: what is shared by the process and what each session holds.
+
+Shared objects (the dataset, figure cache, search index, history cube and
+similarity index) are measured directly. Each session's ``st.session_state``
+is measured at the end of every run and recorded in a process-wide table, so
+the report covers every session seen in the last ``SESSION_TTL`` seconds, not
+just the one viewing it. ``projected_bytes`` turns the two into a container
+size estimate for a given number of concurrent users. Streamlit's own
+per-connection buffers are not included.
+
+Shown in the hidden debug sidebar (``?debug=1``), or printed with
+``python memory.py --users 500``.
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import fields
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Sessions that have not rerun for this long are left out of the report
+SESSION_TTL = 30 * 60
+
+
+def deep_size(obj, _seen=None):
+    """Approximate bytes held by ``obj``, following containers and array buffers."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, np.ndarray):
+        size = sys.getsizeof(obj) + (obj.nbytes if obj.base is None else 0)
+        if obj.dtype == object:
+            size += sum(deep_size(item, seen) for item in obj.flat)
+        return size
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+def dataset_sizes(dataset):
+    """Bytes held by each field of the shared dataset."""
+    seen = set()
+    sizes = {}
+    for field in fields(dataset):
+        sizes[f'dataset.{field.name}'] = deep_size(getattr(dataset, field.name), seen)
+    return sizes
+
+
+def shared_sizes(dataset):
+    """Bytes held once per process, by component."""
+    from figures import figure_cache
+    from history import get_history
+    from search import get_index
+    from similarity import get_similarity
+
+    sizes = dataset_sizes(dataset)
+    sizes['figure cache'] = figure_cache().nbytes()
+    index = get_index(dataset)
+    sizes['search index'] = deep_size(index)
+    history = get_history(dataset)
+    # Memory-mapped, so this sits in the page cache shared by every process
+    sizes['history cube'] = history.values.nbytes + history.last_seen.nbytes + history.next_seen.nbytes
+    sizes['similarity index'] = get_similarity(dataset).nbytes()
+    return sizes
+
+
+class SessionSizes:
+    """Latest measured session-state size of every recently active session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def record(self, session_id, nbytes):
+        with self._lock:
+            self._sessions[session_id] = (nbytes, time.time())
+
+    def active(self, ttl=SESSION_TTL):
+        cutoff = time.time() - ttl
+        with self._lock:
+            for session_id in [s for s, (_, seen) in self._sessions.items() if seen < cutoff]:
+                del self._sessions[session_id]
+            return [nbytes for nbytes, _ in self._sessions.values()]
+
+
+@st.cache_resource
+def session_sizes():
+    return SessionSizes()
+
+
+def session_state_size():
+    """Bytes held by this session's ``st.session_state``, by key."""
+    return {key: deep_size(st.session_state[key]) for key in st.session_state}
+
+
+def track_session():
+    """Record this session's state size; call once at the end of a run."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        session_sizes().record(ctx.session_id, sum(session_state_size().values()))
+
+
+def projected_bytes(shared, per_session, users):
+    return shared + per_session * users
+
+
+def _human(nbytes):
+    if nbytes < 2**20:
+        return f"{nbytes / 1024:,.1f} KB"
+    return f"{nbytes / 2**20:,.1f} MB"
+
+
+def show_memory_report(dataset):
+    """Render the memory report in the sidebar when the page has ``?debug=1``."""
+    if st.query_params.get('debug') != '1':
+        return
+    with st.sidebar.expander("Debug: memory"):
+        shared = shared_sizes(dataset)
+        sessions = session_sizes().active()
+        per_session = max(sessions) if sessions else 0
+        st.caption(f"Shared: {_human(sum(shared.values()))} · {len(sessions)} active sessions, "
+                   f"up to {_human(per_session)} each")
+        st.dataframe(pd.DataFrame({'Component': list(shared),
+                                   'KB': [round(v / 1024, 1) for v in shared.values()]}),
+                     use_container_width=True, hide_index=True)
+        session = session_state_size()
+        st.dataframe(pd.DataFrame({'Session key': list(session), 'Bytes': list(session.values())}),
+                     use_container_width=True, hide_index=True)
+        users = st.number_input("Concurrent users", min_value=1, value=500, step=50,
+                                key="_memory_users")
+        st.caption(f"Projected app memory for {users} users: "
+                   f"{_human(projected_bytes(sum(shared.values()), per_session, users))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report shared and per-session dashboard memory.")
+    parser.add_argument('--users', type=int, default=500, help="concurrent users to project for")
+    args = parser.parse_args(argv)
+
+    from data_layer import get_dataset
+
+    dataset = get_dataset()
+    shared = shared_sizes(dataset)
+    for name, nbytes in shared.items():
+        print(f"{name:32} {_human(nbytes):>14}")
+    total = sum(shared.values())
+    print(f"{'shared total':32} {_human(total):>14}")
+    # A typical session: a few widget selections and a full render log
+    per_session = deep_size({
+        'selected_district': 'All', 'heatmap_group': 'District', 'strategy_district': 'Colombo',
+        '_render_log': deque(({'kind': 'full', 'started': time.time(), 'perf_start': float(i),
+                               'fragments': ['overview', 'district_analysis', 'strategies']}
+                              for i in range(20)), maxlen=20),
+    })
+    print(f"{'per session (typical)':32} {_human(per_session):>14}")
+    print(f"{f'projected for {args.users} users':32} "
+          f"{_human(projected_bytes(total, per_session, args.users)):>14}")
+
+
+if __name__ == '__main__':
+    main()
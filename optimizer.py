@@ -0,0 +1,217 @@
+"""Budget-constrained outreach allocation over units and strategy categories.
+
+Each unit gets a priority score from three weighted terms, each scaled to 0-1.
+They are its diversity index, its minority share, and how few of the strategy
+categories its current strategies cover. An event of a category in a unit is
+worth that score, and ``NEW_CATEGORY_BONUS`` times more where the unit has no
+strategy in the category yet. Each further event of the same kind in the same
+unit is worth ``DECAY`` times the one before. The plan is the greedy one:
+events in descending gain per rupee, skipping any that no longer fit the
+budget.
+
+Because the gains only decay, the greedy plan is every event whose gain per
+rupee clears some threshold, plus a few to use up the remainder. The event
+count of every (unit, category) pair at a threshold is closed-form, so
+the threshold is found by a vectorized bisection over all pairs at once. The
+leftover budget is then filled one best event at a time. Moving a slider
+warm-starts the bisection from the previous plan's threshold, so it needs fewer
+steps. A re-solve takes a few milliseconds for hundreds of polling divisions
+and about 25 ms for 14,000 GN divisions. Plans are memoized per data version and inputs.
+"""
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from data_layer import versioned_cache
+from filters import filter_rows
+from instrumentation import span
+from metrics import RELIGIONS
+from simulator import CATEGORIES, unit_categories
+
+# Rupees per event, in CATEGORIES order
+DEFAULT_COSTS = (150_000, 100_000, 300_000, 250_000, 120_000, 80_000)
+DEFAULT_BUDGET = 20_000_000
+
+# Weights of diversity, minority share and missing category coverage
+WEIGHT_NAMES = ('Diversity', 'Minority share', 'Coverage gap')
+DEFAULT_WEIGHTS = (1.0, 1.0, 1.0)
+
+NEW_CATEGORY_BONUS = 1.5
+DECAY = 0.7
+MAX_EVENTS = 12
+
+# Highest possible diversity index over four religions
+DIVERSITY_MAX = 1 - 1 / len(RELIGIONS)
+
+# Bisection stops once the threshold is known to this relative precision
+TOLERANCE = 1e-6
+# First bracket step around a warm-start threshold; it squares on each miss
+WARM_BRACKET = 1.05
+
+PLAN_CACHE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Allocation inputs: budget and per-event costs in rupees (costs in
+    ``CATEGORIES`` order), the three priority weights, and the sidebar
+    filters choosing which units may receive events."""
+    budget: float = DEFAULT_BUDGET
+    costs: tuple = DEFAULT_COSTS
+    weights: tuple = DEFAULT_WEIGHTS
+    filters: object = None
+
+
+@dataclass(frozen=True)
+class Allocation:
+    positions: np.ndarray
+    events: np.ndarray
+    gains: np.ndarray
+    costs: np.ndarray
+    threshold: float
+    # Work of the solve, or None on a plan shared from the cache
+    steps: int = None
+    seconds: float = None
+
+    @property
+    def spent(self):
+        return float((self.events * self.costs).sum())
+
+    def units(self, dataset):
+        """Units receiving events, with events per category, cost and gain."""
+        chosen = np.flatnonzero(self.events.sum(axis=1))
+        rows = self.positions[chosen]
+        frame = dataset.df.iloc[rows][['Unit', 'District', 'Province']].reset_index(drop=True)
+        for i, category in enumerate(CATEGORIES):
+            frame[category] = self.events[chosen, i]
+        frame['Events'] = self.events[chosen].sum(axis=1)
+        frame['Cost'] = (self.events[chosen] * self.costs).sum(axis=1)
+        frame['Gain'] = self.gains[chosen].sum(axis=1).round(3)
+        return frame.sort_values('Gain', ascending=False, kind='stable').reset_index(drop=True)
+
+    def categories(self):
+        events = self.events.sum(axis=0)
+        return pd.DataFrame({'Category': CATEGORIES, 'Events': events, 'Cost': events * self.costs,
+                             'Gain': self.gains.sum(axis=0).round(3)})
+
+    def provinces(self, dataset):
+        """Events per province and category."""
+        provinces = dataset.df['Province'].to_numpy()[self.positions].astype(str)
+        frame = pd.DataFrame(self.events, columns=list(CATEGORIES))
+        frame['Province'] = provinces
+        return frame.groupby('Province', sort=True).sum()
+
+
+@versioned_cache(show_spinner=False)
+def _unit_scores(version, _dataset):
+    # (units x 3) priority terms, each 0-1, and the (units x CATEGORIES) coverage matrix
+    metrics = _dataset.metrics
+    has = unit_categories(_dataset)
+    terms = np.column_stack([
+        metrics['Diversity Score'].to_numpy(dtype=np.float64) / DIVERSITY_MAX,
+        metrics['Minority %'].to_numpy(dtype=np.float64) / 100,
+        1 - has.mean(axis=1),
+    ])
+    return terms, has
+
+
+def _levels(ratios):
+    # log base 1/DECAY of each ratio: the n-th event of a pair clears threshold
+    # t while level(ratio) - n >= level(t)
+    with np.errstate(divide='ignore'):
+        return np.log(ratios) / -np.log(DECAY)
+
+
+def _counts(levels, threshold):
+    # Events per pair whose gain per rupee is at least ``threshold``
+    counts = np.floor(levels - _levels(threshold) + 1e-9) + 1
+    return np.clip(np.nan_to_num(counts, nan=0, neginf=0), 0, MAX_EVENTS).astype(np.int16)
+
+
+def solve(ratios, costs, budget, start=None):
+    """Greedy event counts for ``ratios`` (first-event gain per rupee of every
+    pair). Returns ``(counts, threshold, steps)``. ``start`` is a threshold to
+    search from, normally the previous solution's."""
+    costs = np.broadcast_to(costs, ratios.shape)
+    positive = ratios[ratios > 0]
+    if not len(positive):
+        return np.zeros(ratios.shape, dtype=np.int16), 0.0, 0
+
+    levels = _levels(ratios)
+
+    def spend(threshold):
+        return float((_counts(levels, threshold) * costs).sum())
+
+    # Bracket the threshold: spending fits at ``high`` and overflows at ``low``.
+    # A warm start widens the bracket from a tight one, a cold one from 4x.
+    steps = 0
+    floor = positive.min() * DECAY ** MAX_EVENTS
+    warm = bool(start and start > 0)
+    high = start if warm else positive.max()
+    factor = WARM_BRACKET if warm else 4.0
+    while spend(high) > budget:
+        high *= factor
+        factor *= factor
+        steps += 1
+    low = high
+    factor = WARM_BRACKET if warm else 4.0
+    while low > floor and spend(low) <= budget:
+        high, low = low, low / factor
+        factor *= factor
+        steps += 1
+    if low > floor:
+        while high / low > 1 + TOLERANCE:
+            middle = np.sqrt(high * low)
+            if spend(middle) <= budget:
+                high = middle
+            else:
+                low = middle
+            steps += 1
+    else:
+        high = low
+
+    # Fill what is left with the best events that still fit
+    counts = _counts(levels, high)
+    remaining = budget - float((counts * costs).sum())
+    while True:
+        nxt = np.where((counts < MAX_EVENTS) & (costs <= remaining), ratios * DECAY ** counts, 0)
+        best = np.unravel_index(np.argmax(nxt), nxt.shape)
+        if nxt[best] <= 0:
+            break
+        counts[best] += 1
+        remaining -= costs[best]
+    return counts, float(high), steps
+
+
+def allocate(dataset, plan, start=None):
+    """Solve ``plan`` for ``dataset``, warm-starting the search from ``start``."""
+    started = time.perf_counter()
+    terms, has = _unit_scores(dataset.version, dataset)
+    rows = filter_rows(dataset, plan.filters)
+    positions = np.arange(len(terms)) if rows is None else np.asarray(rows)
+    score = terms[positions] @ np.asarray(plan.weights, dtype=np.float64)
+    gains = score[:, None] * np.where(has[positions], 1.0, NEW_CATEGORY_BONUS)
+    costs = np.asarray(plan.costs, dtype=np.float64)
+    with span('optimizer.solve'):
+        counts, threshold, steps = solve(gains / costs, costs, plan.budget, start)
+    # Gain of n events is g * (1 - DECAY^n) / (1 - DECAY)
+    total_gains = gains * (1 - DECAY ** counts) / (1 - DECAY)
+    return Allocation(positions=positions, events=counts, gains=total_gains, costs=costs,
+                      threshold=threshold, steps=steps, seconds=time.perf_counter() - started)
+
+
+@versioned_cache(max_entries=PLAN_CACHE_SIZE, show_spinner=False)
+def _allocate(version, plan, _dataset, _start):
+    # The warm start is not part of the key: it changes the work, not the plan,
+    # so the work of whichever solve came first is not kept
+    return replace(allocate(_dataset, plan, _start), steps=None, seconds=None)
+
+
+def optimize(dataset, plan=Plan(), start=None):
+    """Memoized :func:`allocate`, shared by every session. ``seconds`` is the
+    time of this call, near zero when the plan was already solved."""
+    started = time.perf_counter()
+    allocation = _allocate(dataset.version, plan, dataset, start)
+    return replace(allocation, seconds=time.perf_counter() - started)
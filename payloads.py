@@ -0,0 +1,274 @@
+"""Compact chart payloads with a per-chart size budget.
+
+``st.plotly_chart`` sends the whole figure JSON over the websocket on every
+rerun, so each figure is compacted once when it enters the figure cache:
+
+* Numeric arrays are sent as base64 typed arrays in the smallest dtype that
+  holds them. Whole-number floats become 1, 2 or 4 byte integers and other
+  float64 arrays float32. Plain JSON number lists keep ``FLOAT_DIGITS``
+  significant digits.
+* A ``customdata`` column that holds the same string for every point of a
+  trace (px repeats ``hover_data`` such as the province of a per-province
+  trace) is written into the trace's hover template once and dropped.
+* The plotly template Streamlit registers (about 3.5 KB of colorscale and
+  trace defaults that its frontend theme overrides) is cut down to the
+  colorway and the defaults of the trace types the chart draws. Every
+  colorscale the charts use is set explicitly.
+* Scatter and bar traces with more than ``ELECTION_CHART_MAX_POINTS`` points
+  in total are decimated. Each trace keeps its share of the points: the
+  lowest and highest value of each run of consecutive points, so peaks and
+  troughs survive. The title says how many points are shown.
+
+A chart whose payload is still over ``ELECTION_CHART_BUDGET_KB`` has its point
+limit halved until it fits or reaches ``MIN_POINTS``. A chart that cannot be
+brought under budget (such as a map, whose size is its geometry) is logged
+as a warning. The bytes each chart sends are recorded per rerun in the
+sidebar render log.
+"""
+import base64
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_POINTS = int(os.environ.get('ELECTION_CHART_MAX_POINTS', '2000'))
+PAYLOAD_BUDGET_KB = float(os.environ.get('ELECTION_CHART_BUDGET_KB', '150'))
+
+# Decimation never goes below this many points to meet the budget
+MIN_POINTS = 250
+
+FLOAT_DIGITS = 6
+
+DECIMATED_TYPES = ('scatter', 'scattergl', 'bar')
+POINT_KEYS = ('x', 'y', 'text', 'hovertext', 'ids', 'customdata', 'width', 'base')
+MARKER_POINT_KEYS = ('size', 'color', 'symbol', 'opacity')
+
+# Integer typed arrays plotly.js reads, smallest first
+INT_DTYPES = (np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32)
+
+_CUSTOMDATA_REF = re.compile(r'%\{customdata\[(\d+)\]')
+
+
+def _is_typed(value):
+    return isinstance(value, dict) and 'bdata' in value
+
+
+def _decode(value):
+    array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+    if 'shape' in value:
+        array = array.reshape([int(size) for size in str(value['shape']).split(',')])
+    return array
+
+
+def _smallest(array):
+    # Whole-number floats and integers as the narrowest integer type that holds them
+    if array.dtype.kind == 'f':
+        if not len(array) or not np.isfinite(array).all() or (array != np.round(array)).any():
+            return array.astype(np.float32)
+    elif array.dtype.kind not in 'iu':
+        return array
+    if not array.size:
+        return array.astype(np.int8)
+    low, high = array.min(), array.max()
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return array.astype(dtype)
+    return array.astype(np.float32) if array.dtype.kind == 'f' else array
+
+
+def _encode(array):
+    array = np.ascontiguousarray(_smallest(array))
+    value = {'dtype': array.dtype.str.lstrip('<>|='), 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+    if array.ndim > 1:
+        value['shape'] = ', '.join(str(size) for size in array.shape)
+    return value
+
+
+def _compact_arrays(value):
+    """``value`` with every typed array narrowed and float lists rounded."""
+    if _is_typed(value):
+        return _encode(_decode(value))
+    if isinstance(value, dict):
+        return {key: _compact_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if any(isinstance(item, float) for item in value):
+            return [float(f'{item:.{FLOAT_DIGITS}g}') if isinstance(item, float) else _compact_arrays(item)
+                    for item in value]
+        return [_compact_arrays(item) for item in value]
+    return value
+
+
+def _columns(value):
+    # ``customdata`` as a (points x columns) array, or None if it is not one
+    array = _decode(value) if _is_typed(value) else np.asarray(value, dtype=object)
+    return array if array.ndim == 2 else None
+
+
+def _inline_constant_customdata(trace):
+    """Move ``customdata`` columns holding one string for every point into the hover template."""
+    template = trace.get('hovertemplate')
+    if not template or trace.get('customdata') is None:
+        return
+    columns = _columns(trace['customdata'])
+    if columns is None or not len(columns):
+        return
+    formatted = {int(j) for j in re.findall(r'%\{customdata\[(\d+)\]:', template)}
+    keep = []
+    for j in range(columns.shape[1]):
+        first = columns[0, j]
+        if isinstance(first, str) and j not in formatted and (columns[:, j] == first).all():
+            template = template.replace(f'%{{customdata[{j}]}}', first)
+        else:
+            keep.append(j)
+    if len(keep) == columns.shape[1]:
+        return
+    renumber = {old: new for new, old in enumerate(keep)}
+    trace['hovertemplate'] = _CUSTOMDATA_REF.sub(lambda m: f'%{{customdata[{renumber[int(m.group(1))]}]', template)
+    if not keep:
+        del trace['customdata']
+    elif _is_typed(trace['customdata']):
+        trace['customdata'] = _encode(columns[:, keep])
+    else:
+        trace['customdata'] = columns[:, keep].tolist()
+
+
+def _length(value):
+    if _is_typed(value):
+        return len(_decode(value))
+    return len(value) if isinstance(value, list) else None
+
+
+def _numbers(value):
+    # Float values of a point array, or None for categories
+    if _is_typed(value):
+        return _decode(value).astype(np.float64)
+    try:
+        return np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+
+
+def _take(value, index):
+    if _is_typed(value):
+        return _encode(_decode(value)[index])
+    return [value[i] for i in index]
+
+
+def _trace_points(trace):
+    if trace.get('type', 'scatter') not in DECIMATED_TYPES:
+        return 0
+    return max(_length(trace.get('x')) or 0, _length(trace.get('y')) or 0)
+
+
+def extremes(values, order, buckets):
+    """Positions of the lowest and highest value in each of ``buckets`` runs of ``order``."""
+    keep = []
+    for run in np.array_split(order, buckets):
+        if len(run):
+            run_values = values[run]
+            keep.append(run[np.nanargmin(run_values)] if not np.isnan(run_values).all() else run[0])
+            keep.append(run[np.nanargmax(run_values)] if not np.isnan(run_values).all() else run[-1])
+    return np.unique(keep)
+
+
+def _decimate_trace(trace, n, limit):
+    """A copy of ``trace`` keeping about ``limit`` of its ``n`` points; ``trace`` is left as is."""
+    horizontal = trace.get('orientation') == 'h'
+    values = _numbers(trace.get('x' if horizontal else 'y'))
+    positions = _numbers(trace.get('y' if horizontal else 'x'))
+    if values is None or len(values) != n:
+        index = np.unique(np.linspace(0, n - 1, limit).astype(np.int64))
+    else:
+        # Runs follow the position axis when it is numeric, else trace order
+        order = np.argsort(positions, kind='stable') if positions is not None and len(positions) == n \
+            else np.arange(n)
+        index = extremes(values, order, max(limit // 2, 1))
+    trace = dict(trace)
+    for key in POINT_KEYS:
+        if _length(trace.get(key)) == n:
+            trace[key] = _take(trace[key], index)
+    if isinstance(trace.get('marker'), dict):
+        marker = trace['marker'] = dict(trace['marker'])
+        for key in MARKER_POINT_KEYS:
+            if _length(marker.get(key)) == n:
+                marker[key] = _take(marker[key], index)
+    return trace, len(index)
+
+
+def decimate(spec, max_points):
+    """``spec`` with its scatter and bar traces decimated to about ``max_points``
+    points in total, and ``(shown, total)``. Only the parts that change are
+    copied; ``spec`` itself is left as is."""
+    counts = [_trace_points(trace) for trace in spec['data']]
+    total = sum(counts)
+    if total <= max_points:
+        return spec, total, total
+    shown = 0
+    data = []
+    for trace, n in zip(spec['data'], counts):
+        limit = max(2, max_points * n // total)
+        if n > limit:
+            trace, n = _decimate_trace(trace, n, limit)
+        data.append(trace)
+        shown += n
+    layout = dict(spec.get('layout') or {})
+    title = layout.get('title', {})
+    if isinstance(title, dict):
+        layout['title'] = title | {'text': f"{title.get('text') or ''} ({shown:,} of {total:,} points shown)".lstrip()}
+    return spec | {'data': data, 'layout': layout}, shown, total
+
+
+def _prune_template(spec):
+    # Streamlit's frontend theme supplies the fonts, colors and colorscales;
+    # only the colorway and the defaults of the drawn trace types still apply
+    layout = spec.get('layout') or {}
+    template = layout.get('template')
+    if not isinstance(template, dict):
+        return
+    types = {trace.get('type', 'scatter') for trace in spec['data']}
+    pruned = {}
+    data = {kind: defaults for kind, defaults in (template.get('data') or {}).items() if kind in types}
+    if data:
+        pruned['data'] = data
+    colorway = (template.get('layout') or {}).get('colorway')
+    if colorway:
+        pruned['layout'] = {'colorway': colorway}
+    if pruned:
+        layout['template'] = pruned
+    else:
+        del layout['template']
+
+
+def _dumps(spec):
+    # Through plotly once, so the payload is exactly what st.plotly_chart sends
+    import plotly.io as pio
+
+    return pio.to_json(pio.from_json(json.dumps(spec), skip_invalid=True), validate=False)
+
+
+def compact_figure(fig, name='figure', max_points=MAX_POINTS, budget_kb=PAYLOAD_BUDGET_KB):
+    """Return ``fig`` as compact JSON, decimated as far as needed to fit ``budget_kb``."""
+    spec = json.loads(fig.to_json())
+    for trace in spec['data']:
+        if trace.get('type', 'scatter') in DECIMATED_TYPES:
+            _inline_constant_customdata(trace)
+    spec['data'] = _compact_arrays(spec['data'])
+    _prune_template(spec)
+
+    budget = budget_kb * 1024
+    limit = max_points
+    while True:
+        trial, shown, total = decimate(spec, limit)
+        payload = _dumps(trial)
+        if len(payload) <= budget or shown == total or limit <= MIN_POINTS:
+            break
+        limit = max(limit // 2, MIN_POINTS)
+    if len(payload) > budget:
+        logger.warning("%s payload is %.0f KB, over the %.0f KB chart budget", name, len(payload) / 1024, budget_kb)
+    logger.debug("%s payload %.1f KB, %d of %d points", name, len(payload) / 1024, shown, total)
+    return payload
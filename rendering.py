@@ -0,0 +1,108 @@
+"""Fragment-based rendering mode for the dashboard.
+
+Each tab (and the detail panels inside tabs 2 and 3) is wrapped in
+``st.fragment`` so a widget change reruns only the fragment that owns it
+instead of the whole script. Every interaction records which fragments ran,
+which the sidebar shows as a render log.
+
+Charts record the bytes of figure JSON they send, so each log entry also
+shows what that interaction cost the connection.
+
+Set ``ELECTION_FRAGMENTS=0`` to fall back to classic full-script reruns.
+"""
+import functools
+import logging
+import os
+import time
+from collections import deque
+
+import streamlit as st
+
+from instrumentation import ENABLED as PROFILING, registry, span
+
+logger = logging.getLogger(__name__)
+
+FRAGMENTS_ENABLED = os.environ.get('ELECTION_FRAGMENTS', '1') != '0'
+
+# Number of interactions kept in each session's render log
+RENDER_LOG_SIZE = 20
+
+_LOG_KEY = '_render_log'
+_OPEN_KEY = '_render_run_open'
+
+
+def _render_log():
+    if _LOG_KEY not in st.session_state:
+        st.session_state[_LOG_KEY] = deque(maxlen=RENDER_LOG_SIZE)
+    return st.session_state[_LOG_KEY]
+
+
+def begin_run():
+    """Mark the start of a full script run."""
+    _render_log().append({'kind': 'full', 'started': time.time(), 'fragments': [],
+                          'perf_start': time.perf_counter()})
+    st.session_state[_OPEN_KEY] = True
+
+
+def end_run():
+    """Mark the end of a full script run; return its duration in seconds."""
+    st.session_state[_OPEN_KEY] = False
+    entry = _render_log()[-1]
+    elapsed = time.perf_counter() - entry['perf_start']
+    if PROFILING:
+        registry.record('script.full_run', elapsed)
+    logger.debug("full rerun ran fragments: %s", ', '.join(entry['fragments']))
+    return elapsed
+
+
+def _record(name):
+    log = _render_log()
+    if st.session_state.get(_OPEN_KEY) and log:
+        log[-1]['fragments'].append(name)
+    else:
+        # Fragment-only rerun: the main script did not run this time
+        log.append({'kind': 'fragment', 'started': time.time(), 'fragments': [name]})
+        logger.debug("fragment rerun: %s", name)
+
+
+def record_chart(kind, nbytes):
+    """Record that a chart of ``kind`` sent ``nbytes`` of figure JSON in this run."""
+    log = _render_log()
+    if log:
+        log[-1].setdefault('charts', []).append((kind, nbytes))
+    logger.debug("chart %s sent %d bytes", kind, nbytes)
+
+
+def fragment(name, **fragment_kwargs):
+    """Decorator turning a render function into a named, isolated fragment."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _record(name)
+            with span(f'fragment.{name}'):
+                return func(*args, **kwargs)
+
+        if FRAGMENTS_ENABLED:
+            return st.fragment(wrapper, **fragment_kwargs)
+        return wrapper
+    return decorator
+
+
+def render_log():
+    """Return the recorded interactions, most recent first."""
+    return list(reversed(_render_log()))
+
+
+def show_render_log():
+    """Render the per-interaction fragment log in the sidebar."""
+    mode = 'fragments' if FRAGMENTS_ENABLED else 'full reruns'
+    with st.sidebar.expander(f"Render log ({mode})"):
+        for entry in render_log():
+            label = 'Full rerun' if entry['kind'] == 'full' else 'Fragment rerun'
+            stamp = time.strftime('%H:%M:%S', time.localtime(entry['started']))
+            st.caption(f"{stamp} {label}: {', '.join(entry['fragments']) or '-'}")
+            charts = entry.get('charts')
+            if charts:
+                total = sum(nbytes for _, nbytes in charts)
+                st.caption(f"↳ charts sent {total / 1024:,.1f} KB: "
+                           + ', '.join(f"{kind} {nbytes / 1024:,.1f}" for kind, nbytes in charts))
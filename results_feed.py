@@ -0,0 +1,271 @@
+"""Election-night results ingestion with incremental aggregation.
+
+A drop folder (``ELECTION_RESULTS_DIR``) stands in for the commissioner's
+feed: append-only ``*.jsonl`` or ``*.csv`` files with one row per polling
+division and party::
+
+    {"Polling Division": "Colombo North", "District": "Colombo", "Party": "UNP", "Votes": 15234}
+
+One background thread per process and folder tails the folder, parsing only
+the bytes appended since the last poll, and folds each result into district,
+province and national totals. A data reload keeps the same tailer and only
+regroups the province totals if districts moved between provinces. A re-reported polling division replaces its earlier
+count, so every aggregate is updated by the difference rather than re-grouped.
+Each aggregate carries a version number so views only refresh when something
+they display has changed.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.environ.get('ELECTION_RESULTS_DIR') or None
+POLL_INTERVAL = float(os.environ.get('ELECTION_RESULTS_POLL', '1'))
+
+UNIT_FIELD = 'Polling Division'
+
+UNKNOWN_PROVINCE = 'Unknown'
+
+
+class ResultsAggregator:
+    """Running vote totals by polling division, district, province and nation."""
+
+    def __init__(self, district_provinces):
+        self._lock = threading.Lock()
+        self._provinces = dict(district_provinces)
+        self._unit_votes = {}
+        self._unit_district = {}
+        self._unit_parties = defaultdict(set)
+        self.district_votes = defaultdict(lambda: defaultdict(int))
+        self.province_votes = defaultdict(lambda: defaultdict(int))
+        self.national_votes = defaultdict(int)
+        self.district_units = defaultdict(set)
+        self.district_versions = defaultdict(int)
+        self.province_versions = defaultdict(int)
+        self.version = 0
+        self.applied = 0
+        self.rejected = 0
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def province_of(self, district):
+        return self._provinces.get(district, UNKNOWN_PROVINCE)
+
+    def use_provinces(self, district_provinces):
+        """Map districts to provinces by ``district_provinces`` from now on,
+        regrouping the province totals if the mapping changed."""
+        district_provinces = dict(district_provinces)
+        with self._lock:
+            if district_provinces == self._provinces:
+                return
+            self._provinces = district_provinces
+            province_votes = defaultdict(lambda: defaultdict(int))
+            for district, votes in self.district_votes.items():
+                for party, count in votes.items():
+                    province_votes[self.province_of(district)][party] += count
+            for province in set(self.province_votes) | set(province_votes):
+                self.province_versions[province] += 1
+            self.province_votes = province_votes
+            self.version += 1
+
+    def apply(self, record):
+        """Fold one result into every aggregate; return False if it was rejected."""
+        try:
+            unit = str(record[UNIT_FIELD])
+            district = str(record['District'])
+            party = str(record['Party'])
+            votes = int(float(record['Votes']))
+        except (KeyError, TypeError, ValueError):
+            self.reject()
+            return False
+        if votes < 0:
+            self.reject()
+            return False
+
+        with self._lock:
+            key = (unit, party)
+            previous = self._unit_votes.get(key, 0)
+            old_district = self._unit_district.get(key)
+            if old_district is not None and old_district != district:
+                # Corrected district: take the previous count out of the old totals
+                self._add(old_district, party, -previous)
+                previous = 0
+            delta = votes - previous
+            self._unit_votes[key] = votes
+            self._unit_district[key] = district
+            self._unit_parties[unit].add(party)
+            if old_district is not None and old_district != district and not any(
+                    self._unit_district[(unit, other)] == old_district for other in self._unit_parties[unit]):
+                # No party of this unit is counted in the old district any more
+                self.district_units[old_district].discard(unit)
+            self.applied += 1
+            new_unit = unit not in self.district_units[district]
+            self.district_units[district].add(unit)
+            if delta or new_unit:
+                self._add(district, party, delta)
+        return True
+
+    def _add(self, district, party, delta):
+        province = self.province_of(district)
+        self.district_votes[district][party] += delta
+        self.province_votes[province][party] += delta
+        self.national_votes[party] += delta
+        self.district_versions[district] += 1
+        self.province_versions[province] += 1
+        self.version += 1
+
+    def apply_many(self, records):
+        return sum(1 for record in records if self.apply(record))
+
+    def version_for(self, district=None):
+        """Version of the aggregate a view displays (national when ``district`` is None)."""
+        with self._lock:
+            if district is None:
+                return self.version
+            return self.district_versions.get(district, 0)
+
+    def district_frame(self, district):
+        with self._lock:
+            votes = dict(self.district_votes.get(district, {}))
+            reported = len(self.district_units.get(district, ()))
+        frame = pd.DataFrame({'Party': list(votes), 'Votes': list(votes.values())})
+        return frame.sort_values('Votes', ascending=False, ignore_index=True), reported
+
+    def province_frame(self):
+        """Province x party vote table with the leading party per province."""
+        with self._lock:
+            table = {province: dict(votes) for province, votes in self.province_votes.items()}
+        frame = pd.DataFrame.from_dict(table, orient='index').fillna(0).astype('int64')
+        if not frame.empty:
+            frame = frame[frame.sum().sort_values(ascending=False).index]
+            frame['Leading Party'] = frame.idxmax(axis=1)
+        frame.index.name = 'Province'
+        return frame
+
+
+class FeedTailer:
+    """Incrementally reads new rows from every feed file in a folder."""
+
+    def __init__(self, folder, aggregator):
+        self.folder = Path(folder)
+        self.aggregator = aggregator
+        self._offsets = {}
+        self._headers = {}
+
+    def _files(self):
+        return sorted(list(self.folder.glob('*.jsonl')) + list(self.folder.glob('*.csv')))
+
+    def _parse(self, path, text):
+        if path.suffix == '.jsonl':
+            for line in text.splitlines():
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        self.aggregator.reject()
+            return
+        rows = csv.reader(io.StringIO(text))
+        header = self._headers.get(path)
+        for row in rows:
+            if header is None:
+                header = self._headers[path] = row
+                continue
+            yield dict(zip(header, row))
+
+    def poll(self):
+        """Apply everything appended since the last poll; return rows applied."""
+        applied = 0
+        for path in self._files():
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            offset = self._offsets.get(path, 0)
+            if size < offset:
+                # Truncated or replaced; re-reading is safe because results
+                # for a polling division replace rather than add to earlier ones
+                offset = 0
+                self._headers.pop(path, None)
+            if size == offset:
+                continue
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read(size - offset)
+            # Only consume complete lines; a partly written row waits for the next poll
+            end = chunk.rfind(b'\n')
+            if end < 0:
+                continue
+            self._offsets[path] = offset + end + 1
+            text = chunk[:end + 1].decode('utf-8', errors='replace')
+            applied += self.aggregator.apply_many(self._parse(path, text))
+        return applied
+
+    def run_forever(self, interval=POLL_INTERVAL):
+        while True:
+            try:
+                applied = self.poll()
+                if applied:
+                    logger.debug("applied %d results", applied)
+            except Exception:
+                logger.exception("results feed poll failed")
+            time.sleep(interval)
+
+
+@st.cache_resource(show_spinner=False)
+def _start_feed(folder, _district_provinces):
+    # One tailer per folder for the life of the process; reloads only remap provinces
+    aggregator = ResultsAggregator(_district_provinces)
+    tailer = FeedTailer(folder, aggregator)
+    tailer.poll()
+    thread = threading.Thread(target=tailer.run_forever, name='results-feed', daemon=True)
+    thread.start()
+    return aggregator
+
+
+def get_results(dataset):
+    """Return the process-wide results aggregator, or None if no feed is configured."""
+    if RESULTS_DIR is None:
+        return None
+    districts = dataset.df.drop_duplicates('District')
+    provinces = dict(zip(districts['District'].astype(str), districts['Province'].astype(str)))
+    results = _start_feed(RESULTS_DIR, provinces)
+    results.use_provinces(provinces)
+    return results
+
+
+def _seen_key(district):
+    return f'_results_seen_{district}'
+
+
+def mark_seen(results, district=None):
+    """Record the aggregate version a view has just rendered for this session."""
+    st.session_state[_seen_key(district)] = results.version_for(district)
+
+
+def watch(results, scope):
+    """Rerun the app when the aggregate the page shows has changed.
+
+    ``scope`` is a callable returning the district the page currently shows
+    (or None for the national view). Runs as a timer fragment that renders
+    nothing, so idle ticks cost no element traffic.
+    """
+    @st.fragment(run_every=POLL_INTERVAL)
+    def _watcher():
+        district = scope()
+        seen = st.session_state.get(_seen_key(district))
+        if seen is not None and seen != results.version_for(district):
+            st.rerun(scope='app')
+
+    _watcher()
@@ -0,0 +1,175 @@
+"""Built-in district demographics and engagement strategies (2012 census)."""
+
+districts_data = {
+    # Western Province
+    'Colombo': {'Province': 'Western', 'Buddhist': 70.66, 'Muslim': 11.76, 'Christian': 9.56, 'Hindu': 7.89, 'Population': 2324349},
+    'Gampaha': {'Province': 'Western', 'Buddhist': 71.48, 'Christian': 21.19, 'Muslim': 5.01, 'Hindu': 2.28, 'Population': 2304833},
+    'Kalutara': {'Province': 'Western', 'Buddhist': 83.52, 'Muslim': 9.40, 'Christian': 3.79, 'Hindu': 3.27, 'Population': 1221948},
+    
+    # Central Province
+    'Kandy': {'Province': 'Central', 'Buddhist': 73.0, 'Muslim': 14.0, 'Hindu': 9.5, 'Christian': 2.5, 'Population': 1375382},
+    'Matale': {'Province': 'Central', 'Buddhist': 85.0, 'Hindu': 8.0, 'Muslim': 5.0, 'Christian': 2.0, 'Population': 484531},
+    'Nuwara Eliya': {'Province': 'Central', 'Hindu': 51.04, 'Buddhist': 39.67, 'Christian': 6.55, 'Muslim': 2.71, 'Population': 711644},
+    
+    # Southern Province
+    'Galle': {'Province': 'Southern', 'Buddhist': 93.9, 'Muslim': 3.7, 'Hindu': 1.5, 'Christian': 0.9, 'Population': 1063334},
+    'Matara': {'Province': 'Southern', 'Buddhist': 95.0, 'Muslim': 3.0, 'Hindu': 2.0, 'Christian': 0.7, 'Population': 814048},
+    'Hambantota': {'Province': 'Southern', 'Buddhist': 90.0, 'Muslim': 6.0, 'Hindu': 3.0, 'Christian': 1.0, 'Population': 599903},
+    
+    # Eastern Province
+    'Trincomalee': {'Province': 'Eastern', 'Muslim': 42.11, 'Buddhist': 26.12, 'Hindu': 25.95, 'Christian': 5.79, 'Population': 379541},
+    'Batticaloa': {'Province': 'Eastern', 'Hindu': 70.0, 'Muslim': 20.0, 'Buddhist': 8.0, 'Christian': 2.0, 'Population': 526567},
+    'Ampara': {'Province': 'Eastern', 'Muslim': 43.4, 'Buddhist': 38.7, 'Hindu': 15.8, 'Christian': 2.0, 'Population': 649402},
+    
+    # North Central Province
+    'Anuradhapura': {'Province': 'North Central', 'Buddhist': 90.0, 'Muslim': 8.4, 'Christian': 1.1, 'Hindu': 0.5, 'Population': 860575},
+    'Polonnaruwa': {'Province': 'North Central', 'Buddhist': 89.7, 'Muslim': 7.5, 'Hindu': 1.7, 'Christian': 1.0, 'Population': 406088},
+    
+    # North Western Province
+    'Kurunegala': {'Province': 'North Western', 'Buddhist': 92.5, 'Muslim': 7.7, 'Hindu': 0.95, 'Christian': 0.85, 'Population': 1618465},
+    'Puttalam': {'Province': 'North Western', 'Buddhist': 40.0, 'Christian': 30.0, 'Muslim': 18.0, 'Hindu': 3.0, 'Population': 762396},
+    
+    # Northern Province
+    'Jaffna': {'Province': 'Northern', 'Hindu': 80.0, 'Christian': 15.0, 'Muslim': 3.0, 'Buddhist': 2.0, 'Population': 583882},
+    'Kilinochchi': {'Province': 'Northern', 'Hindu': 75.0, 'Christian': 20.0, 'Muslim': 3.0, 'Buddhist': 2.0, 'Population': 113510},
+    'Mannar': {'Province': 'Northern', 'Christian': 60.0, 'Hindu': 25.0, 'Muslim': 10.0, 'Buddhist': 5.0, 'Population': 99570},
+    'Vavuniya': {'Province': 'Northern', 'Hindu': 65.0, 'Christian': 20.0, 'Muslim': 10.0, 'Buddhist': 5.0, 'Population': 172115},
+    'Mullaitivu': {'Province': 'Northern', 'Hindu': 70.0, 'Christian': 20.0, 'Muslim': 5.0, 'Buddhist': 5.0, 'Population': 92238},
+    
+    # Uva Province
+    'Badulla': {'Province': 'Uva', 'Buddhist': 70.0, 'Hindu': 20.0, 'Muslim': 8.0, 'Christian': 2.0, 'Population': 815405},
+    'Monaragala': {'Province': 'Uva', 'Buddhist': 85.0, 'Hindu': 10.0, 'Muslim': 4.0, 'Christian': 1.0, 'Population': 451058},
+    
+    # Sabaragamuwa Province
+    'Ratnapura': {'Province': 'Sabaragamuwa', 'Buddhist': 80.0, 'Muslim': 12.0, 'Hindu': 6.0, 'Christian': 2.0, 'Population': 1088007},
+    'Kegalle': {'Province': 'Sabaragamuwa', 'Buddhist': 85.0, 'Christian': 8.0, 'Muslim': 5.0, 'Hindu': 2.0, 'Population': 840648}
+}
+
+# Strategies data
+strategies_data = {
+    'Colombo': [
+        "Buddhist Service Hubs: Partner with Gangaramaya and Kelaniya temples on urban poverty clinics",
+        "Interfaith Education Forum: Convene mosque, church, and temple leaders quarterly",
+        "Youth Tech Incubators: Host 'NextGen Colombo' hackathons in temple grounds"
+    ],
+    'Gampaha': [
+        "Church-Linked STEM Scholarships: Collaborate with Catholic and Protestant schools",
+        "Buddhist Temple-Jobs Link: 'Sunday with the Sangha' vocational training",
+        "Microfinance Clinics: Small-business loans for home-based entrepreneurs"
+    ],
+    'Kalutara': [
+        "Fishers' Relief Fund: Co-create Muslim community council for cyclone-resilience grants",
+        "Vesak Environmental Drive: Sponsor green lighting at Kalutara Bodhiya",
+        "Rail Underpass Advocacy: Town halls with Buddhist clergy and farmers"
+    ],
+    'Kandy': [
+        "Perahera Dialogues: Link Temple of the Tooth with youth entrepreneurship training",
+        "Merchant Microgrants: Support Muslim small traders through mosque committees",
+        "Hindu Temple Fairs: Sponsor logistics at Kataragama-style festivals"
+    ],
+    'Trincomalee': [
+        "Interfaith Port Plans: Present UNP's northeast port-expansion vision",
+        "Beach-Clean Initiatives: Multi-faith clean-ups at Koneswaram Temple",
+        "Ramadan & Vesak Clinics: Mobile health units during religious observances"
+    ],
+    'Nuwara Eliya': [
+        "Tea-Worker Welfare Boards: Joint committees with Tamil unions and Sinhala elders",
+        "Poya-Day Clinics: Free clinics promoted through kovils, viharas, and churches",
+        "Inter-Community Tea-Tours: Use factory tours for community dialogue"
+    ],
+    'Matale': [
+        "Temple-Farmers Roundtables: Partner with kovils and viharas to support smallholder tea and vegetable farmers through knowledge exchanges",
+        "Heritage Tourism Workshops: Interfaith tours of Aluvihare Rock Temple and Dutch Fort led by local religious guides",
+        "Youth Sports Leagues: Cross-faith cricket and volleyball tournaments sponsored by temples, churches, mosques, and kovils"
+    ],
+    'Galle': [
+        "Sea2Temple Clean-Ups: Multi-faith beach cleanup drives along Unawatuna and Galle beaches",
+        "Fort Heritage Festivals: Annual interfaith cultural fair at Galle Fort hosted by Buddhist, Hindu, Muslim, and Christian groups",
+        "Fisher Livelihood Grants: Microfinance for small-scale fishermen in partnership with local churches and mosques"
+    ],
+    'Matara': [
+        "Nilwala River Health Camps: Mobile clinics promoted through temples, churches, and mosques along the river basin",
+        "Teardrop Temple Tours: Inter-community tours of the Parevi Duwa temple and Matara Fort led by youth volunteers",
+        "Women’s Vocational Training: Skill-building workshops at temples and churches for single mothers"
+    ],
+    'Hambantota': [
+        "Port Community Dialogues: Quarterly town halls with Buddhist and Muslim leaders on port expansion benefits",
+        "Wildlife Conservation Drives: Interfaith volunteer days at Bundala and Yala national parks",
+        "Youth Coding Bootcamps: Hackathons hosted in local religious centres to build digital literacy"
+    ],
+    'Batticaloa': [
+        "Tamil-Muslim Cultural Fairs: Joint celebrations of Hindu and Islamic festivals alongside church choirs",
+        "Fisher Welfare Workshops: Vocational training for coastal fishermen via kovils and mosque committees",
+        "Youth Peacebuilding Camps: Residential interfaith programs for Christian, Hindu, and Muslim youth"
+    ],
+    'Ampara': [
+        "Agrarian Extension Clinics: Mobile agriculture advice via mosque, kovil, and church networks",
+        "Ramadan & Poson Food Drives: Joint community meals distributed through temples and mosques",
+        "Women’s Literacy Circles: Faith-based adult education classes run from churches and mosques"
+    ],
+    'Anuradhapura': [
+        "Sacred Site Pilgrimages: Interfaith guided tours of Sri Maha Bodhi and ancient stupas",
+        "Agricultural Microgrants: Support for paddy farmers via temple and mosque patronage",
+        "Cultural Youth Camps: Camps teaching heritage traditions across Buddhism, Islam, Hinduism, and Christianity"
+    ],
+    'Polonnaruwa': [
+        "Heritage Conservation Projects: Volunteer restoration days at Vatadage and kovils",
+        "Temple-Mosque Dialogue Forums: Monthly interfaith dialogues inside the medieval city walls",
+        "Youth Scholarship Awards: Cross-religion academic scholarships funded by local clergy"
+    ],
+    'Kurunegala': [
+        "Faith & Farming Workshops: Sustainable agriculture training at temple and mosque grounds",
+        "Buddhist-Church Youth Festivals: Annual festivals with music, dance and sports competitions",
+        "Volunteer Health Camps: Mobile clinics rotating between kovils, viharas, and churches"
+    ],
+    'Puttalam': [
+        "Saltworker Support Fund: Microfinance for salt-pan communities via mosque and church partnerships",
+        "Interfaith Mangrove Clean-ups: Coastal restoration drives led by Hindu, Muslim, and Christian volunteers",
+        "Youth Entrepreneurship Grants: Seed funding for interfaith youth-led social enterprises"
+    ],
+    'Jaffna': [
+        "Temple & Church Heritage Tours: Joint cultural tours of Nallur Kandaswamy Kovil and Jaffna Cathedral",
+        "Fisher Livelihood Training: Modern fishing techniques taught under mosque and kovil sponsorship",
+        "Youth Debate Clubs: Interfaith public speaking competitions in schools and temples"
+    ],
+    'Kilinochchi': [
+        "Post-War Healing Circles: Interfaith trauma support sessions hosted by churches and kovils",
+        "Vocational Training Hubs: Skill centers at mosque and temple grounds for unemployed youth",
+        "Cultural Music Festivals: Joint concerts of Hindu, Muslim, and Christian devotional music"
+    ],
+    'Mannar': [
+        "Fisher Empowerment Forums: Community discussions with Tamil Catholic and Muslim fishing leaders",
+        "Beach Safety Clinics: First-aid training at local kovils and churches",
+        "Youth Film Workshops: Interfaith storytelling film camps supported by clergy"
+    ],
+    'Vavuniya': [
+        "Reconciliation Seminars: Interfaith dialogue on post-conflict healing at churches and kovils",
+        "Agricultural Co-ops: Joint farmer cooperatives supported by mosque and temple committees",
+        "Sports for Peace: Mixed-faith sports tournaments in local community centers"
+    ],
+    'Mullaitivu': [
+        "Island Fisher Microfinance: Low-interest loans for island fishing communities via mosque networks",
+        "Trauma Counseling Centers: Faith-based counseling run by church and kovil volunteers",
+        "Youth Arts Workshops: Cross-community art programs in schools and religious centers"
+    ],
+    'Badulla': [
+        "Tea Estate Health Camps: Mobile clinics in plantation areas via temples and churches",
+        "Poson Pilgrimage Support: Joint pilgrim transport services run by kovil and church committees",
+        "Mountain Trail Clean-ups: Conservation days in the Knuckles range with multi-faith volunteers"
+    ],
+    'Monaragala': [
+        "Rural Livelihood Training: Skill workshops at temples, kovils, and mosque grounds for subsistence farmers",
+        "Interfaith Literacy Drives: Adult reading classes hosted by churches and viharas",
+        "Youth Leadership Forums: Cross-faith leadership training for local high school students"
+    ],
+    'Ratnapura': [
+        "Gem Mining Safety Clinics: Health and safety workshops for mine workers via Buddhist and Christian centers",
+        "Rainforest Restoration Drives: Reforestation projects led by temple and church youth groups",
+        "Scholarship Fairs: Cross-community education fairs sponsored by clergy"
+    ],
+    'Kegalle': [
+        "Rubber Farmer Roundtables: Knowledge exchange sessions at kovils and viharas",
+        "Temple-Mosque Food Banks: Joint food distribution programs in low-income areas",
+        "Youth Heritage Projects: Community history mapping with multi-faith student teams"
+    ]
+}
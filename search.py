@@ -0,0 +1,223 @@
+"""Inverted index, ranked search and categorisation over the strategy texts.
+
+The index is built once per data version and shared by every session. Each
+term maps to a posting array of document ids with precomputed BM25 weights,
+so a query is a few array additions into a score vector. Query terms also
+match longer terms that start with them (``fisher`` -> ``fishermen``) and,
+through a trigram index over the vocabulary, misspellings (``kovl`` ->
+``kovil``).
+
+Strategy categories are assigned from ``CATEGORY_KEYWORDS`` through the same
+postings, so the per-category counts always follow the data.
+"""
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from data_layer import versioned_cache
+from instrumentation import span
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    'a an and at by for from in into of on or the to with via through along during '
+    'their our its is are be as'.split())
+
+# Keywords per category; a trailing ``*`` matches any term with that prefix
+CATEGORY_KEYWORDS = {
+    'Temple/Religious Partnerships': ('temple', 'vihara', 'kovil', 'church', 'mosque', 'clergy',
+                                      'sangha', 'bodhiya', 'perahera', 'religious'),
+    'Interfaith Dialogue': ('interfaith', 'faith', 'dialogue*', 'peacebuild*', 'reconcil*',
+                            'harmony', 'inter', 'roundtable', 'town'),
+    'Economic Development': ('microfinanc*', 'microgrant*', 'loan', 'busines*', 'entrepreneur*',
+                             'job', 'livelihood', 'trader', 'merchant', 'farmer', 'agri*',
+                             'agrarian', 'touri*', 'port', 'fisher*', 'tea', 'rubber', 'vocational'),
+    'Health & Social Services': ('health', 'clinic', 'medical', 'welfare', 'relief', 'food',
+                                 'meal', 'mother'),
+    'Youth & Education': ('youth', 'school', 'student', 'scholarship', 'educat*', 'training',
+                          'skill*', 'literacy', 'coding', 'hackathon', 'bootcamp', 'stem'),
+    'Environmental Initiatives': ('environment*', 'clean*', 'conservation', 'wildlife', 'green',
+                                  'climate', 'cyclone', 'river', 'forest', 'beach'),
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Relative weight of prefix and fuzzy matches against an exact term match
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+FUZZY_MIN_SIMILARITY = 0.35
+FUZZY_CANDIDATES = 5
+
+SEARCH_LIMIT = 25
+
+
+def normalize(token):
+    """Fold simple plurals so ``kovils`` and ``kovil`` index together."""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [normalize(token) for token in TOKEN_RE.findall(text.lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+def trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StrategyIndex:
+    """Inverted index over every strategy text of a dataset."""
+
+    def __init__(self, strategies):
+        units, texts, tokens = [], [], []
+        self.unit_docs = {}
+        for unit, items in strategies.items():
+            start = len(texts)
+            for text in items:
+                units.append(unit)
+                texts.append(text)
+                tokens.append(tokenize(text))
+            self.unit_docs[unit] = (start, len(texts))
+        self.units = np.array(units, dtype=object)
+        self.texts = np.array(texts, dtype=object)
+
+        lengths = np.array([len(t) for t in tokens], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) else 0.0
+        postings = defaultdict(list)
+        for doc, doc_tokens in enumerate(tokens):
+            for term, tf in Counter(doc_tokens).items():
+                postings[term].append((doc, tf))
+
+        n_docs = len(texts)
+        self.postings = {}
+        for term, entries in postings.items():
+            ids = np.fromiter((doc for doc, _ in entries), dtype=np.int32, count=len(entries))
+            tf = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            idf = np.log1p((n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = K1 * (1 - B + B * lengths[ids] / avg_length)
+            self.postings[term] = (ids, (idf * tf * (K1 + 1) / (tf + norm)).astype(np.float32))
+
+        self.vocabulary = sorted(self.postings)
+        self._trigrams = defaultdict(list)
+        for term in self.vocabulary:
+            for gram in trigrams(term):
+                self._trigrams[gram].append(term)
+
+        self.categories = list(CATEGORY_KEYWORDS)
+        self.doc_categories = np.zeros((n_docs, len(self.categories)), dtype=bool)
+        for j, keywords in enumerate(CATEGORY_KEYWORDS.values()):
+            for keyword in keywords:
+                prefix = keyword.endswith('*')
+                terms = self._prefixed(keyword[:-1]) if prefix else [normalize(keyword)]
+                for term in terms:
+                    if term in self.postings:
+                        self.doc_categories[self.postings[term][0], j] = True
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _prefixed(self, prefix):
+        start = bisect_left(self.vocabulary, prefix)
+        end = start
+        while end < len(self.vocabulary) and self.vocabulary[end].startswith(prefix):
+            end += 1
+        return self.vocabulary[start:end]
+
+    def _fuzzy(self, term):
+        grams = trigrams(term)
+        shared = Counter(candidate for gram in grams for candidate in self._trigrams.get(gram, ()))
+        scored = []
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + len(trigrams(candidate)) - count)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, candidate))
+        scored.sort(reverse=True)
+        return scored[:FUZZY_CANDIDATES]
+
+    def expand(self, term):
+        """Return ``{index term: weight}`` for one normalized query term."""
+        matches = {}
+        if term in self.postings:
+            matches[term] = 1.0
+        for candidate in self._prefixed(term):
+            matches.setdefault(candidate, PREFIX_WEIGHT)
+        if not matches:
+            for similarity, candidate in self._fuzzy(term):
+                matches[candidate] = FUZZY_WEIGHT * similarity
+        return matches
+
+    def scores(self, query):
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        for term in tokenize(query):
+            for candidate, weight in self.expand(term).items():
+                ids, weights = self.postings[candidate]
+                scores[ids] += weight * weights
+        return scores
+
+    def search(self, query, limit=SEARCH_LIMIT, docs=None):
+        """Best matching strategies as a frame of Unit, Strategy, Categories and
+        Score, among the documents in the boolean mask ``docs`` if given."""
+        scores = self.scores(query)
+        if docs is not None:
+            scores[~docs] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return pd.DataFrame({
+            'Unit': self.units[hits],
+            'Strategy': self.texts[hits],
+            'Categories': [', '.join(self.categories_of(doc)) for doc in hits],
+            'Score': scores[hits].round(2),
+        })
+
+    def categories_of(self, doc):
+        return [self.categories[j] for j in np.flatnonzero(self.doc_categories[doc])]
+
+    def unit_categories(self, unit):
+        """Categories of each of ``unit``'s strategies, in order."""
+        start, end = self.unit_docs.get(unit, (0, 0))
+        return [self.categories_of(doc) for doc in range(start, end)]
+
+    def category_counts(self, docs=None):
+        """Frame with the number of units and strategies in each category,
+        counting only the documents in the boolean mask ``docs`` if given."""
+        codes = pd.factorize(self.units)[0]
+        doc_categories = self.doc_categories if docs is None else self.doc_categories & docs[:, None]
+        unit_counts = [len(np.unique(codes[doc_categories[:, j]]))
+                       for j in range(len(self.categories))]
+        return pd.DataFrame({'Strategy Type': self.categories,
+                             'Units': unit_counts,
+                             'Strategies': doc_categories.sum(axis=0)})
+
+
+@versioned_cache(show_spinner=False)
+def _build_index(version, _strategies):
+    with span('search.index'):
+        return StrategyIndex(_strategies.all_texts())
+
+
+def get_index(dataset):
+    """Return the process-wide strategy index for the dataset's version."""
+    return _build_index(dataset.version, dataset.strategies)
+
+
+def clear_index():
+    _build_index.clear()
+
+
+def timed_search(index, query, limit=SEARCH_LIMIT, docs=None):
+    """Run a search and return ``(results, milliseconds)``."""
+    start = time.perf_counter()
+    with span('search.query'):
+        results = index.search(query, limit, docs)
+    return results, (time.perf_counter() - start) * 1000
@@ -0,0 +1,217 @@
+"""Nearest-neighbour "similar units" and k-means engagement archetypes.
+
+Each unit is a point in four dimensions: its Buddhist, Muslim, Christian and
+Hindu shares in percentage points. Distances are Euclidean, so a distance of
+10 means roughly ten points of population are in a different community.
+
+Up to ``MATRIX_MAX_UNITS`` units (districts and polling divisions), the full
+pairwise distance matrix is built once per data version and a query is a
+single row of it. That would be 784 MB at GN scale, so there the distances
+are measured directly, which at four dimensions takes well under a
+millisecond even for 14,000 units. The ``MAX_NEIGHBOURS`` nearest
+neighbours of the last ``NEIGHBOUR_CACHE_SIZE`` units asked for are kept in
+an LRU shared by every session, so unfiltered queries for them are a lookup
+and nothing is computed up front for units nobody selects.
+A query restricted to a subset of units (the sidebar filters, or only units
+with strategies) always measures the distances to that subset.
+
+Archetypes come from k-means (k-means++ seeding, best of ``KMEANS_RESTARTS``
+fixed-seed runs) over the same vectors. They are memoized per data version
+and ``k``, and numbered from the largest cluster down.
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from data_layer import versioned_cache
+from instrumentation import span
+from metrics import RELIGIONS
+
+MATRIX_MAX_UNITS = int(os.environ.get('ELECTION_SIMILARITY_MATRIX_MAX', '2000'))
+
+# Neighbours kept per unit above MATRIX_MAX_UNITS, for this many units
+MAX_NEIGHBOURS = 20
+NEIGHBOUR_CACHE_SIZE = 2048
+
+DEFAULT_ARCHETYPES = 6
+ARCHETYPE_RANGE = (2, 12)
+ARCHETYPE_CACHE_SIZE = 16
+
+KMEANS_RESTARTS = 4
+KMEANS_ITERATIONS = 100
+
+
+def _squared_distances(vectors, others):
+    d2 = (vectors ** 2).sum(axis=1)[:, None] + (others ** 2).sum(axis=1)[None, :] - 2 * vectors @ others.T
+    return np.maximum(d2, 0)
+
+
+class SimilarityIndex:
+    """Nearest units by religious composition for one dataset."""
+
+    def __init__(self, dataset):
+        self.vectors = dataset.df[RELIGIONS].to_numpy(dtype=np.float64)
+        self.n_rows = len(self.vectors)
+        self.matrix = None
+        if self.n_rows <= MATRIX_MAX_UNITS:
+            self.matrix = np.sqrt(_squared_distances(self.vectors, self.vectors)).astype(np.float32)
+        # position -> (neighbours, distances), least recently asked for first
+        self._nearest = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _distances(self, position, candidates):
+        if self.matrix is not None:
+            return self.matrix[position, candidates]
+        return np.sqrt(((self.vectors[candidates] - self.vectors[position]) ** 2).sum(axis=1))
+
+    def _closest(self, position, k, rows):
+        candidates = np.arange(self.n_rows) if rows is None else np.asarray(rows)
+        candidates = candidates[candidates != position]
+        distances = self._distances(position, candidates)
+        if k < len(candidates):
+            nearest = np.argpartition(distances, k - 1)[:k]
+            candidates, distances = candidates[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return candidates[order], distances[order].astype(np.float32)
+
+    def similar(self, position, k, rows=None):
+        """The ``k`` units closest to ``position`` (optionally among ``rows``),
+        as ``(positions, distances)``, closest first."""
+        if rows is None and self.matrix is None and k <= MAX_NEIGHBOURS:
+            return tuple(array[:k] for array in self._neighbours(position))
+        return self._closest(position, k, rows)
+
+    def _neighbours(self, position):
+        with self._lock:
+            nearest = self._nearest.get(position)
+            if nearest is not None:
+                self._nearest.move_to_end(position)
+                return nearest
+        nearest = self._closest(position, MAX_NEIGHBOURS, None)
+        with self._lock:
+            self._nearest[position] = nearest
+            while len(self._nearest) > NEIGHBOUR_CACHE_SIZE:
+                self._nearest.popitem(last=False)
+        return nearest
+
+    def nbytes(self):
+        with self._lock:
+            arrays = [array for nearest in self._nearest.values() for array in nearest]
+        return sum(array.nbytes for array in arrays + [self.vectors, self.matrix] if array is not None)
+
+
+@versioned_cache(show_spinner=False)
+def _build_similarity(version, _dataset):
+    with span('similarity.build'):
+        return SimilarityIndex(_dataset)
+
+
+def get_similarity(dataset):
+    """Return the process-wide similarity index for the dataset's version."""
+    return _build_similarity(dataset.version, dataset)
+
+
+def similar_units(dataset, unit, k, rows=None):
+    """Frame of the ``k`` units most similar to ``unit``, closest first."""
+    positions, distances = get_similarity(dataset).similar(dataset.unit_positions[unit], k, rows)
+    columns = ['Unit', 'Province'] + (['District'] if dataset.unit_label != 'District' else []) + RELIGIONS
+    frame = dataset.df.iloc[positions][columns].reset_index(drop=True)
+    frame['Distance (pts)'] = distances.round(1)
+    return frame
+
+
+def kmeans(vectors, k, seed=0, restarts=KMEANS_RESTARTS, iterations=KMEANS_ITERATIONS):
+    """Return ``(labels, centroids)`` of the lowest-inertia k-means run."""
+    n = len(vectors)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+    best = None
+    for _ in range(restarts):
+        # k-means++ seeding
+        chosen = [rng.integers(n)]
+        closest = ((vectors - vectors[chosen[0]]) ** 2).sum(axis=1)
+        for _ in range(1, k):
+            total = closest.sum()
+            choice = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+            chosen.append(choice)
+            closest = np.minimum(closest, ((vectors - vectors[choice]) ** 2).sum(axis=1))
+        centroids = vectors[chosen]
+
+        for _ in range(iterations):
+            labels = _squared_distances(vectors, centroids).argmin(axis=1)
+            counts = np.bincount(labels, minlength=k)
+            sums = np.stack([np.bincount(labels, weights=vectors[:, j], minlength=k)
+                             for j in range(vectors.shape[1])], axis=1)
+            updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centroids)
+            if np.allclose(updated, centroids):
+                break
+            centroids = updated
+        labels = _squared_distances(vectors, centroids).argmin(axis=1)
+        inertia = ((vectors - centroids[labels]) ** 2).sum()
+        if best is None or inertia < best[0]:
+            best = (inertia, labels, centroids)
+    return best[1], best[2]
+
+
+def archetype_name(centroid):
+    """Describe a cluster centre, e.g. ``Buddhist stronghold · Muslim 9%``."""
+    order = np.argsort(-centroid, kind='stable')
+    top, second = order[0], order[1]
+    share = centroid[top]
+    kind = 'stronghold' if share >= 75 else 'majority' if share >= 50 else 'plurality'
+    return f"{RELIGIONS[top]} {kind} · {RELIGIONS[second]} {centroid[second]:.0f}%"
+
+
+@dataclass(frozen=True)
+class Archetypes:
+    labels: np.ndarray
+    centroids: np.ndarray
+    names: tuple
+
+    def unit_archetype(self, position):
+        return self.names[self.labels[position]]
+
+    def summary(self, dataset, rows=None):
+        """One row per archetype: its centre and how many units (in ``rows``) it holds."""
+        labels = self.labels if rows is None else self.labels[rows]
+        metrics = dataset.metrics if rows is None else dataset.metrics.iloc[rows]
+        k = len(self.names)
+        counts = np.bincount(labels, minlength=k)
+        diversity = np.bincount(labels, weights=metrics['Diversity Score'].to_numpy(dtype=np.float64), minlength=k)
+        strategies = np.bincount(labels, weights=metrics['Strategy Count'].to_numpy() > 0, minlength=k)
+        frame = pd.DataFrame({'Archetype': self.names, 'Units': counts})
+        for i, religion in enumerate(RELIGIONS):
+            frame[f'{religion} %'] = self.centroids[:, i].round(1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frame['Mean Diversity'] = (diversity / counts).round(3)
+            frame['With Strategies %'] = (strategies / counts * 100).round(1)
+        return frame
+
+
+def _build_archetypes(vectors, k):
+    labels, centroids = kmeans(vectors, k)
+    # Number archetypes from the largest down
+    order = np.argsort(-np.bincount(labels, minlength=len(centroids)), kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    centroids = centroids[order]
+    names = []
+    for centroid in centroids:
+        name = archetype_name(centroid)
+        names.append(name if name not in names else f"{name} ({len(names) + 1})")
+    return Archetypes(labels=rank[labels], centroids=centroids, names=tuple(names))
+
+
+@versioned_cache(max_entries=ARCHETYPE_CACHE_SIZE, show_spinner=False)
+def _archetypes(version, k, _dataset):
+    with span('similarity.archetypes'):
+        return _build_archetypes(get_similarity(_dataset).vectors, k)
+
+
+def get_archetypes(dataset, k=DEFAULT_ARCHETYPES):
+    """Return the memoized ``k`` engagement archetypes for the dataset's version."""
+    return _archetypes(dataset.version, k, dataset)
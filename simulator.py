@@ -0,0 +1,289 @@
+"""Monte Carlo vote-swing simulator over the unit demographics.
+
+A scenario sets the assumed support for the party within each religious
+community, an outreach uplift for every strategy category, and the
+uncertainty: a national swing per community, shared by every unit in a draw,
+plus independent local noise per unit. A unit's vote share in one draw is its
+religion shares dotted with the community support plus its uplift, so a batch of
+draws is a single ``(units x 4) @ (4 x draws)`` product in float32.
+
+Draws are processed in chunks of about ``CHUNK_ELEMENTS`` values so memory stays
+flat. Local noise is drawn afresh for every unit and draw of a chunk (float32
+normals from the scenario's generator, written in place into one reused
+buffer), so no two units or draws share a noise sequence. Means, win
+probabilities and seat counts use every draw. Before
+clipping, each unit's vote share is exactly normal, so its 5-95% band is
+computed in closed form instead of sorting the draws. Runs larger than ``POOL_THRESHOLD`` samples
+(GN level) are split into tasks of about ``POOL_TASK_ELEMENTS`` samples run on a
+process pool, at most one per worker at a time, so a cancelled run stops
+within one task. Results are memoized per data
+version and scenario, so returning to an earlier scenario is instant.
+
+A "seat" here is a unit won outright (vote share above 50%).
+"""
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_layer import versioned_cache
+from instrumentation import span
+from metrics import RELIGIONS
+from search import CATEGORY_KEYWORDS, get_index
+
+# Draws per unit for district-level runs, scaled down so a run stays near
+# SAMPLE_BUDGET unit-draws in total, but never below MIN_DRAWS
+MAX_DRAWS = 1_000_000
+MIN_DRAWS = 5_000
+SAMPLE_BUDGET = 25_000_000
+
+CHUNK_ELEMENTS = 1 << 20
+MIN_CHUNK_DRAWS = 256
+
+# Runs with more unit-draws than this are spread over worker processes
+POOL_THRESHOLD = 50_000_000
+POOL_WORKERS = int(os.environ.get('ELECTION_SIMULATOR_WORKERS', '0')) or os.cpu_count() or 1
+# Unit-draws per pool task; progress (and so cancellation) is checked between tasks
+POOL_TASK_ELEMENTS = 1 << 24
+
+SCENARIO_CACHE_SIZE = 64
+
+# z-score of the 5th/95th percentile band
+BAND_Z = 1.6448536
+
+DEFAULT_SUPPORT = {'Buddhist': 35.0, 'Muslim': 50.0, 'Christian': 45.0, 'Hindu': 40.0}
+
+# Uplift entries follow the strategy categories in this order
+CATEGORIES = tuple(CATEGORY_KEYWORDS)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Simulation inputs in percentage points: support per religion (in
+    ``RELIGIONS`` order) and outreach uplift per strategy category (in
+    ``CATEGORIES`` order) for units with a strategy in that category."""
+    support: tuple = tuple(DEFAULT_SUPPORT[religion] for religion in RELIGIONS)
+    uplift: tuple = (0.0,) * len(CATEGORIES)
+    national_sd: float = 3.0
+    local_sd: float = 5.0
+    draws: int = 0
+
+    def seed(self, version):
+        digest = hashlib.sha256(repr((version, self)).encode()).hexdigest()
+        return int(digest[:16], 16)
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    units: pd.DataFrame
+    provinces: pd.DataFrame
+    seat_distribution: np.ndarray
+    draws: int
+    seconds: float
+
+    @property
+    def expected_seats(self):
+        seats = np.arange(len(self.seat_distribution))
+        return float(seats @ self.seat_distribution)
+
+    def majority_probability(self):
+        """Probability of winning more than half of all units."""
+        n_units = len(self.seat_distribution) - 1
+        return float(self.seat_distribution[n_units // 2 + 1:].sum())
+
+
+def _run(inputs, draws, seed, progress=None):
+    """Simulate ``draws`` draws; returns additive partial aggregates. ``progress``
+    is called with the fraction done after every chunk."""
+    shares, base, province_starts, province_weights, national_sd, local_sd = inputs
+    rng = np.random.default_rng(seed)
+    n_units = len(base)
+    n_provinces = len(province_starts)
+    chunk = max(MIN_CHUNK_DRAWS, CHUNK_ELEMENTS // n_units)
+    noise = np.empty(n_units * min(chunk, draws), dtype=np.float32)
+
+    out = {
+        'vote_sum': np.zeros(n_units), 'wins': np.zeros(n_units, dtype=np.int64),
+        'province_vote_sum': np.zeros(n_provinces), 'province_wins': np.zeros(n_provinces, dtype=np.int64),
+        'seats': np.zeros(n_units + 1, dtype=np.int64),
+        'draws': draws,
+    }
+    for done in range(0, draws, chunk):
+        size = min(chunk, draws - done)
+        swing = rng.standard_normal((len(RELIGIONS), size), dtype=np.float32)
+        swing *= national_sd
+        votes = shares @ swing
+        votes += base[:, None]
+        # A contiguous (units x size) view, also for the shorter last chunk
+        local = noise[:n_units * size].reshape(n_units, size)
+        rng.standard_normal(out=local, dtype=np.float32)
+        local *= local_sd
+        votes += local
+        np.clip(votes, 0, 1, out=votes)
+
+        won = votes > 0.5
+        province_votes = province_weights @ votes
+
+        out['vote_sum'] += votes.sum(axis=1, dtype=np.float64)
+        out['wins'] += won.sum(axis=1)
+        out['seats'] += np.bincount(won.sum(axis=0), minlength=n_units + 1)
+        out['province_vote_sum'] += province_votes.sum(axis=1, dtype=np.float64)
+        out['province_wins'] += (province_votes > 0.5).sum(axis=1)
+        if progress is not None:
+            progress((done + size) / draws)
+    return out
+
+
+def _run_pool(inputs, draws, seeds, progress=None):
+    """``_run`` split into tasks on the process pool. A future that is already
+    running cannot be cancelled, so tasks are submitted as others finish and
+    ``progress`` (which raises once the job is cancelled) runs in between."""
+    task_draws = max(MIN_CHUNK_DRAWS, POOL_TASK_ELEMENTS // len(inputs[1]))
+    sizes = [min(task_draws, draws - start) for start in range(0, draws, task_draws)]
+    # Popped from the end, so reversed to submit in order
+    tasks = list(zip(sizes, seeds.spawn(len(sizes))))[::-1]
+    pool = _pool()
+    parts = []
+    running = set()
+    done_draws = 0
+    try:
+        while tasks or running:
+            while tasks and len(running) < POOL_WORKERS:
+                size, seed = tasks.pop()
+                running.add(pool.submit(_run, inputs, size, seed))
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                part = future.result()
+                parts.append(part)
+                done_draws += part['draws']
+            if progress is not None:
+                progress(done_draws / draws)
+    finally:
+        for future in running:
+            future.cancel()
+    return _merge(parts)
+
+
+def _merge(parts):
+    merged = dict(parts[0])
+    for part in parts[1:]:
+        for key, value in part.items():
+            merged[key] = merged[key] + value
+    return merged
+
+
+def _band(mean, national_loadings, local_loadings, scenario):
+    """Closed-form 5-95% band of ``mean + loadings . swing + local noise``, in %."""
+    sd = np.sqrt((scenario.national_sd / 100) ** 2 * (national_loadings ** 2).sum(axis=1)
+                 + (scenario.local_sd / 100) ** 2 * local_loadings)
+    mean = mean.astype(np.float64)
+    return np.clip(mean - BAND_Z * sd, 0, 1) * 100, np.clip(mean + BAND_Z * sd, 0, 1) * 100
+
+
+@st.cache_resource(show_spinner=False)
+def _pool():
+    # Spawned rather than forked: the server process runs other threads
+    return ProcessPoolExecutor(max_workers=POOL_WORKERS,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+def unit_categories(dataset):
+    """``(units x CATEGORIES)`` matrix: does the unit have a strategy in the category."""
+    index = get_index(dataset)
+    has = np.zeros((len(dataset.df), len(CATEGORIES)), dtype=bool)
+    columns = [index.categories.index(category) for category in CATEGORIES]
+    for unit, (start, end) in index.unit_docs.items():
+        position = dataset.unit_positions.get(unit)
+        if position is not None and end > start:
+            has[position] = index.doc_categories[start:end, columns].any(axis=0)
+    return has
+
+
+def _unit_weights(dataset):
+    if 'Population' in dataset.df.columns:
+        return dataset.df['Population'].to_numpy(dtype=np.float64)
+    return np.ones(len(dataset.df))
+
+
+def draws_for(n_units, scenario):
+    if scenario.draws:
+        return scenario.draws
+    return int(np.clip(SAMPLE_BUDGET // max(n_units, 1), MIN_DRAWS, MAX_DRAWS))
+
+
+def run_simulation(dataset, scenario, progress=None):
+    """Run ``scenario`` against ``dataset``, reporting the fraction of draws
+    done to ``progress`` if given."""
+    start = time.perf_counter()
+    df = dataset.df
+    # Units grouped by province so province totals are contiguous reductions
+    order = np.argsort(df['Province'].cat.codes.to_numpy(), kind='stable')
+    provinces = df['Province'].to_numpy()[order].astype(str)
+    province_starts = np.flatnonzero(np.r_[True, provinces[1:] != provinces[:-1]])
+    province_names = provinces[province_starts]
+
+    shares = (df[RELIGIONS].to_numpy(dtype=np.float32)[order] / 100)
+    support = np.asarray(scenario.support, dtype=np.float32) / 100
+    base = shares @ support
+    if any(scenario.uplift):
+        uplift = unit_categories(dataset)[order] @ np.asarray(scenario.uplift, dtype=np.float32)
+        base = base + uplift.astype(np.float32) / 100
+
+    weights = _unit_weights(dataset)[order]
+    province_index = np.repeat(np.arange(len(province_starts)), np.diff(np.r_[province_starts, len(order)]))
+    province_weights = np.zeros((len(province_starts), len(order)), dtype=np.float32)
+    province_weights[province_index, np.arange(len(order))] = weights
+    province_weights /= province_weights.sum(axis=1, keepdims=True)
+
+    inputs = (shares, base.astype(np.float32), province_starts, province_weights,
+              np.float32(scenario.national_sd / 100), np.float32(scenario.local_sd / 100))
+    draws = draws_for(len(order), scenario)
+    seeds = np.random.SeedSequence(scenario.seed(dataset.version))
+    with span('simulator.run'):
+        if len(order) * draws > POOL_THRESHOLD and POOL_WORKERS > 1:
+            totals = _run_pool(inputs, draws, seeds, progress)
+        else:
+            totals = _run(inputs, draws, seeds, progress)
+
+    n_units = len(order)
+    win_probability = totals['wins'] / draws
+    unit_low, unit_high = _band(base, shares, np.ones(n_units), scenario)
+    province_low, province_high = _band(province_weights @ base, province_weights @ shares,
+                                        (province_weights ** 2).sum(axis=1), scenario)
+    units = pd.DataFrame({
+        'Unit': df['Unit'].to_numpy()[order],
+        'District': df['District'].to_numpy()[order],
+        'Province': provinces,
+        'Expected Vote %': totals['vote_sum'] / draws * 100,
+        'Vote % P5': unit_low,
+        'Vote % P95': unit_high,
+        'Win Probability': win_probability,
+    })
+    provinces_frame = pd.DataFrame({
+        'Province': province_names,
+        'Units': np.diff(np.r_[province_starts, n_units]),
+        'Expected Vote %': totals['province_vote_sum'] / draws * 100,
+        'Vote % P5': province_low,
+        'Vote % P95': province_high,
+        'Win Probability': totals['province_wins'] / draws,
+        'Expected Seats': np.add.reduceat(win_probability, province_starts),
+    })
+    return SimulationResult(units=units.round(3), provinces=provinces_frame.round(3),
+                            seat_distribution=totals['seats'] / draws, draws=draws,
+                            seconds=time.perf_counter() - start)
+
+
+@versioned_cache(max_entries=SCENARIO_CACHE_SIZE, show_spinner=False)
+def _simulate(version, scenario, _dataset, _progress=None):
+    return run_simulation(_dataset, scenario, _progress)
+
+
+def simulate(dataset, scenario=Scenario(), progress=None):
+    """Memoized :func:`run_simulation`, shared by every session."""
+    return _simulate(dataset.version, scenario, dataset, progress)
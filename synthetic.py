@@ -0,0 +1,203 @@
+"""Synthetic datasets for benchmarking the dashboard at larger scales.
+
+Units are spread over the real 25 districts, with religion shares drawn around
+each district's own composition, so aggregates and charts look plausible at
+district (25), polling-division (~160) and GN-division (~14,000) scale.
+
+Written files are named after ``GENERATOR_VERSION``, a hash of this module and
+the sample data it draws from, so files from an older generator (missing a
+table or column added since) are never reused. Each file is written under a
+temporary name and moved into place, so an interrupted write leaves nothing
+that looks finished. A file missing any table or column in ``REQUIRED`` (such
+as ``Population``, which the population-weighted aggregates need) is written
+again.
+"""
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from loaders import LEVELS
+from metrics import RELIGIONS
+from sample_data import districts_data, strategies_data
+
+# Administrative level used for each benchmark scale
+SCALE_LEVELS = {25: 'district', 160: 'polling_division', 14000: 'gn_division'}
+
+# Earlier censuses and past elections in the synthetic history; the 2001
+# census left out the Northern Province, so its units have no 2001 row
+HISTORY_CENSUS_YEARS = (1981, 2001)
+HISTORY_ELECTION_YEARS = (2010, 2015, 2020)
+
+# Tables and columns every synthetic SQLite source must have
+REQUIRED = {'demographics': ('District', 'Province', 'Population', *RELIGIONS), 'strategies': ('Unit', 'Strategy'),
+            'history': ('Year',)}
+
+GENERATOR_VERSION = hashlib.sha256(b''.join(
+    (Path(__file__).parent / name).read_bytes() for name in ('synthetic.py', 'sample_data.py'))).hexdigest()[:8]
+
+
+def level_for(n_units):
+    for scale, level in sorted(SCALE_LEVELS.items()):
+        if n_units <= scale:
+            return level
+    return 'gn_division'
+
+
+def make_frames(n_units, seed=0):
+    """Return ``(demographics, strategies)`` frames with ``n_units`` rows."""
+    rng = np.random.default_rng(seed)
+    level = level_for(n_units)
+    unit_column = LEVELS[level]
+    districts = list(districts_data)
+
+    parent = np.resize(np.arange(len(districts)), n_units)
+    base = np.array([[districts_data[d].get(r, 0.0) for r in RELIGIONS] for d in districts])
+    # Dirichlet draws centred on the parent district's shares
+    alpha = (base[parent] + 0.5) * 0.5
+    draws = rng.gamma(alpha)
+    shares = draws / draws.sum(axis=1, keepdims=True) * 100
+
+    if level == 'district' and n_units <= len(districts):
+        names = districts[:n_units]
+    else:
+        names = [f"{districts[p]} {i:05d}" for i, p in enumerate(parent)]
+
+    # At district level the unit column is the District column itself
+    demographics = pd.DataFrame({
+        'District': [districts[p] for p in parent],
+        unit_column: names,
+        'Province': [districts_data[districts[p]]['Province'] for p in parent],
+    })
+    for i, religion in enumerate(RELIGIONS):
+        demographics[religion] = shares[:, i].round(2)
+    # Each district's census population split unevenly over its units
+    size = rng.lognormal(0, 0.5, n_units)
+    district_population = np.array([districts_data[d]['Population'] for d in districts], dtype=np.float64)
+    demographics['Population'] = np.maximum(
+        district_population[parent] * size / np.bincount(parent, weights=size)[parent], 1).round().astype(np.int64)
+
+    texts = [text for items in strategies_data.values() for text in items]
+    per_unit = rng.integers(0, 4, n_units)
+    strategies = pd.DataFrame({
+        'Unit': np.repeat(names, per_unit),
+        'Strategy': rng.choice(texts, per_unit.sum()),
+    })
+    return demographics, strategies
+
+
+def make_history(demographics, unit_column, seed=0):
+    """Return a long-format history frame for ``demographics``: religion shares
+    drifting back from the current (2012) ones at each earlier census, and
+    turnout and vote share at each past election."""
+    rng = np.random.default_rng(seed)
+    units = demographics[unit_column].to_numpy()
+    shares = demographics[RELIGIONS].to_numpy(dtype=np.float64)
+    northern = (demographics['Province'] == 'Northern').to_numpy()
+
+    frames = []
+    for year in HISTORY_CENSUS_YEARS:
+        drift = rng.normal(0, 0.15 * (2012 - year), shares.shape)
+        past = np.clip(shares + drift, 0, None)
+        past = past / past.sum(axis=1, keepdims=True) * 100
+        keep = ~northern if year == 2001 else np.ones(len(units), dtype=bool)
+        frame = pd.DataFrame({unit_column: units[keep], 'Year': year})
+        for i, religion in enumerate(RELIGIONS):
+            frame[religion] = past[keep, i].round(2)
+        frames.append(frame)
+    for year in HISTORY_ELECTION_YEARS:
+        frames.append(pd.DataFrame({
+            unit_column: units,
+            'Year': year,
+            'Turnout %': rng.uniform(55, 85, len(units)).round(1),
+            'UNP %': np.clip(rng.normal(40 - (year - 2010) * 1.5, 8, len(units)), 1, 95).round(1),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_activity(demographics, strategies, n_events, days=90, seed=0, end=None):
+    """Return ``n_events`` field activity reports (see ``activity``) spread
+    over the ``days`` days up to ``end`` (default today) and over the units of
+    ``demographics``; events name one of the unit's ``strategies`` if it has any."""
+    rng = np.random.default_rng(seed)
+    units = demographics['Unit'].to_numpy()
+    end = pd.Timestamp(end or pd.Timestamp.now().normalize()) + pd.Timedelta(days=1)
+    unit = rng.integers(0, len(units), n_events)
+    kind = rng.choice(np.array(['door_knock', 'event', 'response']), n_events, p=[0.6, 0.15, 0.25])
+    seconds = rng.integers(0, days * 86400, n_events)
+    frame = pd.DataFrame({
+        'Time': (end - pd.to_timedelta(seconds, unit='s')).strftime('%Y-%m-%dT%H:%M:%S'),
+        'Unit': units[unit],
+        'Kind': kind,
+        'Count': np.where(kind == 'door_knock', rng.integers(1, 60, n_events), 1),
+        'Attendees': np.where(kind == 'event', rng.integers(10, 300, n_events), 0),
+        'Hours': np.where(kind == 'response', rng.lognormal(2.3, 0.9, n_events).round(1), np.nan),
+    })
+    # Each event names a random strategy of its unit
+    counts = np.array([len(strategies.get(name, ())) for name in units])
+    texts = np.array([text for name in units for text in strategies.get(name, ())], dtype=object)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    named = (kind == 'event') & (counts[unit] > 0)
+    picks = starts[unit[named]] + (rng.random(named.sum()) * counts[unit[named]]).astype(np.int64)
+    frame['Strategy'] = None
+    frame.loc[named, 'Strategy'] = texts[picks]
+    return frame
+
+
+def _complete(path):
+    if not path.exists():
+        return False
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        for table, columns in REQUIRED.items():
+            present = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+            if not present.issuperset(columns):
+                return False
+    finally:
+        conn.close()
+    return True
+
+
+def _partial(path):
+    return path.with_name(f'{path.name}.{os.getpid()}.tmp')
+
+
+def write_activity(n_units, out_dir, seed=0, events=100_000):
+    """Write field activity reports for the ``n_units`` dataset as JSON lines
+    and return the path."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f'activity_{n_units}_{seed}_{events}_{GENERATOR_VERSION}.jsonl'
+    if not path.exists():
+        demographics, strategies = make_frames(n_units, seed)
+        units = demographics[LEVELS[level_for(n_units)]].rename('Unit').to_frame()
+        by_unit = strategies.groupby('Unit')['Strategy'].apply(list).to_dict()
+        partial = _partial(path)
+        make_activity(units, by_unit, events, seed=seed).to_json(partial, orient='records', lines=True,
+                                                                 force_ascii=False)
+        os.replace(partial, path)
+    return path
+
+
+def write_sqlite(n_units, out_dir, seed=0):
+    """Write a synthetic SQLite source and return ``(path, level)``."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f'synthetic_{n_units}_{seed}_{GENERATOR_VERSION}.sqlite'
+    if not _complete(path):
+        demographics, strategies = make_frames(n_units, seed)
+        partial = _partial(path)
+        partial.unlink(missing_ok=True)
+        conn = sqlite3.connect(partial)
+        try:
+            with conn:
+                demographics.to_sql('demographics', conn, index=False)
+                strategies.to_sql('strategies', conn, index=False)
+                make_history(demographics, LEVELS[level_for(n_units)], seed).to_sql('history', conn, index=False)
+        finally:
+            conn.close()
+        os.replace(partial, path)
+    return path, level_for(n_units)
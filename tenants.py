@@ -0,0 +1,239 @@
+"""Several tenants served by one dashboard process.
+
+``ELECTION_TENANTS`` names a JSON file of tenants, each with its own data:
+
+    {"western": {"title": "Western Province team", "demographics": "data/western.sqlite",
+                 "level": "polling_division", "colors": {"Buddhist": "#F2A900"},
+                 "brand_colors": ["#1F4E9C", "#F2A900", "#FFFFFF"]},
+     "north": {"demographics": "data/north.csv", "strategies": "data/north_strategies.csv",
+               "history": "data/north_history.parquet"}}
+
+``colors`` overrides the religion colors of the charts and ``brand_colors``
+the palette shown on the messaging tab. A page picks its tenant with
+``?tenant=<id>``. Without one it gets ``default``,
+the source described by the other ``ELECTION_*`` variables (unless the file
+defines ``default`` itself).
+
+Every process-wide cache is keyed by the data version, so the version is the
+tenant's cache namespace: datasets, derived indexes, scenario and plan results
+and figures of one tenant never serve another. Tenants configured with the
+same data share one namespace.
+
+The registry records each tenant's requests, how many found its data already
+loaded, when it was last used and the bytes its namespace holds. When the
+namespaces together hold more than ``ELECTION_TENANT_MEMORY_MB``, those of the
+least recently used tenants idle for ``ELECTION_TENANT_IDLE_SECONDS`` are
+evicted until they fit. The requesting tenant is never evicted; an evicted
+tenant's next request rebuilds its data. The live results feed and the field
+activity log report on the default tenant's units and only show on its pages.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+import streamlit as st
+
+from data_layer import evict_version, get_dataset, namespace_bytes, namespace_loaded
+from figures import drop_figures, figure_cache
+from jobs import job_queue
+from loaders import LEVELS, SQLITE_SUFFIXES, DataSource, SchemaError, source_from_env, source_version
+from metrics import RELIGIONS
+
+logger = logging.getLogger(__name__)
+
+TENANTS_PATH = os.environ.get('ELECTION_TENANTS') or None
+MEMORY_MB = float(os.environ.get('ELECTION_TENANT_MEMORY_MB', '1024'))
+IDLE_SECONDS = float(os.environ.get('ELECTION_TENANT_IDLE_SECONDS', '60'))
+
+DEFAULT_TENANT = 'default'
+
+BRAND_COLORS = ('#2FDF10', '#ECEC25', '#FFFFFF')
+
+
+@dataclass(frozen=True)
+class Tenant:
+    id: str
+    title: str
+    source: DataSource
+    # (religion, color) overrides of the chart colors
+    colors: tuple = ()
+    brand_colors: tuple = BRAND_COLORS
+
+
+def _tenant(tenant_id, config):
+    demographics = config.get('demographics')
+    strategies = config.get('strategies')
+    if strategies is None and demographics and os.path.splitext(demographics)[1].lower() in SQLITE_SUFFIXES:
+        strategies = demographics
+    level = config.get('level', 'district')
+    if level not in LEVELS:
+        raise SchemaError(f"Tenant {tenant_id!r} has unknown level {level!r}; expected one of {sorted(LEVELS)}")
+    colors = config.get('colors', {})
+    unknown = sorted(set(colors) - set(RELIGIONS))
+    if unknown:
+        raise SchemaError(f"Tenant {tenant_id!r} has colors for unknown religions {unknown}; expected {RELIGIONS}")
+    return Tenant(id=tenant_id, title=config.get('title', tenant_id),
+                  source=DataSource(demographics=demographics, strategies=strategies, level=level,
+                                    history=config.get('history')),
+                  colors=tuple(sorted(colors.items())),
+                  brand_colors=tuple(config.get('brand_colors', BRAND_COLORS)))
+
+
+def load_tenants(path=TENANTS_PATH):
+    """Tenants by id: ``default`` from the environment plus those in ``path``."""
+    tenants = {DEFAULT_TENANT: Tenant(id=DEFAULT_TENANT, title=DEFAULT_TENANT, source=source_from_env())}
+    if path is not None:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        for tenant_id, entry in config.items():
+            tenants[tenant_id] = _tenant(tenant_id, entry)
+    return tenants
+
+
+class TenantStats:
+    def __init__(self):
+        self.version = None
+        self.requests = 0
+        self.hits = 0
+        self.last_access = None
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.requests if self.requests else None
+
+
+class TenantRegistry:
+    """Per-tenant usage and the process-wide memory cap over their namespaces."""
+
+    def __init__(self, tenants, memory_mb=MEMORY_MB, idle_seconds=IDLE_SECONDS):
+        self.tenants = tenants
+        self.cap = memory_mb * 2**20
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._stats = {tenant_id: TenantStats() for tenant_id in tenants}
+        self.evicted_bytes = 0
+
+    def dataset(self, tenant):
+        """The tenant's dataset, recording the request and enforcing the cap."""
+        version = source_version(tenant.source)
+        hit = namespace_loaded(version)
+        dataset = get_dataset(tenant.source)
+        with self._lock:
+            stats = self._stats[tenant.id]
+            stats.version = version
+            stats.requests += 1
+            stats.hits += hit
+            stats.last_access = time.time()
+        self.enforce(version)
+        return dataset
+
+    @staticmethod
+    def namespace_size(version):
+        return namespace_bytes(version) + figure_cache().version_stats(version)[1]
+
+    def enforce(self, keep):
+        """Evict idle namespaces, least recently used first, until the loaded
+        ones fit the cap. ``keep`` (the requesting tenant's version) stays."""
+        with self._lock:
+            last_access = {}
+            for stats in self._stats.values():
+                if stats.version is not None and namespace_loaded(stats.version):
+                    last_access[stats.version] = max(last_access.get(stats.version, 0), stats.last_access)
+        sizes = {version: self.namespace_size(version) for version in last_access}
+        total = sum(sizes.values())
+        if total <= self.cap:
+            return
+        cutoff = time.time() - self.idle_seconds
+        for version in sorted(last_access, key=last_access.get):
+            if total <= self.cap:
+                return
+            if version == keep or last_access[version] > cutoff:
+                continue
+            self.evict(version)
+            total -= sizes[version]
+        if total > self.cap:
+            logger.warning("Tenant data holds %.0f MB, over the %.0f MB cap, with no idle tenant left to evict",
+                           total / 2**20, self.cap / 2**20)
+
+    def evict(self, version):
+        """Drop every cache entry of ``version``."""
+        nbytes = self.namespace_size(version)
+        evict_version(version)
+        drop_figures(version)
+        job_queue().drop_version(version)
+        with self._lock:
+            self.evicted_bytes += nbytes
+            owners = [tenant_id for tenant_id, stats in self._stats.items() if stats.version == version]
+            for tenant_id in owners:
+                self._stats[tenant_id].evictions += 1
+        logger.info("Evicted %s (%.1f MB) for tenants %s", version, nbytes / 2**20, ', '.join(owners))
+
+    def report(self):
+        """One row per tenant: requests, hit rates, memory and evictions."""
+        with self._lock:
+            stats = {tenant_id: vars(s).copy() | {'hit_rate': s.hit_rate} for tenant_id, s in self._stats.items()}
+        rows = []
+        for tenant_id, s in stats.items():
+            version = s['version']
+            loaded = version is not None and namespace_loaded(version)
+            figures, figure_bytes, figure_hits, figure_misses = (figure_cache().version_stats(version)
+                                                                 if version is not None else (0, 0, 0, 0))
+            figure_requests = figure_hits + figure_misses
+            rows.append({
+                'Tenant': tenant_id,
+                'Loaded': loaded,
+                'Requests': s['requests'],
+                'Data hit %': round(100 * s['hit_rate'], 1) if s['hit_rate'] is not None else None,
+                'Figure hit %': round(100 * figure_hits / figure_requests, 1) if figure_requests else None,
+                'Figures': figures,
+                'MB': round((namespace_bytes(version) + figure_bytes) / 2**20, 1) if loaded else 0.0,
+                'Evictions': s['evictions'],
+                'Idle s': round(time.time() - s['last_access']) if s['last_access'] else None,
+            })
+        return pd.DataFrame(rows)
+
+    def total_bytes(self):
+        with self._lock:
+            versions = {s.version for s in self._stats.values() if s.version is not None}
+        return sum(self.namespace_size(version) for version in versions if namespace_loaded(version))
+
+
+@st.cache_resource
+def tenant_registry():
+    return TenantRegistry(load_tenants())
+
+
+def current_tenant():
+    """The tenant named by ``?tenant=``, or the default one; stops the page for an unknown id."""
+    tenants = tenant_registry().tenants
+    tenant_id = st.query_params.get('tenant', DEFAULT_TENANT)
+    if tenant_id not in tenants:
+        st.error(f"Unknown tenant {tenant_id!r}.")
+        st.stop()
+    return tenants[tenant_id]
+
+
+def get_tenant_dataset(tenant):
+    return tenant_registry().dataset(tenant)
+
+
+def show_tenant_stats(tenant):
+    """Sidebar line for ``tenant``; every tenant's row in the debug sidebar (``?debug=1``)."""
+    registry = tenant_registry()
+    if len(registry.tenants) == 1:
+        return
+    report = registry.report().set_index('Tenant')
+    row = report.loc[tenant.id]
+    hit_rate = f"{row['Data hit %']:.0f}%" if pd.notna(row['Data hit %']) else "n/a"
+    st.sidebar.caption(f"Tenant {tenant.title}: {row['MB']:.1f} MB, data hit rate {hit_rate} · "
+                       f"all tenants {registry.total_bytes() / 2**20:.1f} of {registry.cap / 2**20:g} MB")
+    if st.query_params.get('debug') != '1':
+        return
+    with st.sidebar.expander("Debug: tenants"):
+        st.dataframe(report, use_container_width=True)
+        st.caption(f"Evicted so far: {registry.evicted_bytes / 2**20:.1f} MB")
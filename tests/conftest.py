@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_layer import get_dataset  # noqa: E402
+from loaders import DataSource  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def dataset():
+    """The built-in 25 districts."""
+    return get_dataset(DataSource())
+
+
+@pytest.fixture(scope='session')
+def synthetic_dataset(tmp_path_factory):
+    """160 synthetic polling divisions with a Population column."""
+    from synthetic import write_sqlite
+
+    path, level = write_sqlite(160, tmp_path_factory.mktemp('synthetic'))
+    return get_dataset(DataSource(demographics=str(path), strategies=str(path), level=level))
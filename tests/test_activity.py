@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from activity import ActivityLog, DropFolder, Resolver
+
+
+def _report(unit, day, count=1):
+    return json.dumps({'Time': f'2026-10-{day:02d}T10:00:00', 'Unit': unit, 'Kind': 'door_knock',
+                       'Count': count}) + '\n'
+
+
+def _knocks(log):
+    return int(log.rollup(90, ('district',))['door_knocks'].sum())
+
+
+@pytest.fixture
+def drop(dataset, tmp_path):
+    folder = tmp_path / 'reports'
+    folder.mkdir()
+    log = ActivityLog(tmp_path / 'activity.db')
+    return DropFolder(folder, log, Resolver(dataset))
+
+
+def test_unknown_unit_holds_the_rest_of_the_file(drop):
+    path = drop.folder / 'field.jsonl'
+    path.write_text(_report('Colombo', 1, 10) + _report('Newtown', 2, 20) + _report('Kandy', 3, 30))
+    assert drop.ingest(path) == 1
+    assert drop.log.offset(str(path.resolve())) == len(_report('Colombo', 1, 10))
+    assert _knocks(drop.log) == 10
+
+    # Still held on the next poll, also after more reports arrive
+    with open(path, 'a') as f:
+        f.write(_report('Galle', 4, 40))
+    assert drop.ingest(path) == 0 and _knocks(drop.log) == 10
+
+    # Data that has the unit is loaded: the held reports are read, once each
+    drop.resolver.districts['Newtown'] = 'Colombo'
+    assert drop.ingest(path) == 3
+    assert _knocks(drop.log) == 100
+    assert drop.log.offset(str(path.resolve())) == path.stat().st_size
+    assert drop.ingest(path) == 0 and _knocks(drop.log) == 100
+
+
+def test_restart_resumes_from_the_committed_offset(drop, dataset):
+    path = drop.folder / 'field.jsonl'
+    path.write_text(_report('Colombo', 1, 1) + _report('Kandy', 2, 2))
+    assert drop.ingest(path) == 2
+
+    # A partly written line waits until it is complete
+    with open(path, 'a') as f:
+        f.write(_report('Galle', 3, 4) + _report('Matara', 4, 8)[:-10])
+    assert drop.ingest(path) == 1 and _knocks(drop.log) == 7
+
+    # Another process (or a restart) opens the same log and folder
+    restarted = DropFolder(drop.folder, ActivityLog(drop.log.path), Resolver(dataset))
+    assert restarted.ingest(path) == 0
+    with open(path, 'a') as f:
+        f.write(_report('Matara', 4, 8)[-10:])
+    assert restarted.ingest(path) == 1
+    assert drop.ingest(path) == 0
+    assert _knocks(restarted.log) == 15
+
+
+def test_invalid_reports_are_rejected_not_held(drop):
+    path = drop.folder / 'field.jsonl'
+    path.write_text('not json\n' + json.dumps({'Unit': 'Colombo', 'Kind': 'door_knock'}) + '\n'
+                    + _report('Colombo', 1, 5))
+    assert drop.ingest(path) == 1
+    assert drop.log.rejected == 2 and _knocks(drop.log) == 5
+    assert drop.log.offset(str(path.resolve())) == path.stat().st_size
+
+
+def test_csv_reports(drop):
+    path = drop.folder / 'field.csv'
+    path.write_text('Time,Unit,Kind,Count\n2026-10-01T09:00:00,Colombo,door_knock,3\n'
+                    '2026-10-01T09:30:00,Nowhere,door_knock,4\n')
+    assert drop.ingest(path) == 1 and _knocks(drop.log) == 3
+    drop.resolver.districts['Nowhere'] = 'Kandy'
+    assert drop.ingest(path) == 1 and _knocks(drop.log) == 7
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from aggregates import INCREMENTAL_MAX_ROWS, LEVEL_NAMES, AggregateCube
+from metrics import RELIGIONS
+
+
+def _assert_same_levels(patched, rebuilt):
+    for name in LEVEL_NAMES:
+        a, b = patched.levels[name], rebuilt.levels[name]
+        np.testing.assert_array_equal(a.names, b.names)
+        np.testing.assert_array_equal(a.units, b.units)
+        for field in ('population', 'people', 'share_sums'):
+            np.testing.assert_allclose(getattr(a, field), getattr(b, field), rtol=1e-9, err_msg=f'{name}.{field}')
+        np.testing.assert_allclose(a.means(), b.means(), rtol=1e-9, equal_nan=True)
+
+
+def _changed(df, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    shares = (rng.dirichlet(np.ones(len(RELIGIONS)), len(rows)) * 100).astype(df[RELIGIONS[0]].dtype)
+    df.loc[df.index[rows], RELIGIONS] = shares
+    if 'Population' in df.columns:
+        df.loc[df.index[rows], 'Population'] = rng.integers(100, 10_000, len(rows))
+    return df
+
+
+@pytest.mark.parametrize('name', ['dataset', 'synthetic_dataset'])
+def test_patch_matches_full_rebuild(name, request):
+    df = request.getfixturevalue(name).df
+    base = AggregateCube(df)
+    changed = _changed(df, [0, 3, len(df) - 1])
+    patched = AggregateCube(changed, base)
+    assert patched.patched_rows == 3
+    _assert_same_levels(patched, AggregateCube(changed))
+    # A second patch on top of the first
+    again = _changed(changed, [1, 3], seed=1)
+    _assert_same_levels(AggregateCube(again, patched), AggregateCube(again))
+
+
+def test_unchanged_reload_patches_nothing(synthetic_dataset):
+    df = synthetic_dataset.df
+    cube = AggregateCube(df, AggregateCube(df))
+    assert cube.patched_rows == 0
+    _assert_same_levels(cube, AggregateCube(df))
+
+
+def test_rebuilds_when_the_hierarchy_or_too_many_rows_change(synthetic_dataset):
+    df = synthetic_dataset.df
+    base = AggregateCube(df)
+    moved = df.copy()
+    moved['District'] = moved['District'].astype(str)
+    moved.loc[moved.index[0], 'District'] = moved['District'].iloc[-1]
+    assert AggregateCube(moved, base).patched_rows is None
+    assert AggregateCube(df.drop(columns='Population'), base).patched_rows is None
+
+    many = _changed(df, np.arange(len(df)))
+    cube = AggregateCube(many, base)
+    assert (cube.patched_rows is None) == (len(df) > INCREMENTAL_MAX_ROWS)
+    _assert_same_levels(cube, AggregateCube(many))
@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import http.client
+import json
+import threading
+from http import HTTPStatus
+
+import pytest
+
+from api import PREFIX, Api, make_server
+
+
+@pytest.fixture(scope='module')
+def api():
+    return Api()
+
+
+@pytest.fixture(scope='module')
+def server(api):
+    server = make_server('127.0.0.1', 0, api)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get(server, path, **headers):
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_etag_names_the_normalized_request(api):
+    first, etag = api.handle(f'{PREFIX}/units?province=Eastern,Northern')
+    second, same = api.handle(f'{PREFIX}/units?province=Eastern&province=Northern')
+    assert first.status == HTTPStatus.OK and etag == same and second is first
+    _, other = api.handle(f'{PREFIX}/units?province=Eastern')
+    assert other != etag
+
+
+def test_if_none_match_returns_not_modified(api):
+    _, etag = api.handle(f'{PREFIX}/provinces')
+    response, same = api.handle(f'{PREFIX}/provinces', if_none_match=f'W/"other", {etag}')
+    assert response is None and same == etag
+    response, _ = api.handle(f'{PREFIX}/provinces', if_none_match='W/"other"')
+    assert response.status == HTTPStatus.OK
+
+
+def _etag(api, path, query=()):
+    # The ETag a successful response for this request would carry
+    digest = hashlib.sha1(repr((path, query)).encode()).hexdigest()[:12]
+    return f'W/"{api.dataset().version}-{digest}"'
+
+
+def test_invalid_requests_never_answer_not_modified(api):
+    requests = [(f'{PREFIX}/nowhere', ()), (f'{PREFIX}/units/No Such Unit', ()),
+                (f'{PREFIX}/units', (('fields', ('Nope',)),))]
+    for path, query in requests:
+        target = path + ''.join(f'?{name}={",".join(values)}' for name, values in query)
+        response, etag = api.handle(target)
+        assert response.status != HTTPStatus.OK and etag is None
+        response, _ = api.handle(target, if_none_match=_etag(api, path, query))
+        assert response is not None and response.status != HTTPStatus.OK
+    # The helper does build the ETag of a valid request
+    _, etag = api.handle(f'{PREFIX}/meta')
+    assert etag == _etag(api, f'{PREFIX}/meta')
+
+
+def test_http_304_and_gzip(server):
+    response, body = _get(server, f'{PREFIX}/units')
+    assert response.status == 200 and response.getheader('Content-Encoding') is None
+    etag = response.getheader('ETag')
+    units = json.loads(body)
+
+    response, zipped = _get(server, f'{PREFIX}/units', **{'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert len(zipped) < len(body) and json.loads(gzip.decompress(zipped)) == units
+
+    response, body = _get(server, f'{PREFIX}/units', **{'If-None-Match': etag})
+    assert response.status == 304 and body == b'' and response.getheader('ETag') == etag
+
+    response, _ = _get(server, f'{PREFIX}/nowhere', **{'If-None-Match': etag})
+    assert response.status == 404
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_layer import VersionedCache, _freeze
+
+
+def test_freeze_rejects_in_place_writes():
+    frame = _freeze(pd.DataFrame({'a': [1.0, 2.0], 'b': [3, 4], 'c': pd.Categorical(['x', 'y'])}))
+    with pytest.raises(ValueError):
+        frame.loc[0, 'a'] = 9.0
+    with pytest.raises(ValueError):
+        frame.iloc[0, 1] = 9
+    with pytest.raises(ValueError):
+        frame['a'].to_numpy()[0] = 9.0
+    assert frame['a'].tolist() == [1.0, 2.0]
+    assert frame['b'].tolist() == [3, 4]
+
+
+def test_freeze_leaves_the_source_and_copies_writable():
+    source = pd.DataFrame({'a': [1.0, 2.0]}, index=[5, 6])
+    frame = _freeze(source)
+    source.loc[5, 'a'] = 0.0
+    assert frame['a'].tolist() == [1.0, 2.0]
+    assert frame.index.tolist() == [5, 6]
+    copy = frame.copy()
+    copy.loc[5, 'a'] = 7.0
+    assert copy.loc[5, 'a'] == 7.0
+
+
+
+def test_versioned_cache_trims_across_versions():
+    calls = []
+
+    def build(version, x):
+        calls.append(version)
+        return np.zeros(4)
+
+    cache = VersionedCache(build, max_entries=2, nbytes=lambda result: 10)
+    for version in 'abc':
+        cache(version, 1)
+    assert [version for version in 'abc' if cache.holds(version)] == ['b', 'c']
+    assert cache.nbytes('a') == 0 and cache.nbytes('c') == 10
+    cache('b', 1)
+    cache('a', 1)
+    assert [version for version in 'abc' if cache.holds(version)] == ['a', 'b']
+    assert calls == ['a', 'b', 'c', 'a']
+    cache.evict('a')
+    assert not cache.holds('a')
+    cache.clear()
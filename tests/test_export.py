@@ -0,0 +1,47 @@
+import json
+
+from export import slugify, unit_slugs
+
+
+def test_unit_slugs_are_unique():
+    units = ['Kandy', 'KANDY', 'Nuwara Eliya', 'கண்டி', 'மன்னார்', 'මහනුවර']
+    slugs = unit_slugs(units)
+    assert len(set(slugs.values())) == len(units)
+    assert slugs['Nuwara Eliya'] == 'nuwara-eliya'
+    assert slugs['Kandy'].startswith('kandy-') and slugs['கண்டி'].startswith('unit-')
+
+
+def test_unit_slugs_do_not_depend_on_other_units():
+    assert unit_slugs(['கண்டி', 'මහනුවර'])['கண்டி'] == unit_slugs(['கண்டி', 'x', 'மன்னார்'])['கண்டி']
+    assert unit_slugs(['Kandy'])['Kandy'] == slugify('Kandy')
+
+
+def test_export_skips_packs_whose_inputs_are_unchanged(dataset, tmp_path, monkeypatch):
+    import export
+
+    assert export.export(dataset, tmp_path, workers=1) == (25, 0)
+    manifest = json.loads((tmp_path / export.MANIFEST).read_text())
+    page = tmp_path / manifest['Colombo']['files'][0]
+    written = page.stat().st_mtime_ns
+    assert export.export(dataset, tmp_path, workers=1) == (0, 25)
+    assert page.stat().st_mtime_ns == written
+
+    # One unit's inputs change: only its pack is rendered again
+    original = export.pack_inputs
+
+    def changed(dataset):
+        packs = original(dataset)
+        packs['Colombo'] = packs['Colombo'] | {'strategies': ['A new strategy'], 'categories': [()]}
+        return packs
+
+    monkeypatch.setattr(export, 'pack_inputs', changed)
+    assert export.export(dataset, tmp_path, workers=1) == (1, 24)
+    assert 'A new strategy' in page.read_text(encoding='utf-8')
+    monkeypatch.setattr(export, 'pack_inputs', original)
+
+    # Colombo's inputs are back as they were, and Kandy's page is missing
+    (tmp_path / json.loads((tmp_path / export.MANIFEST).read_text())['Kandy']['files'][0]).unlink()
+    assert export.export(dataset, tmp_path, workers=1) == (2, 23)
+    # Other options, or --force, render every pack
+    assert export.export(dataset, tmp_path, workers=1, inline_js=True) == (25, 0)
+    assert export.export(dataset, tmp_path, workers=1, inline_js=True, force=True) == (25, 0)
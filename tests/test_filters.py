@@ -0,0 +1,67 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from filters import DIVERSITY_STEP, DIVERSITY_STEPS, Filters, get_filter_index, pack
+from metrics import RELIGIONS
+
+
+def _boolean(metrics, filters):
+    # The row mask the filters keep, straight from the metrics frame
+    keep = np.ones(len(metrics), dtype=bool)
+    if filters.provinces:
+        keep &= metrics['Province'].astype(str).isin(filters.provinces).to_numpy()
+    if filters.religions:
+        keep &= metrics['Majority Religion'].astype(str).isin(filters.religions).to_numpy()
+    if filters.has_strategy is not None:
+        keep &= (metrics['Strategy Count'].to_numpy() > 0) == filters.has_strategy
+    if filters.diversity is not None:
+        low, high = filters.diversity
+        steps = np.floor(metrics['Diversity Score'].to_numpy(dtype=np.float64) / DIVERSITY_STEP + 1e-6)
+        steps = np.clip(steps, 0, DIVERSITY_STEPS)
+        keep &= (steps >= low) & (steps <= high)
+    return np.flatnonzero(keep)
+
+
+def _combinations(dataset):
+    provinces = dataset.province_options
+    rng = np.random.default_rng(0)
+    yield Filters()
+    for province, religion, strategy in itertools.product(provinces[:3], RELIGIONS[:2], (None, True, False)):
+        yield Filters(provinces=(province,), religions=(religion,), has_strategy=strategy)
+    for _ in range(200):
+        low, high = sorted(rng.integers(0, DIVERSITY_STEPS + 1, 2))
+        yield Filters(
+            provinces=tuple(rng.choice(provinces, rng.integers(0, 3), replace=False)),
+            religions=tuple(rng.choice(RELIGIONS, rng.integers(0, 3), replace=False)),
+            diversity=None if rng.random() < 0.3 else (int(low), int(high)),
+            has_strategy=[None, True, False][rng.integers(3)],
+        )
+
+
+@pytest.mark.parametrize('name', ['dataset', 'synthetic_dataset'])
+def test_bitmasks_match_boolean_filters(name, request):
+    dataset = request.getfixturevalue(name)
+    index = get_filter_index(dataset)
+    for filters in _combinations(dataset):
+        rows = index.positions(filters)
+        if not filters.active:
+            assert rows is None
+            continue
+        np.testing.assert_array_equal(rows, _boolean(dataset.metrics, filters), err_msg=repr(filters))
+
+
+def test_no_match_is_empty_not_unfiltered(dataset):
+    index = get_filter_index(dataset)
+    rows = index.positions(Filters(diversity=(DIVERSITY_STEPS, DIVERSITY_STEPS)))
+    assert rows is not None and len(rows) == 0
+    assert index.unit_options(rows) == () and index.strategy_options(rows) == ()
+
+
+def test_pack_is_little_endian_words():
+    mask = np.zeros(130, dtype=bool)
+    mask[[0, 63, 64, 129]] = True
+    words = pack(mask)
+    assert words.dtype == np.dtype('<u8') and len(words) == 3
+    assert words.tolist() == [1 | 1 << 63, 1, 1 << 1]
@@ -0,0 +1,53 @@
+import threading
+import tracemalloc
+
+import pytest
+
+import instrumentation
+from instrumentation import _Span, registry
+
+BLOCK = 4 << 20
+
+
+@pytest.fixture
+def traced(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'TRACE_ALLOCATIONS', True)
+    registry.reset()
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+    registry.reset()
+
+
+def _peak(name):
+    return next(row['peak_kb'] for row in registry.snapshot() if row['span'] == name) * 1024
+
+
+def test_nested_span_keeps_outer_peak(traced):
+    with _Span('outer'):
+        block = bytearray(BLOCK)
+        del block
+        with _Span('inner'):
+            pass
+    assert _peak('outer') > BLOCK * 0.9
+    assert _peak('inner') < BLOCK * 0.1
+
+
+def test_span_in_another_thread_keeps_peak(traced):
+    opened, done = threading.Event(), threading.Event()
+
+    def other():
+        opened.wait()
+        with _Span('other'):
+            pass
+        done.set()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    with _Span('main'):
+        block = bytearray(BLOCK)
+        del block
+        opened.set()
+        done.wait()
+    thread.join()
+    assert _peak('main') > BLOCK * 0.9
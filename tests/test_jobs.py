@@ -0,0 +1,112 @@
+import threading
+
+from jobs import JobCancelled, JobQueue
+
+TIMEOUT = 10
+
+
+def _blocking(started, release, calls):
+    # A job function that reports progress until ``release`` is set
+    def run(report):
+        calls.append(1)
+        started.set()
+        while not release.wait(0.01):
+            report(0.5)
+        report(1.0)
+        return 'result'
+    return run
+
+
+def test_same_key_joins_the_running_job_and_reuses_its_result():
+    queue = JobQueue(workers=2)
+    started, release, calls = threading.Event(), threading.Event(), []
+    first = queue.submit('key', _blocking(started, release, calls), owner='a')
+    assert started.wait(TIMEOUT)
+    second = queue.submit('key', _blocking(started, release, calls), owner='b')
+    assert second is first and first.owners == {'a', 'b'}
+    release.set()
+    assert first.wait(TIMEOUT) and first.done and first.result == 'result'
+    assert queue.submit('key', lambda report: 'other') is first
+    assert len(calls) == 1
+    assert {name: queue.stats()[name] for name in ('submitted', 'joined', 'reused', 'running', 'cached')} == \
+        {'submitted': 1, 'joined': 1, 'reused': 1, 'running': 0, 'cached': 1}
+
+
+def test_job_is_cancelled_only_when_its_last_owner_leaves():
+    queue = JobQueue(workers=1)
+    started, release = threading.Event(), threading.Event()
+    job = queue.submit('key', _blocking(started, release, []), owner='a')
+    queue.submit('key', None, owner='b')
+    assert started.wait(TIMEOUT)
+    queue.release('key', 'a')
+    assert not job.wait(0.1)
+    queue.release('key', 'b')
+    assert job.wait(TIMEOUT) and job.status == 'cancelled' and job.result is None
+    assert queue.stats()['cancelled'] == 1 and queue.stats()['cached'] == 0
+    # A cancelled job is not reused: the next submit runs it again
+    release.set()
+    rerun = queue.submit('key', lambda report: 'again')
+    assert rerun is not job and rerun.wait(TIMEOUT) and rerun.result == 'again'
+
+
+def test_rejoining_before_the_next_report_revives_the_job():
+    queue = JobQueue(workers=1)
+    started, proceed = threading.Event(), threading.Event()
+
+    def run(report):
+        started.set()
+        proceed.wait(TIMEOUT)
+        report(0.5)
+        return 'kept'
+
+    job = queue.submit('key', run, owner='a')
+    assert started.wait(TIMEOUT)
+    queue.release('key', 'a')
+    assert queue.submit('key', run, owner='b') is job
+    proceed.set()
+    assert job.wait(TIMEOUT) and job.result == 'kept'
+
+
+def test_queued_job_cancelled_before_it_starts_never_runs():
+    queue = JobQueue(workers=1)
+    started, release = threading.Event(), threading.Event()
+    blocker = queue.submit('first', _blocking(started, release, []), owner='a')
+    assert started.wait(TIMEOUT)
+    calls = []
+    queued = queue.submit('second', lambda report: calls.append(1), owner='a')
+    queue.release('second', 'a')
+    release.set()
+    assert blocker.wait(TIMEOUT) and queued.wait(TIMEOUT)
+    assert queued.status == 'cancelled' and calls == []
+
+
+def test_failures_are_kept_on_the_job():
+    queue = JobQueue(workers=1)
+
+    def fail(report):
+        raise ValueError('boom')
+
+    job = queue.submit('key', fail)
+    assert job.wait(TIMEOUT) and job.status == 'failed' and isinstance(job.error, ValueError)
+    assert queue.stats()['cached'] == 0
+
+
+def test_report_raises_once_cancelled():
+    queue = JobQueue(workers=1)
+    started, gate = threading.Event(), threading.Event()
+    seen = []
+
+    def run(report):
+        started.set()
+        gate.wait(TIMEOUT)
+        try:
+            report(0.1)
+        except JobCancelled:
+            seen.append('cancelled')
+            raise
+
+    job = queue.submit('key', run, owner='a')
+    assert started.wait(TIMEOUT)
+    queue.release('key', 'a')
+    gate.set()
+    assert job.wait(TIMEOUT) and job.status == 'cancelled' and seen == ['cancelled']
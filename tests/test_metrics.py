@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from metrics import RELIGIONS, compute_metrics
+
+
+def _reference(df, strategies):
+    # The per-row loop the dashboard used before compute_metrics
+    rows = []
+    for _, row in df.iterrows():
+        majority = max(RELIGIONS, key=lambda religion: row[religion])
+        rows.append({
+            'Majority Religion': majority,
+            'Majority %': row[majority],
+            'Diversity Score': 1 - sum((row[religion] / 100) ** 2 for religion in RELIGIONS if row[religion] > 0),
+            'Minority %': 100 - row[majority],
+            'Strategy Count': len(strategies.get(row['Unit'], [])),
+        })
+    return pd.DataFrame(rows, index=df.index)
+
+
+def _frame(shares):
+    shares = np.asarray(shares, dtype=np.float64)
+    df = pd.DataFrame(shares, columns=RELIGIONS)
+    df.insert(0, 'Unit', [f'U{i}' for i in range(len(df))])
+    df.insert(1, 'District', 'D')
+    df.insert(2, 'Province', 'P')
+    return df
+
+
+def _check(df, strategies):
+    metrics = compute_metrics(df, {unit: len(items) for unit, items in strategies.items()})
+    expected = _reference(df, strategies)
+    assert metrics['Majority Religion'].astype(str).tolist() == expected['Majority Religion'].tolist()
+    for column in ('Majority %', 'Diversity Score', 'Minority %'):
+        np.testing.assert_allclose(metrics[column].to_numpy(dtype=np.float64), expected[column], atol=1e-4)
+    assert metrics['Strategy Count'].tolist() == expected['Strategy Count'].tolist()
+    assert metrics[['Unit', 'District', 'Province']].astype(str).equals(df[['Unit', 'District', 'Province']].astype(str))
+
+
+def test_ties_pick_the_first_religion_like_the_baseline():
+    df = _frame([[50, 50, 0, 0], [0, 40, 40, 20], [25, 25, 25, 25], [0, 0, 50, 50], [0, 0, 0, 0]])
+    _check(df, {'U0': ['a', 'b'], 'U3': ['c']})
+    assert compute_metrics(df, {})['Majority Religion'].astype(str).tolist() == \
+        ['Buddhist', 'Muslim', 'Buddhist', 'Christian', 'Buddhist']
+
+
+def test_random_shares_match_the_baseline():
+    rng = np.random.default_rng(0)
+    shares = rng.dirichlet(np.ones(len(RELIGIONS)), 500) * 100
+    # Whole percentages, so ties happen
+    shares = np.round(shares, 0)
+    shares[::7, 1] = shares[::7, 0]
+    df = _frame(shares)
+    _check(df, {f'U{i}': ['s'] * (i % 4) for i in range(0, 500, 3)})
+
+
+def test_dataset_metrics_match_the_baseline(dataset):
+    _check(dataset.df, dataset.strategies)
@@ -0,0 +1,99 @@
+from collections import defaultdict
+
+import numpy as np
+
+from results_feed import UNIT_FIELD, ResultsAggregator
+
+PROVINCES = {'Colombo': 'Western', 'Gampaha': 'Western', 'Kandy': 'Central', 'Jaffna': 'Northern'}
+
+
+def _record(unit, district, party, votes):
+    return {UNIT_FIELD: unit, 'District': district, 'Party': party, 'Votes': votes}
+
+
+def _nonzero(table):
+    return {key: {party: votes for party, votes in parties.items() if votes}
+            for key, parties in table.items() if any(parties.values())}
+
+
+def _expected(records, provinces):
+    # Totals from the last report of every (unit, party), as a full recount would give
+    latest = {}
+    for record in records:
+        latest[(record[UNIT_FIELD], record['Party'])] = (record['District'], record['Votes'])
+    district, province, national = defaultdict(dict), defaultdict(dict), {}
+    units = defaultdict(set)
+    for (unit, party), (where, votes) in latest.items():
+        for table, key in ((district, where), (province, provinces.get(where, 'Unknown'))):
+            table[key][party] = table[key].get(party, 0) + votes
+        national[party] = national.get(party, 0) + votes
+        units[where].add(unit)
+    return _nonzero(district), _nonzero(province), {p: v for p, v in national.items() if v}, units
+
+
+def _check(results, records, provinces=PROVINCES):
+    district, province, national, units = _expected(records, provinces)
+    assert _nonzero(results.district_votes) == district
+    assert _nonzero(results.province_votes) == province
+    assert {p: v for p, v in results.national_votes.items() if v} == national
+    assert {d: u for d, u in results.district_units.items() if u} == units
+
+
+def test_re_reports_replace_the_earlier_count():
+    results = ResultsAggregator(PROVINCES)
+    records = [_record('Colombo North', 'Colombo', 'UNP', 100), _record('Colombo North', 'Colombo', 'SJB', 50),
+               _record('Colombo North', 'Colombo', 'UNP', 120), _record('Kandy', 'Kandy', 'UNP', 80),
+               _record('Colombo North', 'Colombo', 'UNP', 120)]
+    versions = []
+    for record in records:
+        assert results.apply(record)
+        versions.append(results.version_for('Colombo'))
+    _check(results, records)
+    assert results.district_votes['Colombo']['UNP'] == 120
+    # The same count reported again changes nothing a view shows
+    assert versions[-1] == versions[-2]
+    frame, reported = results.district_frame('Colombo')
+    assert reported == 1 and frame['Party'].tolist() == ['UNP', 'SJB']
+
+
+def test_district_corrections_move_the_count():
+    results = ResultsAggregator(PROVINCES)
+    records = [_record('Kelaniya', 'Colombo', 'UNP', 70), _record('Kelaniya', 'Colombo', 'SJB', 30),
+               _record('Kelaniya', 'Gampaha', 'UNP', 75)]
+    results.apply_many(records)
+    _check(results, records)
+    # SJB is still reported under Colombo, so the unit still counts there
+    assert results.district_units['Colombo'] == {'Kelaniya'}
+    records.append(_record('Kelaniya', 'Gampaha', 'SJB', 30))
+    results.apply(records[-1])
+    _check(results, records)
+    assert not results.district_units['Colombo']
+    _, reported = results.district_frame('Colombo')
+    assert reported == 0
+
+
+def test_random_feed_matches_a_recount():
+    rng = np.random.default_rng(0)
+    units = [f'PD {i}' for i in range(30)]
+    districts = list(PROVINCES) + ['Nowhere']
+    results = ResultsAggregator(PROVINCES)
+    records = []
+    for _ in range(2000):
+        record = _record(str(rng.choice(units)), str(rng.choice(districts)), str(rng.choice(['UNP', 'SJB', 'NPP'])),
+                         int(rng.integers(0, 1000)))
+        records.append(record)
+        assert results.apply(record)
+    _check(results, records)
+
+    # Districts moving between provinces regroup the province totals only
+    moved = PROVINCES | {'Jaffna': 'Western'}
+    results.use_provinces(moved)
+    _check(results, records, moved)
+
+
+def test_invalid_results_are_rejected():
+    results = ResultsAggregator(PROVINCES)
+    assert not results.apply({'District': 'Colombo', 'Party': 'UNP', 'Votes': 1})
+    assert not results.apply(_record('A', 'Colombo', 'UNP', 'many'))
+    assert not results.apply(_record('A', 'Colombo', 'UNP', -1))
+    assert results.rejected == 3 and results.version == 0
@@ -0,0 +1,230 @@
+"""Replica warm-up, startup timing and the import-time budget.
+
+A fresh server process pays for its imports, the data load, the indexes and
+the first figures on the first page view. ``--serve`` does all of that first
+and only then starts Streamlit in the same process. The server does not
+listen, and ``/_stcore/health`` does not answer, until every process-wide
+cache is filled, so an autoscaler never routes users to a cold replica.
+
+    python warmup.py                                  # warm up and print the phase report
+    python warmup.py --serve -- --server.port 8501    # warm up, then serve the dashboard
+    python warmup.py --serve --api-port 8502          # ... with the JSON API (see ``api``) alongside
+    python warmup.py --check-imports                  # enforce the import-time budget
+
+Each phase is timed and kept in a process-wide report. The report is printed
+at startup and shown in the hidden debug sidebar (``?debug=1``) together with
+the process's first script run.
+
+The import budget (``ELECTION_IMPORT_BUDGET_MS``) covers importing the app's
+modules in a fresh interpreter that has already imported Streamlit. Modules in
+``LAZY_MODULES`` must not be loaded by those imports at all; they are loaded on
+first use.
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+APP = Path(__file__).resolve().parent / 'dashboard.py'
+
+# Modules dashboard.py imports at startup
+APP_MODULES = ('activity', 'data_layer', 'filters', 'figures', 'geo', 'history', 'instrumentation', 'jobs', 'memory',
+               'metrics', 'optimizer', 'payloads', 'rendering', 'results_feed', 'search', 'similarity', 'simulator',
+               'tenants')
+
+# Heavy modules that importing the app must leave for first use
+LAZY_MODULES = ('plotly.express', 'plotly.io', 'pyarrow.parquet', 'kaleido')
+
+IMPORT_BUDGET_MS = float(os.environ.get('ELECTION_IMPORT_BUDGET_MS', '1000'))
+
+# Largest imports listed when checking the budget
+IMPORT_REPORT_ROWS = 8
+
+FIRST_RUN = 'first script run'
+
+
+class StartupReport:
+    """Wall time of each startup phase of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = []
+        self.warmed = False
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases.append((name, seconds))
+
+    def record_once(self, name, seconds):
+        with self._lock:
+            if all(phase != name for phase, _ in self.phases):
+                self.phases.append((name, seconds))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def rows(self):
+        with self._lock:
+            return [{'Phase': name, 'ms': round(seconds * 1000, 1)} for name, seconds in self.phases]
+
+    def text(self):
+        rows = self.rows()
+        lines = [f"{row['Phase']:<24} {row['ms']:>10.1f} ms" for row in rows]
+        lines.append(f"{'total':<24} {sum(row['ms'] for row in rows):>10.1f} ms")
+        return '\n'.join(lines)
+
+
+report = StartupReport()
+
+
+def warm_up():
+    """Fill every process-wide cache; return the dataset."""
+    with report.phase('import.streamlit'):
+        importlib.import_module('streamlit')
+    with report.phase('import.app'):
+        for name in APP_MODULES:
+            importlib.import_module(name)
+    with report.phase('import.plotly'):
+        for name in ('plotly.express', 'plotly.io'):
+            importlib.import_module(name)
+
+    from data_layer import get_dataset
+    from figures import BUILDERS, DEFAULT_SELECTIONS, MAP_KINDS, TREND_KINDS, UNIT_KINDS, \
+        figure_cache, get_figure, prewarm
+    from filters import get_filter_index
+    from history import get_history
+    from results_feed import get_results
+    from search import get_index
+    from similarity import get_similarity
+
+    with report.phase('data.load'):
+        dataset = get_dataset()
+    with report.phase('filters.index'):
+        get_filter_index(dataset)
+    with report.phase('search.index'):
+        get_index(dataset)
+    with report.phase('history.load'):
+        get_history(dataset)
+    with report.phase('similarity.index'):
+        get_similarity(dataset)
+    with report.phase('figures.build'):
+        prewarm(dataset, figure_cache())
+    with report.phase('figures.decode'):
+        # The first decode of each trace type builds plotly's validators
+        for kind in BUILDERS:
+            if kind not in UNIT_KINDS and kind not in MAP_KINDS and kind not in TREND_KINDS:
+                get_figure(dataset, kind, DEFAULT_SELECTIONS.get(kind))
+    with report.phase('results.feed'):
+        get_results(dataset)
+    report.warmed = True
+    return dataset
+
+
+def record_first_run(seconds):
+    """Record how long the process's first full script run took."""
+    report.record_once(FIRST_RUN, seconds)
+
+
+def show_startup_report():
+    """Render the startup phases in the sidebar when the page has ``?debug=1``."""
+    import streamlit as st
+
+    if st.query_params.get('debug') != '1':
+        return
+    with st.sidebar.expander("Debug: startup"):
+        if not report.warmed:
+            st.caption("This process was not warmed up; start it with `python warmup.py --serve`.")
+        st.dataframe(report.rows(), use_container_width=True, hide_index=True)
+
+
+_IMPORT_PROBE = """
+import json, sys, time
+import streamlit
+sys.stderr.write('--app imports--\\n')
+before = set(sys.modules)
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'eager': sorted(set({lazy!r}) & (set(sys.modules) - before))}}))
+"""
+
+
+def _largest_imports(importtime, rows=IMPORT_REPORT_ROWS):
+    # ``-X importtime`` lines: "import time: self | cumulative | name", nested by indent
+    lines = importtime.split('--app imports--', 1)[-1].splitlines()
+    found = []
+    for line in lines:
+        parts = line.split('|')
+        if not line.startswith('import time:') or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            found.append((int(parts[1]) / 1000, name.strip()))
+    return sorted(found, reverse=True)[:rows]
+
+
+def check_imports(budget_ms=IMPORT_BUDGET_MS):
+    """Import the app in a fresh interpreter; return a list of budget violations."""
+    probe = _IMPORT_PROBE.format(modules=APP_MODULES, lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], cwd=APP.parent,
+                            capture_output=True, text=True, check=True)
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    print(f"App imports: {measured['ms']:.0f} ms (budget {budget_ms:.0f} ms)")
+    for ms, name in _largest_imports(result.stderr):
+        print(f"  {ms:>8.1f} ms  {name}")
+
+    failures = []
+    if measured['ms'] > budget_ms:
+        failures.append(f"app imports took {measured['ms']:.0f} ms > {budget_ms:.0f} ms budget")
+    for name in measured['eager']:
+        failures.append(f"{name} is imported eagerly; import it where it is first used")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm up the dashboard caches before serving.")
+    parser.add_argument('--serve', action='store_true',
+                        help="start the dashboard in this process after warming up; "
+                             "arguments after -- go to `streamlit run`")
+    parser.add_argument('--check-imports', action='store_true',
+                        help="fail if importing the app exceeds ELECTION_IMPORT_BUDGET_MS")
+    parser.add_argument('--api-port', type=int, default=None,
+                        help="also serve the JSON API on this port, sharing this process's caches")
+    args, streamlit_args = parser.parse_known_args(argv)
+    streamlit_args = [arg for arg in streamlit_args if arg != '--']
+
+    if args.check_imports:
+        failures = check_imports()
+        for failure in failures:
+            print(f"FAIL {failure}")
+        return 1 if failures else 0
+
+    warm_up()
+    print(report.text(), flush=True)
+    if args.api_port:
+        from api import serve_in_background
+
+        serve_in_background(port=args.api_port)
+    if args.serve:
+        from streamlit.web import cli
+
+        sys.argv = ['streamlit', 'run', str(APP), *streamlit_args]
+        return cli.main()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())